@@ -1,8 +1,55 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+
 import numpy as np
 import pandas as pd
-import pickle
 from sklearn.preprocessing import StandardScaler
 
+from forest_engine import CompiledForest, IdentityScaler
+from model_artifacts import ARTIFACT_DIR, MANIFEST_FILENAME, load_artifacts
+import metrics
+
+# Default artifact locations, resolved next to this module so the API works
+# regardless of the current working directory.
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_FILENAME = os.path.join(MODEL_DIR, 'predict_box_office.pkl')
+FEATURES_FILENAME = os.path.join(MODEL_DIR, 'feature_columns.pkl')
+SCALER_FILENAME = os.path.join(MODEL_DIR, 'scaler.pkl')
+
+# Pointer written by train_model.py: names the models/<version>/ directory to
+# serve and lists its pickles' hashes. Replacing it is the atomic model swap.
+MODEL_MANIFEST_FILENAME = 'model_version.json'
+
+# Raw user input fields, in the column order expected for ndarray batches.
+INPUT_COLUMNS = [
+    'Running time',
+    'budget',
+    'Actors Box Office %',
+    'Director Box Office %',
+    'Oscar and Golden Globes nominations',
+    'Release year',
+    'IMDb score',
+]
+
+# Features computed from an input field: name -> (source field, transform).
+DERIVED_FEATURES = {
+    'log_budget': ('budget', np.log1p),
+}
+
+# Inference engines selectable at load time: sklearn's own predict, the
+# flattened CompiledForest with the scaler folded into its thresholds, or the
+# same forest memory-mapped from the arrays written by model_artifacts.py.
+ENGINES = ('sklearn', 'compiled', 'mmap')
+DEFAULT_ENGINE = os.environ.get('ML_API_ENGINE', 'sklearn')
+
+# Number of rows handed to model.predict at a time in batch prediction.
+DEFAULT_CHUNK_SIZE = 10000
+
+
 def load_model(filename):
     """
     Load a model from a file using pickle.
@@ -12,38 +59,396 @@ def load_model(filename):
     
     Returns:
     - The loaded model.
+
+    Raises:
+    - OSError / pickle.UnpicklingError: If the file cannot be read or unpickled.
+    """
+    with open(filename, 'rb') as file:
+        return pickle.load(file)
+
+
+def _file_stamp(filename):
+    """Return a cheap change marker (mtime, size) for a file."""
+    stat = os.stat(filename)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _file_digest(filename):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_version(file_digests):
     """
+    Combine the hex digests of the model, features and scaler files into one
+    content hash.
+
+    Returns:
+    - str: The full 64-character SHA-256 hex digest. The model version is its
+      first 12 characters; callers slice it themselves (the registry also
+      compares full digests to detect unchanged artifacts).
+    """
+    digest = hashlib.sha256()
+    for file_digest in file_digests:
+        digest.update(file_digest.encode('ascii'))
+    return digest.hexdigest()
+
+
+def _read_manifest(filename):
     try:
-        with open(filename, 'rb') as file:
-            model = pickle.load(file)
-        return model
-    except Exception as e:
+        with open(filename) as file:
+            return json.load(file)
+    except FileNotFoundError:
         return None
-    
 
-def load_model_and_resources():
+
+class ModelRegistry:
     """
-    Load the trained model, feature columns, and scaler from files.
+    Process-wide holder for the model, feature columns and scaler.
+
+    The artifacts are unpickled once and kept in memory. Every lookup stats the
+    three files; only when an mtime/size changes are the files hashed, and they
+    are only reloaded when that hash actually differs from the loaded one. The
+    'mmap' engine watches the artifact store's manifest.json instead.
+
+    If a model_version.json manifest sits next to the model, only the manifest
+    is watched and the pickles are read from the version directory it names
+    (written completely before the manifest is replaced), so a running process
+    picks up a retrained model without ever mixing old and new files. Files
+    whose hashes do not match the manifest are never loaded: the registry keeps
+    serving its current model and does not look at them again until the
+    manifest changes. Each file is hashed and unpickled from the same bytes.
 
     Args:
-    - model_filename (str): The file path to the trained model.
-    - features_filename (str): The file path to the feature columns.
-    - scaler_filename (str): The file path to the scaler.
+    - model_path (str): The file path to the trained model.
+    - features_path (str): The file path to the feature columns.
+    - scaler_path (str): The file path to the scaler.
+    - engine (str): 'sklearn' to serve the unpickled model as-is, 'compiled'
+      to serve a CompiledForest paired with an IdentityScaler (the scaling is
+      folded into the forest's thresholds), or 'mmap' to serve that forest
+      memory-mapped from exported .npy arrays without unpickling.
+    - artifact_dir (str): Artifact store used by the 'mmap' engine.
+    """
+
+    def __init__(self, model_path=MODEL_FILENAME, features_path=FEATURES_FILENAME,
+                 scaler_path=SCALER_FILENAME, engine='sklearn', artifact_dir=ARTIFACT_DIR):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        if engine == 'mmap':
+            self.paths = (os.path.join(artifact_dir, MANIFEST_FILENAME),)
+            self.manifest_path = None
+        else:
+            self.paths = (model_path, features_path, scaler_path)
+            self.manifest_path = os.path.join(os.path.dirname(model_path), MODEL_MANIFEST_FILENAME)
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._resources = None
+        self._stamps = None
+        self._digest = None
+        self._snapshot = None  # (resources, version), swapped as one object
+        self.pending = None    # why the manifest's model is not served yet
+        self._pending_stamps = None
+        self.version = None
+
+    def _current_stamps(self):
+        if self.manifest_path is not None and os.path.exists(self.manifest_path):
+            return (_file_stamp(self.manifest_path),)
+        return tuple(_file_stamp(path) for path in self.paths)
+
+    def _manifest_paths(self, manifest):
+        version_dir = os.path.join(os.path.dirname(self.manifest_path), manifest.get('path', '.'))
+        return [os.path.join(version_dir, os.path.basename(path)) for path in self.paths]
+
+    def _serve(self, resources, stamps, digest, version):
+        self._resources = resources
+        self._snapshot = (resources, version)
+        self._stamps = stamps
+        self._digest = digest
+        self.version = version
+        self.pending = None
+        self._pending_stamps = None
+
+    def _hold(self, stamps, reason):
+        """
+        Keep serving the current model instead of the manifest's, and remember
+        the stamps so the files are not read again until the manifest changes.
+        """
+        self.pending = reason
+        self._pending_stamps = stamps
+        if self._resources is None:
+            raise ValueError(reason)
+        self._stamps = stamps
+
+    def _load_arrays(self, stamps):
+        digest = _file_digest(self.paths[0])
+        if self._resources is not None and digest == self._digest:
+            self._stamps = stamps
+            return
+        model, feature_columns, scaler, manifest = load_artifacts(os.path.dirname(self.paths[0]))
+        # Exports are named after the pickles' hash, so versions agree across engines.
+        self._serve((model, feature_columns, scaler), stamps, digest, manifest['version'])
+
+    def _load(self, stamps):
+        if self.engine == 'mmap':
+            self._load_arrays(stamps)
+            return
+        if stamps == self._pending_stamps:
+            # Already found not to match; wait for the manifest to change.
+            if self._resources is None:
+                raise ValueError(self.pending)
+            return
+        manifest = _read_manifest(self.manifest_path) if self.manifest_path is not None else None
+        paths = self._manifest_paths(manifest) if manifest is not None else self.paths
+        blobs = []
+        try:
+            for path in paths:
+                with open(path, 'rb') as file:
+                    blobs.append(file.read())
+        except OSError as e:
+            if manifest is None:
+                raise
+            self._hold(stamps, f"Cannot read the model named by {self.manifest_path}: {e}")
+            return
+        file_digests = [hashlib.sha256(blob).hexdigest() for blob in blobs]
+        digest = artifact_version(file_digests)
+        if manifest is not None and manifest.get('files') != file_digests:
+            self._hold(stamps, f"Files in {os.path.dirname(paths[0])} do not match {self.manifest_path}")
+            return
+        if self._resources is not None and digest == self._digest:
+            # Touched but not modified: keep the objects already in memory.
+            self._stamps = stamps
+            self.pending = None
+            return
+        model = pickle.loads(blobs[0])
+        feature_columns = list(pickle.loads(blobs[1]))
+        scaler = pickle.loads(blobs[2])
+        if self.engine == 'compiled':
+            model = CompiledForest.from_sklearn(model, scaler)
+            n_features = len(feature_columns)
+            scaler = IdentityScaler(scaler.mean_ if scaler.with_mean else np.zeros(n_features),
+                                    scaler.scale_ if scaler.with_std else np.ones(n_features))
+        self._serve((model, feature_columns, scaler), stamps, digest, digest[:12])
+
+    def get(self):
+        """
+        Return the cached (model, feature_columns, scaler), reloading them first
+        if any artifact changed on disk.
+
+        Returns:
+        - tuple: (model, feature_columns, scaler)
+        """
+        start = time.perf_counter()
+        stamps = self._current_stamps()
+        resources = self._resources
+        if resources is not None and stamps == self._stamps:
+            metrics.observe('movie_ml_stage_seconds', time.perf_counter() - start, stage='load', mode='cached')
+            return resources
+        with self._lock:
+            if self._resources is None or stamps != self._stamps:
+                self._load(stamps)
+            resources = self._resources
+        metrics.observe('movie_ml_stage_seconds', time.perf_counter() - start, stage='load', mode='disk')
+        return resources
+
+    def snapshot(self):
+        """
+        Like get(), but also return the version of exactly these resources
+        (self.version may already belong to a newer model when read separately).
+
+        Returns:
+        - tuple: ((model, feature_columns, scaler), version)
+        """
+        self.get()
+        return self._snapshot
+
+    def reload(self):
+        """Force the artifacts to be read from disk again."""
+        with self._lock:
+            self._resources = None
+            self._pending_stamps = None
+            self._load(self._current_stamps())
+        return self._resources
+
+    def warm_up(self, background=False):
+        """
+        Load the artifacts ahead of the first prediction.
+
+        Args:
+        - background (bool): Load on a daemon thread and return immediately.
+
+        Returns:
+        - threading.Thread or None: The loader thread when running in the background.
+        """
+        if not background:
+            self.get()
+            return None
+        thread = threading.Thread(target=self.get, name='model-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+
+_registries = {}
+_registry_lock = threading.Lock()
+
+
+def get_registry(engine=None):
+    """
+    Return the process-wide ModelRegistry for an engine, creating it on first use.
+
+    Args:
+    - engine (str, optional): One of ENGINES. Defaults to DEFAULT_ENGINE
+      (settable through the ML_API_ENGINE environment variable).
+    """
+    engine = engine or DEFAULT_ENGINE
+    registry = _registries.get(engine)
+    if registry is None:
+        with _registry_lock:
+            registry = _registries.get(engine)
+            if registry is None:
+                registry = _registries[engine] = ModelRegistry(engine=engine)
+    return registry
+
+
+def warm_up(background=False, engine=None):
+    """Load the model resources into the process-wide registry ahead of time."""
+    return get_registry(engine).warm_up(background=background)
+
+
+def model_version(engine=None):
+    """Return the version id (content hash prefix) of the loaded model artifacts."""
+    registry = get_registry(engine)
+    registry.get()
+    return registry.version
+
+
+def load_model_and_resources(engine=None):
+    """
+    Load the trained model, feature columns, and scaler.
+
+    The artifacts are served from the process-wide registry, so only the first
+    call (or the first call after an artifact changes on disk) touches pickle.
+
+    Args:
+    - engine (str, optional): 'sklearn', 'compiled' or 'mmap'. With 'compiled'
+      or 'mmap' the model is a CompiledForest and the scaler an IdentityScaler,
+      so the returned triple can be used with the same processing/prediction
+      functions. 'mmap' requires `python model_artifacts.py export` first.
 
     Returns:
     - model (object): The trained model.
     - feature_columns (list): The list of feature columns.
     - scaler (StandardScaler): The scaler used for standardization.
     """
-    model = load_model('predict_box_office.pkl')
-    feature_columns = load_model('feature_columns.pkl')
-    scaler = load_model('scaler.pkl')
+    return get_registry(engine).get()
 
-    if model and feature_columns and scaler:
-        return model, feature_columns, scaler
-    else:
-        return None, None, None
-    
+
+
+class FeatureSchema:
+    """
+    Compiled mapping from raw user input fields to model feature positions.
+
+    Built once per feature column list; every input field and derived feature
+    (e.g. 'log_budget' from 'budget') is resolved to a fixed column position so
+    rows can be written straight into a float64 buffer.
+
+    Args:
+    - feature_columns (list): List of feature column names used in training.
+    """
+
+    def __init__(self, feature_columns):
+        self.feature_columns = list(feature_columns)
+        self.n_features = len(self.feature_columns)
+        # Keys accepted in a user_input dict; derived names are tolerated (and
+        # recomputed) because older callers received them back in their dict.
+        self.accepted_keys = frozenset(INPUT_COLUMNS) | frozenset(DERIVED_FEATURES)
+
+        # (feature position, INPUT_COLUMNS index, transform or None)
+        self.plan = []
+        for position, col in enumerate(self.feature_columns):
+            if col in DERIVED_FEATURES:
+                source, transform = DERIVED_FEATURES[col]
+                self.plan.append((position, INPUT_COLUMNS.index(source), transform))
+            elif col in INPUT_COLUMNS:
+                self.plan.append((position, INPUT_COLUMNS.index(col), None))
+            # Features no input provides stay at 0, as in training-time alignment.
+
+    def validate(self, user_input):
+        """
+        Check a user_input dict against the schema.
+
+        Raises:
+        - KeyError: If a key is unknown (e.g. a typo) or a required field is missing.
+        """
+        keys = user_input.keys()
+        unknown = keys - self.accepted_keys
+        if unknown:
+            raise KeyError(
+                f"Unknown input field(s): {sorted(unknown)}. Expected: {INPUT_COLUMNS}"
+            )
+        missing = [col for col in INPUT_COLUMNS if col not in keys]
+        if missing:
+            raise KeyError(f"Missing input field(s): {missing}")
+
+    def build(self, user_input, out=None):
+        """
+        Write one user_input dict into a (1, n_features) float64 feature row.
+
+        Args:
+        - user_input (dict): Raw input fields (see INPUT_COLUMNS).
+        - out (ndarray, optional): Preallocated (1, n_features) buffer to fill.
+
+        Returns:
+        - features (ndarray): The filled buffer.
+        """
+        self.validate(user_input)
+        if out is None:
+            out = np.zeros((1, self.n_features), dtype=np.float64)
+        row = out[0]
+        for position, source, transform in self.plan:
+            value = float(user_input[INPUT_COLUMNS[source]])
+            row[position] = transform(value) if transform is not None else value
+        return out
+
+    def build_batch(self, raw):
+        """
+        Turn a raw (n_rows, len(INPUT_COLUMNS)) matrix into the feature matrix.
+
+        Args:
+        - raw (ndarray): Raw inputs laid out in INPUT_COLUMNS order.
+
+        Returns:
+        - features (ndarray): Array of shape (n_rows, n_features).
+        """
+        features = np.zeros((raw.shape[0], self.n_features), dtype=np.float64)
+        for position, source, transform in self.plan:
+            column = raw[:, source]
+            features[:, position] = transform(column) if transform is not None else column
+        return features
+
+
+_schemas = {}
+
+
+def get_feature_schema(feature_columns):
+    """Return the cached FeatureSchema for a feature column list."""
+    key = tuple(feature_columns)
+    schema = _schemas.get(key)
+    if schema is None:
+        schema = _schemas[key] = FeatureSchema(key)
+    return schema
+
+
+def _apply_scaler(features, scaler):
+    """Standardize a feature matrix in place with the scaler's fitted parameters."""
+    if scaler.with_mean:
+        features -= scaler.mean_
+    if scaler.with_std:
+        features /= scaler.scale_
+    return features
 
 
 def process_user_input(user_input, feature_columns, scaler):
@@ -59,55 +464,16 @@ def process_user_input(user_input, feature_columns, scaler):
 
     Returns:
     - input_scaled (ndarray): Standardized input data, ready for model prediction
-    """
-    
-    # Apply log1p transformation to budget (log transform for budget)
-    user_input['log_budget'] = np.log1p(user_input['budget'])
-
-    # Prepare the input data dictionary
-    input_data = {
-        'Running time': user_input['Running time'],  
-        'log_budget': user_input['log_budget'],
-        'Actors Box Office %': user_input['Actors Box Office %'],  
-        'Director Box Office %': user_input['Director Box Office %'],  
-        'Oscar and Golden Globes nominations': user_input['Oscar and Golden Globes nominations'],  
-        'Release year': user_input['Release year'],  
-        'IMDb score': user_input['IMDb score'],
-    }
 
-    # Convert the input data into a DataFrame
-    input_df = pd.DataFrame([input_data])
-
-    # Perform one-hot encoding for the directors field (if applicable, based on training data)
-    # Assuming 'directors' information is not part of the current user input (since it's not given)
-    # So we'll skip director one-hot encoding unless the 'directors' field is part of the model's features
-    # Perform one-hot encoding for the actors field
-    # If there are multiple actors, handle the one-hot encoding
-    # if 'actors' in user_input:
-    #     for actor in user_input['actors']:
-    #         input_df[f'actor_{actor}'] = 1
-    # else:
-    #     # No actor data was provided in user_input (fallback mechanism)
-    #     pass
-
-    # Ensure all required columns are present in the input data
-    input_columns = set(input_df.columns)
-    required_columns = set(feature_columns)
-
-    missing_columns = required_columns - input_columns
-    for col in missing_columns:
-        input_df[col] = 0
-
-    # Align the feature columns to ensure the input data matches the feature columns used in training
-    input_df = input_df[feature_columns]
-
-    print(f"Input Data Columns: {input_df.columns}")
-    print(f"Feature Columns: {feature_columns}")
-    
-    # Apply standard scaling to the input data
-    input_scaled = scaler.transform(input_df)
+    Raises:
+    - KeyError: If user_input has unknown or missing fields.
+    """
+    with metrics.timer('movie_ml_stage_seconds', stage='preprocess', mode='single'):
+        # Build the feature row (including log_budget) in training column order
+        features = get_feature_schema(feature_columns).build(user_input)
 
-    return input_scaled
+        # Apply standard scaling to the input data
+        return _apply_scaler(features, scaler)
 
 # def process_user_input(user_input, feature_columns, scaler):
 #     """
@@ -166,7 +532,8 @@ def predict_box_office(model, input_scaled):
     - predicted_final_box_office (float): The predicted final box office revenue (non-log scale).
     """
     # Predict the log-transformed final box office
-    prediction = model.predict(input_scaled)
+    with metrics.timer('movie_ml_stage_seconds', stage='predict', mode='single'):
+        prediction = model.predict(input_scaled)
     print(f"Predicted log-transformed Box Office: {prediction}")
 
     # Reverse the log transformation to get the actual predicted final box office
@@ -176,3 +543,184 @@ def predict_box_office(model, input_scaled):
     print(f"Predicted final Box Office: {predicted_final_box_office}")
 
     return predicted_final_box_office
+
+
+
+def _batch_to_matrix(user_inputs, schema):
+    """
+    Convert a batch of raw user inputs into a float64 matrix whose columns
+    follow INPUT_COLUMNS.
+
+    Args:
+    - user_inputs (list of dict | pd.DataFrame | ndarray): The batch to convert.
+      2-D arrays must already be laid out in INPUT_COLUMNS order.
+    - schema (FeatureSchema): Schema used to validate dict rows.
+
+    Returns:
+    - raw (ndarray): Array of shape (n_rows, len(INPUT_COLUMNS)).
+    """
+    if isinstance(user_inputs, pd.DataFrame):
+        missing = [col for col in INPUT_COLUMNS if col not in user_inputs.columns]
+        if missing:
+            raise KeyError(f"Missing input columns: {missing}")
+        return user_inputs[INPUT_COLUMNS].to_numpy(dtype=np.float64)
+
+    if isinstance(user_inputs, np.ndarray):
+        raw = np.asarray(user_inputs, dtype=np.float64)
+        if raw.ndim != 2 or raw.shape[1] != len(INPUT_COLUMNS):
+            raise ValueError(
+                f"Expected a 2-D array with {len(INPUT_COLUMNS)} columns "
+                f"({', '.join(INPUT_COLUMNS)}), got shape {raw.shape}"
+            )
+        return raw
+
+    raw = np.empty((len(user_inputs), len(INPUT_COLUMNS)), dtype=np.float64)
+    for i, row in enumerate(user_inputs):
+        schema.validate(row)
+        raw[i] = [row[col] for col in INPUT_COLUMNS]
+    return raw
+
+
+def process_user_inputs_batch(user_inputs, feature_columns, scaler):
+    """
+    Vectorized counterpart of process_user_input for many movies at once.
+
+    Args:
+    - user_inputs (list of dict | pd.DataFrame | ndarray): Movies with the same
+      fields as process_user_input. 2-D arrays use the INPUT_COLUMNS order.
+    - feature_columns (list): List of feature column names used in training.
+    - scaler (StandardScaler): The scaler used to standardize the input data.
+
+    Returns:
+    - input_scaled (ndarray): Standardized feature matrix of shape (n_rows, len(feature_columns)).
+    """
+    with metrics.timer('movie_ml_stage_seconds', stage='preprocess', mode='batch'):
+        schema = get_feature_schema(feature_columns)
+        features = schema.build_batch(_batch_to_matrix(user_inputs, schema))
+        return _apply_scaler(features, scaler)
+
+
+def predict_box_office_batch(model, input_scaled, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Predict the final box office revenue for a batch of standardized inputs.
+
+    Args:
+    - model: The trained machine learning model (e.g., RandomForestRegressor).
+    - input_scaled (ndarray): Standardized feature matrix from process_user_inputs_batch.
+    - chunk_size (int): Maximum number of rows passed to model.predict per call.
+
+    Returns:
+    - predicted_final_box_office (ndarray): Predicted box office revenue per row (non-log scale).
+    """
+    with metrics.timer('movie_ml_stage_seconds', stage='predict', mode='batch'):
+        input_scaled = np.asarray(input_scaled, dtype=np.float64)
+        prediction = np.empty(input_scaled.shape[0], dtype=np.float64)
+        for start in range(0, input_scaled.shape[0], chunk_size):
+            stop = start + chunk_size
+            prediction[start:stop] = model.predict(input_scaled[start:stop])
+        return np.expm1(prediction)
+
+
+# Largest what-if grid scored in one call (rows = product of the sweep sizes).
+MAX_SWEEP_ROWS = 1_000_000
+
+
+def sweep_values(spec):
+    """
+    Expand one what-if sweep specification into its values.
+
+    Args:
+    - spec (dict | list | tuple | ndarray): {'start', 'stop', 'steps'} for
+      evenly spaced values including both ends, or the explicit values to try.
+
+    Returns:
+    - values (ndarray): float64 values to try.
+
+    Raises:
+    - ValueError: If a range has other keys or fewer than one step.
+    """
+    if isinstance(spec, dict):
+        if set(spec) != {'start', 'stop', 'steps'}:
+            raise ValueError(f"A sweep range needs exactly 'start', 'stop' and 'steps', got {sorted(spec)}")
+        steps = int(spec['steps'])
+        if steps < 1:
+            raise ValueError("A sweep range needs at least 1 step")
+        return np.linspace(float(spec['start']), float(spec['stop']), steps)
+    return np.asarray(spec, dtype=np.float64).ravel()
+
+
+def what_if_sweep(model, feature_columns, scaler, base_input, sweeps, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Predict the box office over the Cartesian grid of several input changes.
+
+    The base movie is repeated once per grid point, the swept columns are
+    filled from np.meshgrid, and the whole grid is scored in one vectorized
+    batch.
+
+    Args:
+    - model, feature_columns, scaler: As returned by load_model_and_resources().
+    - base_input (dict): A user_input for the movie being varied.
+    - sweeps (dict): Input field -> sweep spec (see sweep_values), e.g.
+      {'budget': {'start': 30e6, 'stop': 120e6, 'steps': 10}, 'Release year': (2018, 2020, 2022)}.
+
+    Returns:
+    - dict with:
+      - 'fields' (list): Swept fields in grid axis order.
+      - 'values' (list of ndarray): Values tried per field.
+      - 'predictions' (ndarray): Predicted box office, shaped like the grid.
+      - 'base_prediction' (float): Prediction for the unchanged movie.
+      - 'sensitivity' (dict): Field -> {'values', 'mean_prediction' (averaged
+        over the other fields), 'swing' (max - min of that curve)}.
+      - 'best' (dict): {'inputs': swept field -> value, 'prediction'} for the
+        highest prediction on the grid.
+
+    Raises:
+    - KeyError: If base_input or sweeps name an unknown field.
+    - ValueError: If a sweep is empty or the grid exceeds MAX_SWEEP_ROWS.
+    """
+    schema = get_feature_schema(feature_columns)
+    schema.validate(base_input)
+    unknown = [field for field in sweeps if field not in INPUT_COLUMNS]
+    if unknown:
+        raise KeyError(f"Unknown sweep field(s): {unknown}. Expected: {INPUT_COLUMNS}")
+
+    fields = list(sweeps)
+    values = [sweep_values(sweeps[field]) for field in fields]
+    shape = tuple(len(field_values) for field_values in values)
+    if not all(shape):
+        raise ValueError("Every sweep needs at least one value")
+    rows = int(np.prod(shape))
+    if rows > MAX_SWEEP_ROWS:
+        raise ValueError(f"What-if grid has {rows} rows; the limit is {MAX_SWEEP_ROWS}")
+
+    base_row = np.array([float(base_input[col]) for col in INPUT_COLUMNS], dtype=np.float64)
+    raw = np.empty((rows + 1, len(INPUT_COLUMNS)), dtype=np.float64)
+    raw[:] = base_row  # last row stays the unchanged movie
+    for field, axis_values in zip(fields, np.meshgrid(*values, indexing='ij')):
+        raw[:rows, INPUT_COLUMNS.index(field)] = axis_values.ravel()
+
+    predicted = predict_box_office_batch(
+        model, process_user_inputs_batch(raw, feature_columns, scaler), chunk_size)
+    predictions = predicted[:rows].reshape(shape)
+
+    sensitivity = {}
+    for axis, field in enumerate(fields):
+        others = tuple(other for other in range(len(fields)) if other != axis)
+        curve = predictions.mean(axis=others) if others else predictions
+        sensitivity[field] = {
+            'values': values[axis],
+            'mean_prediction': curve,
+            'swing': float(curve.max() - curve.min()),
+        }
+    best = np.unravel_index(int(predictions.argmax()), shape)
+    return {
+        'fields': fields,
+        'values': values,
+        'predictions': predictions,
+        'base_prediction': float(predicted[rows]),
+        'sensitivity': sensitivity,
+        'best': {
+            'inputs': {field: float(values[axis][best[axis]]) for axis, field in enumerate(fields)},
+            'prediction': float(predictions[best]),
+        },
+    }
@@ -0,0 +1,279 @@
+"""
+Password authentication and sessions for the movie CLI.
+
+bcrypt is deliberately slow, so hashing and checking run in a bounded thread
+pool (bcrypt releases the GIL) instead of on the calling thread. The work
+factor is configurable, stored hashes with a different cost are rehashed in
+the background after a successful login, and a login issues a short-lived
+session token that later calls check in memory without touching bcrypt.
+
+Benchmark with:
+    python auth.py --benchmark --rounds 12 --workers 4 --clients 8
+"""
+import argparse
+import os
+import secrets
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from data_store import open_database
+
+DEFAULT_ROUNDS = int(os.environ.get("AUTH_BCRYPT_ROUNDS", 12))
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_MAX_PENDING = 64
+DEFAULT_SESSION_TTL = 30 * 60.0
+
+
+class AuthBusy(Exception):
+    """Raised when too many bcrypt operations are already waiting."""
+
+
+def hash_rounds(hashed):
+    """Return the cost factor of a bcrypt hash, e.g. 12 for b'$2b$12$...'."""
+    return int(hashed.split(b"$")[2])
+
+
+class SessionStore:
+    """
+    In-memory session tokens with an idle timeout.
+
+    Args:
+    - ttl (float): Seconds a session stays valid without being used.
+    """
+
+    def __init__(self, ttl=DEFAULT_SESSION_TTL):
+        self.ttl = ttl
+        self._sessions = {}  # token -> [session dict, expires_at]
+        self._lock = threading.Lock()
+
+    def issue(self, user):
+        """Create a session for a user document and return its token."""
+        token = secrets.token_urlsafe(32)
+        session = {"user_id": user["_id"], "username": user["username"], "role": user.get("role", "user")}
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            self._sessions[token] = [session, now + self.ttl]
+        return token
+
+    def validate(self, token):
+        """
+        Return the session for a token and extend it, or None if the token is
+        unknown or expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._sessions[token]
+                return None
+            entry[1] = now + self.ttl
+            return entry[0]
+
+    def revoke(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def _purge(self, now):
+        # Caller holds _lock.
+        expired = [token for token, (_, expires_at) in self._sessions.items() if expires_at <= now]
+        for token in expired:
+            del self._sessions[token]
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class AuthService:
+    """
+    Registers and authenticates users against db.users.
+
+    Args:
+    - db: The movie_database handle.
+    - rounds (int): bcrypt work factor for new and rehashed passwords.
+    - workers (int): Threads running bcrypt.
+    - max_pending (int): Maximum bcrypt operations queued or running; further
+      calls raise AuthBusy instead of queueing without limit.
+    - session_ttl (float): Idle timeout of session tokens in seconds.
+    """
+
+    def __init__(self, db, rounds=DEFAULT_ROUNDS, workers=DEFAULT_WORKERS,
+                 max_pending=DEFAULT_MAX_PENDING, session_ttl=DEFAULT_SESSION_TTL):
+        self.db = db
+        self.rounds = rounds
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.sessions = SessionStore(session_ttl)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._dummy = None
+        self.rehashes = 0
+
+    @property
+    def _dummy_hash(self):
+        # Checked against when the username does not exist, so unknown users
+        # take as long to reject as wrong passwords. Made on first use so
+        # constructing the service (at CLI import) costs no bcrypt round.
+        if self._dummy is None:
+            self._dummy = bcrypt.hashpw(b"", bcrypt.gensalt(self.rounds))
+        return self._dummy
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise AuthBusy("Too many authentication requests in progress.")
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash_password(self, password):
+        """Hash a password with the configured cost (runs in the pool)."""
+        return self._submit(bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt(self.rounds)).result()
+
+    def check_password(self, password, hashed):
+        """Check a password against a stored hash (runs in the pool)."""
+        return self._submit(bcrypt.checkpw, password.encode("utf-8"), hashed).result()
+
+    def register(self, username, password, role="user"):
+        """
+        Create a user with a hashed password.
+
+        Returns:
+        - dict: The inserted user document.
+
+        Raises:
+        - DuplicateKeyError: If the username is taken (users.username is uniquely indexed).
+        """
+        user = {"username": username, "password": self.hash_password(password), "role": role}
+        self.db.users.insert_one(user)
+        return user
+
+    def authenticate(self, username, password):
+        """
+        Check a username and password and open a session.
+
+        Returns:
+        - tuple: (user document, session token), or None if the credentials are wrong.
+        """
+        user = self.db.users.find_one({"username": username})
+        hashed = user["password"] if user else self._dummy_hash
+        if not self.check_password(password, hashed) or not user:
+            return None
+        if hash_rounds(hashed) != self.rounds:
+            self._rehash(user["_id"], hashed, password)
+        return user, self.sessions.issue(user)
+
+    def _rehash(self, user_id, old_hash, password):
+        """Store the password again with the configured cost, off the login path."""
+        def rehash():
+            new_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(self.rounds))
+            # Only replace the hash we checked, in case the password changed meanwhile.
+            result = self.db.users.update_one({"_id": user_id, "password": old_hash},
+                                              {"$set": {"password": new_hash}})
+            self.rehashes += result.modified_count
+        try:
+            self._submit(rehash)
+        except AuthBusy:
+            pass  # Try again on a later login.
+
+    def session(self, token):
+        """Return the session for a token, or None if it is missing or expired."""
+        return self.sessions.validate(token) if token else None
+
+    def logout(self, token):
+        self.sessions.revoke(token)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def benchmark(rounds=DEFAULT_ROUNDS, workers=DEFAULT_WORKERS, logins=None, clients=None, db=None):
+    """
+    Measure AuthService.authenticate() as the CLI calls it (user lookup,
+    password check in the bcrypt pool, session issue), from several
+    concurrent clients, and session checks for comparison.
+
+    Args:
+    - rounds (int): bcrypt work factor.
+    - workers (int): bcrypt pool threads.
+    - logins (int, optional): Number of logins (default 4 per client).
+    - clients (int, optional): Threads calling authenticate() concurrently (default workers).
+    - db (optional): Database holding the benchmark user (default an in-memory one).
+
+    Returns:
+    - dict: median_ms and p95_ms login latency, logins_per_second over the
+      wall-clock time of all logins, logins_per_second_per_core (the same
+      divided by the cores bcrypt can use, min(workers, CPU count)) and
+      session_checks_per_second.
+    """
+    clients = clients or workers
+    logins = logins or 4 * clients
+    db = db if db is not None else open_database("memory", name="auth_benchmark")
+    service = AuthService(db, rounds=rounds, workers=workers, max_pending=max(DEFAULT_MAX_PENDING, clients))
+    try:
+        db.users.delete_many({"username": "benchmark-user"})
+        service.register("benchmark-user", "benchmark-password")
+        service.authenticate("benchmark-user", "benchmark-password")  # warm up
+
+        def timed_login(_):
+            login_start = time.perf_counter()
+            assert service.authenticate("benchmark-user", "benchmark-password") is not None
+            return (time.perf_counter() - login_start) * 1000
+
+        with ThreadPoolExecutor(max_workers=clients) as callers:
+            start = time.perf_counter()
+            latencies = sorted(callers.map(timed_login, range(logins)))
+            elapsed = time.perf_counter() - start
+
+        _, token = service.authenticate("benchmark-user", "benchmark-password")
+        checks = 100000
+        session_start = time.perf_counter()
+        for _ in range(checks):
+            service.session(token)
+        session_elapsed = time.perf_counter() - session_start
+    finally:
+        db.users.delete_many({"username": "benchmark-user"})
+        service.close()
+
+    return {
+        "rounds": rounds,
+        "workers": workers,
+        "clients": clients,
+        "logins": logins,
+        "median_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "logins_per_second": logins / elapsed,
+        "logins_per_second_per_core": logins / elapsed / min(workers, os.cpu_count() or 1),
+        "session_checks_per_second": checks / session_elapsed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Authentication utilities.")
+    parser.add_argument("--benchmark", action="store_true", help="Measure login latency and throughput")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="bcrypt work factor")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="bcrypt pool threads")
+    parser.add_argument("--logins", type=int, default=None, help="Number of logins")
+    parser.add_argument("--clients", type=int, default=None, help="Concurrent login callers (default --workers)")
+    parser.add_argument("--uri", default=None, help="MongoDB connection string (default: in-memory database)")
+    parser.add_argument("--db", default=None, help="Database name")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        database = open_database(uri=args.uri, name=args.db) if args.uri or args.db else None
+        result = benchmark(args.rounds, args.workers, args.logins, args.clients, database)
+        print(f"bcrypt cost {result['rounds']}, {result['workers']} worker(s), "
+              f"{result['clients']} client(s), {result['logins']} logins:")
+        print(f"  latency median {result['median_ms']:.0f} ms, p95 {result['p95_ms']:.0f} ms")
+        print(f"  {result['logins_per_second']:.1f} logins/s "
+              f"({result['logins_per_second_per_core']:.1f} per core)")
+        print(f"  {result['session_checks_per_second']:,.0f} session checks/s")
+    else:
+        parser.print_help()
@@ -0,0 +1,319 @@
+"""
+Benchmark suite for the movie system's hot paths.
+
+For each requested scale a synthetic catalog (synthetic_data.py) is ingested
+into a scratch database, in memory by default, and the suite times:
+
+- ingestion of the scaled CSV,
+- the list_movies path: facets and the first listing page, cold and cached,
+- the search_movies path: title index build, then search plus the first page,
+- login (bcrypt check and session lookup),
+- process_user_input and predict_box_office for single rows and batches,
+  with both inference engines.
+
+Results are written as JSON. With --baseline they are compared against an
+earlier run, and any median slower than the baseline by more than --threshold
+is reported as a regression (exit status 1).
+
+Run with:
+    python benchmarks.py --scales 1,10 --output results.json
+    python benchmarks.py --scales 1,10 --baseline baseline.json --threshold 0.2
+    python benchmarks.py --scales 100,1000 --backend mongo --uri mongodb://localhost:27017/
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from auth import DEFAULT_ROUNDS, AuthService
+from data_store import open_database
+from db_indexes import ensure_indexes
+from facets import FacetService
+from ingest import ingest_movies
+from movie_interface import LISTING_PROJECTION, PAGE_SIZE
+from pagination import iter_keyset
+from query_cache import QueryCache
+from synthetic_data import DEFAULT_SEED, write_scaled
+from title_search import TitleIndex
+
+DEFAULT_SCALES = (1, 10)
+DEFAULT_THRESHOLD = 0.20
+DEFAULT_REPEAT = 50
+BATCH_SIZE = 1000
+
+# Shortest loop timed as one sample; faster calls are repeated until it is reached.
+MIN_SAMPLE_MS = 5.0
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SAMPLE_INPUT = {
+    'Running time': 120,
+    'budget': 50000000,
+    'Actors Box Office %': 50.0,
+    'Director Box Office %': 69.23,
+    'Oscar and Golden Globes nominations': 0,
+    'Release year': 2016,
+    'IMDb score': 7.4,
+}
+
+
+def measure(fn, repeat=DEFAULT_REPEAT, warmup=1):
+    """
+    Time repeated calls of fn.
+
+    Fast functions are called in loops long enough to time reliably
+    (MIN_SAMPLE_MS per sample, as timeit's autorange does) and each sample is
+    the per-call average of its loop.
+
+    Returns:
+    - dict: median_ms, p95_ms, min_ms, ops_per_s, runs (samples) and loops (calls per sample).
+    """
+    for _ in range(warmup):
+        fn()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if (time.perf_counter() - start) * 1000 >= MIN_SAMPLE_MS or number >= 1 << 20:
+            break
+        number *= 10
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) * 1000 / number)
+    samples.sort()
+    median = statistics.median(samples)
+    return {
+        "median_ms": median,
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_ms": samples[0],
+        "ops_per_s": 1000 / median if median else None,
+        "runs": repeat,
+        "loops": number,
+    }
+
+
+def bench_ml(repeat=DEFAULT_REPEAT):
+    """Time feature processing and prediction with each inference engine."""
+    import numpy as np
+
+    import ML_Api
+
+    results = {}
+    batch = [dict(SAMPLE_INPUT, budget=SAMPLE_INPUT['budget'] + i * 1000) for i in range(BATCH_SIZE)]
+    matrix = np.array([[row[column] for column in ML_Api.INPUT_COLUMNS] for row in batch], dtype=np.float64)
+    for engine in ML_Api.ENGINES:
+        try:
+            model, features, scaler = ML_Api.load_model_and_resources(engine)
+        except FileNotFoundError:
+            continue  # 'mmap' before the arrays have been exported
+        results[f"process_user_input[{engine}]"] = measure(
+            lambda: ML_Api.process_user_input(SAMPLE_INPUT, features, scaler), repeat)
+        input_scaled = ML_Api.process_user_input(SAMPLE_INPUT, features, scaler)
+
+        def predict_single():
+            # predict_box_office prints its results; keep them off the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                ML_Api.predict_box_office(model, input_scaled)
+        results[f"predict_box_office.single[{engine}]"] = measure(predict_single, repeat)
+
+        results[f"predict_box_office.batch{BATCH_SIZE}[{engine}]"] = measure(
+            lambda: ML_Api.predict_box_office_batch(
+                model, ML_Api.process_user_inputs_batch(batch, features, scaler)),
+            max(5, repeat // 5))
+        results[f"predict_box_office.batch{BATCH_SIZE}_ndarray[{engine}]"] = measure(
+            lambda: ML_Api.predict_box_office_batch(
+                model, ML_Api.process_user_inputs_batch(matrix, features, scaler)),
+            max(5, repeat // 5))
+    return results
+
+
+def bench_login(db, repeat=5):
+    """Time a full login (user lookup + bcrypt check) and a session check."""
+    auth = AuthService(db, rounds=DEFAULT_ROUNDS)
+    try:
+        db.users.delete_many({"username": "benchmark-user"})
+        auth.register("benchmark-user", "benchmark-password")
+        results = {
+            f"login[bcrypt {DEFAULT_ROUNDS}]": measure(
+                lambda: auth.authenticate("benchmark-user", "benchmark-password"), repeat),
+        }
+        _, token = auth.authenticate("benchmark-user", "benchmark-password")
+        results["login.session_check"] = measure(lambda: auth.session(token))
+        return results
+    finally:
+        db.users.delete_many({"username": "benchmark-user"})
+        auth.close()
+
+
+def bench_catalog(db, repeat=DEFAULT_REPEAT):
+    """Time the list_movies and search_movies paths against an ingested catalog."""
+    results = {}
+    genre_query = {"genre": {"$regex": "^action$", "$options": "i"}}
+
+    def first_page(query, sort_key, sort_order, cache=None):
+        return list(iter_keyset(db.movie, query, sort_key, sort_order, page_size=PAGE_SIZE,
+                                projection=LISTING_PROJECTION, limit=PAGE_SIZE, cache=cache))
+
+    results["list_movies.facets_cold"] = measure(lambda: FacetService(db).get(), max(3, repeat // 10))
+    facet_service = FacetService(db)
+    results["list_movies.facets_cached"] = measure(facet_service.get, repeat)
+    results["list_movies.first_page_cold"] = measure(
+        lambda: first_page(genre_query, "release_year", -1), repeat)
+    cache = QueryCache()
+    results["list_movies.first_page_cached"] = measure(
+        lambda: first_page(genre_query, "release_year", -1, cache), repeat)
+    results["list_movies.box_office_first_page"] = measure(
+        lambda: first_page({}, "performance.final_box_office", -1), repeat)
+
+    results["search_movies.build_index"] = measure(lambda: TitleIndex().build(db), 3, warmup=0)
+    index = TitleIndex().build(db)
+    results["search_movies.search"] = measure(lambda: index.search("the"), repeat)
+    results["search_movies.first_page"] = measure(
+        lambda: first_page({"_id": {"$in": index.search("man")}}, "title", 1), repeat)
+    results["search_movies.autocomplete"] = measure(lambda: index.autocomplete("star w"), repeat)
+    return results
+
+
+def bench_scale(scale, backend, uri, workdir, seed=DEFAULT_SEED, repeat=DEFAULT_REPEAT):
+    """Ingest a catalog at one scale into a scratch database and time the catalog paths."""
+    csv_path = os.path.join(workdir, f"movies_x{scale}.csv")
+    rows = write_scaled(csv_path, scale, seed)
+    db = open_database(backend, uri=uri, name=f"movie_benchmark_x{scale}")
+    for name in db.list_collection_names():
+        db.drop_collection(name)
+    try:
+        ensure_indexes(db)
+        start = time.perf_counter()
+        ingest_movies(db, csv_path)
+        elapsed = time.perf_counter() - start
+        results = {
+            "ingest": {
+                "median_ms": elapsed * 1000,
+                "rows": rows,
+                "rows_per_s": rows / elapsed,
+                "runs": 1,
+            },
+        }
+        results.update(bench_catalog(db, repeat))
+        return results
+    finally:
+        for name in db.list_collection_names():
+            db.drop_collection(name)
+        os.remove(csv_path)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PACKAGE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales=DEFAULT_SCALES, backend="memory", uri=None, seed=DEFAULT_SEED, repeat=DEFAULT_REPEAT):
+    """
+    Run the whole suite.
+
+    Returns:
+    - dict: {'meta': {...}, 'results': {benchmark name: timings}}. Catalog
+      benchmarks are prefixed with their scale, e.g. 'x10/list_movies.first_page_cold'.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in scales:
+            for name, timing in bench_scale(scale, backend, uri, workdir, seed, repeat).items():
+                results[f"x{scale}/{name}"] = timing
+    results.update(bench_login(open_database(backend, uri=uri, name="movie_benchmark_login")))
+    results.update(bench_ml(repeat))
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "backend": backend,
+            "scales": list(scales),
+            "seed": seed,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare median timings against a baseline run.
+
+    Returns:
+    - list of tuple: (name, baseline_ms, current_ms, change, regressed) for
+      benchmarks present in both runs; change is the relative slowdown.
+    """
+    rows = []
+    for name, timing in current["results"].items():
+        previous = baseline["results"].get(name)
+        if not previous or not previous.get("median_ms"):
+            continue
+        change = timing["median_ms"] / previous["median_ms"] - 1
+        rows.append((name, previous["median_ms"], timing["median_ms"], change, change > threshold))
+    return rows
+
+
+def print_results(report):
+    print(f"{'Benchmark':<58} {'Median ms':>12} {'p95 ms':>10} {'ops/s':>12}")
+    print("-" * 95)
+    for name, timing in report["results"].items():
+        p95 = f"{timing['p95_ms']:.3f}" if "p95_ms" in timing else ""
+        rate = timing.get("ops_per_s") or timing.get("rows_per_s")
+        print(f"{name:<58} {timing['median_ms']:>12.3f} {p95:>10} {rate:>12,.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the movie system's hot paths.")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="Comma-separated catalog scales relative to movies_data.csv (e.g. 1,10,100,1000)")
+    parser.add_argument("--backend", default="memory", help="Database backend: memory or mongo")
+    parser.add_argument("--uri", default=None, help="MongoDB connection string (mongo backend)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Synthetic data seed")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed calls per benchmark")
+    parser.add_argument("--output", default=None, help="Write results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Compare against this results JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown flagged as a regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    # The pickled model was saved with an older scikit-learn
+    import warnings
+    warnings.filterwarnings("ignore", message="Trying to unpickle estimator")
+
+    report = run([int(scale) for scale in args.scales.split(",")], args.backend, args.uri, args.seed, args.repeat)
+    print_results(report)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        rows = compare(report, baseline, args.threshold)
+        regressions = [row for row in rows if row[4]]
+        print(f"\nCompared with {args.baseline} (commit {baseline['meta'].get('commit')}):")
+        for name, before, after, change, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<58} {before:>10.3f} -> {after:>10.3f} ms  {change:+7.1%}{flag}")
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}.")
+            sys.exit(1)
+        print("\nNo regressions.")
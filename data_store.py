@@ -0,0 +1,203 @@
+"""
+Database handles for the movie system.
+
+open_database() returns either a MongoDB database that only connects when it
+is first used, with the client's connection pool configured from arguments or
+environment variables, or an in-memory database (memory_backend.py) with the
+same API. Every module that takes a `db` handle works with either, so the CLI,
+loaders and benchmarks can run without a mongod.
+
+Environment variables:
+    MOVIE_DB_BACKEND          mongo (default) or memory
+    MOVIE_DB_URI              MongoDB connection string
+    MOVIE_DB_NAME             Database name
+    MOVIE_DB_MAX_POOL_SIZE    Connections per server (default 50)
+    MOVIE_DB_MIN_POOL_SIZE    Connections kept open when idle (default 0)
+    MOVIE_DB_TIMEOUT_MS       Server selection and connect timeout (default 5000)
+    MOVIE_DB_SOCKET_TIMEOUT_MS  Per-operation socket timeout (default none)
+    MOVIE_DB_READ_PREFERENCE  e.g. primary, primaryPreferred, secondaryPreferred
+
+With MOVIE_METRICS=1 MongoDB clients also get the command listener from
+metrics.py, which records the latency and result size of every command.
+
+Bulk writes should use the operation classes below (InsertOne, UpdateOne, ...)
+instead of pymongo's: they are pymongo operations, so MongoDB accepts them
+unchanged, but they also keep their arguments in a public `arguments` tuple,
+which is what the in-memory backend reads.
+"""
+import os
+import threading
+
+import pymongo
+from pymongo import MongoClient
+
+import metrics
+
+BACKENDS = ("mongo", "memory")
+
+
+class InsertOne(pymongo.InsertOne):
+    """pymongo.InsertOne keeping `arguments` = (document,)."""
+
+    def __init__(self, document):
+        super().__init__(document)
+        self.arguments = (document,)
+
+
+class UpdateOne(pymongo.UpdateOne):
+    """pymongo.UpdateOne keeping `arguments` = (filter, update, upsert)."""
+
+    def __init__(self, filter, update, upsert=False, **options):
+        super().__init__(filter, update, upsert=upsert, **options)
+        self.arguments = (filter, update, upsert)
+
+
+class UpdateMany(pymongo.UpdateMany):
+    """pymongo.UpdateMany keeping `arguments` = (filter, update, upsert)."""
+
+    def __init__(self, filter, update, upsert=False, **options):
+        super().__init__(filter, update, upsert=upsert, **options)
+        self.arguments = (filter, update, upsert)
+
+
+class ReplaceOne(pymongo.ReplaceOne):
+    """pymongo.ReplaceOne keeping `arguments` = (filter, replacement, upsert)."""
+
+    def __init__(self, filter, replacement, upsert=False, **options):
+        super().__init__(filter, replacement, upsert=upsert, **options)
+        self.arguments = (filter, replacement, upsert)
+
+
+class DeleteOne(pymongo.DeleteOne):
+    """pymongo.DeleteOne keeping `arguments` = (filter,)."""
+
+    def __init__(self, filter, **options):
+        super().__init__(filter, **options)
+        self.arguments = (filter,)
+
+
+class DeleteMany(pymongo.DeleteMany):
+    """pymongo.DeleteMany keeping `arguments` = (filter,)."""
+
+    def __init__(self, filter, **options):
+        super().__init__(filter, **options)
+        self.arguments = (filter,)
+
+DEFAULT_BACKEND = os.environ.get("MOVIE_DB_BACKEND", "mongo")
+MONGO_URI = os.environ.get("MOVIE_DB_URI", "mongodb://localhost:27017/")
+DATABASE_NAME = os.environ.get("MOVIE_DB_NAME", "movie_database")
+
+
+def pool_options():
+    """
+    MongoClient pool and timeout options from the environment.
+
+    Returns:
+    - dict: Keyword arguments for MongoClient.
+    """
+    timeout_ms = int(os.environ.get("MOVIE_DB_TIMEOUT_MS", 5000))
+    options = {
+        "maxPoolSize": int(os.environ.get("MOVIE_DB_MAX_POOL_SIZE", 50)),
+        "minPoolSize": int(os.environ.get("MOVIE_DB_MIN_POOL_SIZE", 0)),
+        "serverSelectionTimeoutMS": timeout_ms,
+        "connectTimeoutMS": timeout_ms,
+        "readPreference": os.environ.get("MOVIE_DB_READ_PREFERENCE", "primary"),
+    }
+    if os.environ.get("MOVIE_DB_SOCKET_TIMEOUT_MS"):
+        options["socketTimeoutMS"] = int(os.environ["MOVIE_DB_SOCKET_TIMEOUT_MS"])
+    return options
+
+
+class LazyDatabase:
+    """
+    A MongoDB database whose client is only created on first use.
+
+    Attribute and item access (db.movie, db["users"]) are forwarded to the
+    pymongo Database, connecting first if needed.
+
+    Args:
+    - uri (str): MongoDB connection string.
+    - name (str): Database name.
+    - **client_options: MongoClient options (pool size, timeouts, read preference).
+    """
+
+    def __init__(self, uri=MONGO_URI, name=DATABASE_NAME, **client_options):
+        self.uri = uri
+        self.name = name
+        self.client_options = client_options
+        self._client = None
+        self._database = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Create the client if it does not exist yet and return the pymongo Database."""
+        if self._database is None:
+            with self._lock:
+                if self._database is None:
+                    self._client = MongoClient(self.uri, **self.client_options)
+                    self._database = self._client[self.name]
+        return self._database
+
+    @property
+    def connected(self):
+        return self._database is not None
+
+    @property
+    def client(self):
+        self.connect()
+        return self._client
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.connect(), name)
+
+    def __getitem__(self, name):
+        return self.connect()[name]
+
+    def __repr__(self):
+        state = "connected" if self.connected else "not connected"
+        return f"LazyDatabase({self.uri!r}, {self.name!r}, {state})"
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+            self._client = None
+            self._database = None
+
+
+# In-memory databases by name, so every open_database() call in a process
+# sees the same data, as it would with one mongod.
+_memory_databases = {}
+_memory_lock = threading.Lock()
+
+
+def open_database(backend=None, uri=None, name=None, **client_options):
+    """
+    Return a database handle for the configured backend.
+
+    Args:
+    - backend (str, optional): 'mongo' or 'memory' (default: MOVIE_DB_BACKEND).
+    - uri (str, optional): MongoDB connection string (mongo only).
+    - name (str, optional): Database name.
+    - **client_options: MongoClient options overriding pool_options() (mongo only).
+
+    Returns:
+    - LazyDatabase or MemoryDatabase: A handle with the pymongo Database API.
+    """
+    backend = backend or DEFAULT_BACKEND
+    name = name or DATABASE_NAME
+    if backend == "memory":
+        from memory_backend import MemoryDatabase
+        with _memory_lock:
+            if name not in _memory_databases:
+                _memory_databases[name] = MemoryDatabase(name)
+            return _memory_databases[name]
+    if backend == "mongo":
+        options = {**pool_options(), **client_options}
+        listeners = metrics.command_listeners()
+        if listeners:
+            options["event_listeners"] = list(options.get("event_listeners", ())) + listeners
+        return LazyDatabase(uri or MONGO_URI, name, **options)
+    raise ValueError(f"Unknown database backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
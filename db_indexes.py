@@ -0,0 +1,174 @@
+"""
+Index provisioning and query-plan report for movie_database.
+
+Run with:
+    python db_indexes.py            # create any missing indexes
+    python db_indexes.py --explain  # also print the plan of each standard query
+"""
+import argparse
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from data_store import open_database
+
+# Indexes needed by the queries in movie_interface.py, per collection.
+INDEXES = {
+    "movie": [
+        # Sort keys are paired with _id so keyset pagination is index-backed.
+        IndexModel([("title", ASCENDING), ("_id", ASCENDING)], name="title_id"),
+        IndexModel([("genre", ASCENDING), ("release_year", ASCENDING)], name="genre_release_year"),
+        IndexModel([("release_year", ASCENDING), ("_id", ASCENDING)], name="release_year_id"),
+        IndexModel([("imdb_score", ASCENDING), ("_id", ASCENDING)], name="imdb_score_id"),
+        IndexModel([("budget", ASCENDING), ("_id", ASCENDING)], name="budget_id"),
+        IndexModel([("performance.final_box_office", ASCENDING), ("_id", ASCENDING)],
+                   name="performance_final_box_office_id"),
+    ],
+    "movie_performance": [
+        # Unique: ingest.py upserts on movie_id, and reruns must not add rows.
+        IndexModel([("movie_id", ASCENDING)], name="movie_id", unique=True),
+        IndexModel([("final_box_office", ASCENDING)], name="final_box_office"),
+    ],
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("last_login", DESCENDING)], name="last_login"),
+    ],
+    "feature_usage": [
+        IndexModel([("feature_name", ASCENDING)], name="feature_name"),
+        IndexModel([("user_id", ASCENDING), ("interaction_date", DESCENDING)], name="user_interaction_date"),
+    ],
+    "feature_usage_daily": [
+        IndexModel([("feature_name", ASCENDING), ("date", ASCENDING), ("outcome", ASCENDING)],
+                   name="feature_date_outcome_unique", unique=True),
+        IndexModel([("date", ASCENDING)], name="date"),
+    ],
+}
+
+
+def _drop_redefined(collection, indexes):
+    """Drop existing indexes declared again under the same name with other keys or uniqueness."""
+    existing = collection.index_information()
+    for model in indexes:
+        spec = model.document
+        info = existing.get(spec["name"])
+        if info is None:
+            continue
+        same_keys = [tuple(key) for key in info["key"]] == list(spec["key"].items())
+        if not same_keys or bool(info.get("unique")) != bool(spec.get("unique")):
+            collection.drop_index(spec["name"])
+
+
+def ensure_indexes(db, verbose=False):
+    """
+    Create the declared indexes. Existing indexes with the same definition are
+    left untouched, so this is safe to call at every startup.
+
+    Args:
+    - db: The movie_database handle.
+    - verbose (bool): Print each collection's index names.
+
+    Returns:
+    - list of str: Collections whose indexes could not be created.
+    """
+    failed = []
+    for collection, indexes in INDEXES.items():
+        try:
+            _drop_redefined(db[collection], indexes)
+            names = db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. duplicate usernames already stored block the unique index
+            print(f"Could not create indexes on '{collection}': {e}")
+            failed.append(collection)
+            continue
+        if verbose:
+            print(f"{collection:<20} {', '.join(names)}")
+    return failed
+
+
+def standard_queries():
+    """
+    The queries movie_interface.py issues, as (name, collection, kind, spec).
+
+    kind is 'find' (spec = (filter, sort)) or 'aggregate' (spec = pipeline).
+    """
+    return [
+        ("login/signup user lookup", "users", "find", ({"username": "example"}, None)),
+        ("active users", "users", "find", ({"last_login": {"$gte": "2024-11-01"}}, [("last_login", -1)])),
+        ("movie by exact title", "movie", "find", ({"title": "Inception"}, None)),
+        ("performance by movie_id", "movie_performance", "find", ({"movie_id": None}, None)),
+        ("filter by year and score", "movie", "find",
+         ({"release_year": {"$gte": 2000, "$lte": 2010}, "imdb_score": {"$gte": 7.0}}, [("release_year", -1)])),
+        ("list movies by genre", "movie", "find",
+         ({"genre": {"$regex": "^Action$", "$options": "i"}}, [("release_year", -1)])),
+        ("top movies by box office", "movie", "find",
+         ({}, [("performance.final_box_office", -1)])),
+        # search_result_ids/iter_search_pages: title index matches fetched by _id,
+        # one page (or sort-field batch) at a time, ordered in memory
+        ("search page by _id (title index)", "movie", "find",
+         ({"_id": {"$in": []}}, None)),
+        ("feature usage rollups by date", "feature_usage_daily", "find",
+         ({"date": {"$gte": "2024-01-01", "$lte": "2024-12-31"}}, None)),
+    ]
+
+
+def _plan_stages(plan, in_winning_plan=False):
+    """Collect the 'stage' names of every winning plan in an explain document."""
+    stages = []
+    if isinstance(plan, dict):
+        if in_winning_plan and isinstance(plan.get("stage"), str):
+            stages.append(plan["stage"])
+        for key, value in plan.items():
+            if key == "rejectedPlans":
+                continue
+            stages.extend(_plan_stages(value, in_winning_plan or key == "winningPlan"))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value, in_winning_plan))
+    return stages
+
+
+def explain_query(db, collection, kind, spec):
+    """
+    Return the plan stages MongoDB would use for one query.
+
+    Returns:
+    - list of str: Stage names, e.g. ['FETCH', 'IXSCAN'] or ['COLLSCAN'].
+    """
+    if kind == "find":
+        query, sort = spec
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain()
+    else:
+        plan = db.command({
+            "explain": {"aggregate": collection, "pipeline": spec, "cursor": {}},
+            "verbosity": "queryPlanner",
+        })
+    return _plan_stages(plan)
+
+
+def explain_report(db):
+    """Print the plan of each standard query and flag the ones doing a COLLSCAN."""
+    print(f"\n{'Query':<40} {'Collection':<20} {'Scan':<9} Stages")
+    print("-" * 110)
+    collscans = 0
+    for name, collection, kind, spec in standard_queries():
+        stages = explain_query(db, collection, kind, spec)
+        scan = "COLLSCAN" if "COLLSCAN" in stages else "IXSCAN" if "IXSCAN" in stages else "-"
+        collscans += scan == "COLLSCAN"
+        print(f"{name:<40} {collection:<20} {scan:<9} {' > '.join(dict.fromkeys(stages))}")
+    print(f"\n{collscans} quer{'y' if collscans == 1 else 'ies'} still doing a COLLSCAN.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create movie_database indexes and report query plans.")
+    parser.add_argument("--explain", action="store_true", help="Print explain() output for the standard queries")
+    parser.add_argument("--uri", default=None, help="MongoDB connection string")
+    parser.add_argument("--db", default=None, help="Database name")
+    args = parser.parse_args()
+
+    database = open_database(uri=args.uri, name=args.db)
+    ensure_indexes(database, verbose=True)
+    if args.explain:
+        explain_report(database)
@@ -0,0 +1,187 @@
+"""
+Write-behind logger for feature usage events and last_login updates.
+
+Calls from the CLI only enqueue; a background thread writes batches with
+insert_many/bulk_write once a size or time limit is reached. The queue is
+bounded and full-queue events are dropped (and counted) rather than making
+the user wait on telemetry. A batch whose write fails is logged and kept for
+the next flush, as far as the same bound allows.
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+from data_store import UpdateOne
+from usage_rollups import record_events
+
+DEFAULT_MAX_BATCH = 100
+DEFAULT_FLUSH_INTERVAL = 2.0
+DEFAULT_MAX_QUEUE = 10000
+
+logger = logging.getLogger(__name__)
+
+
+class EventLogger:
+    """
+    Buffers feature_usage events and last_login touches.
+
+    Args:
+    - db: The movie_database handle.
+    - max_batch (int): Flush once this many items are pending.
+    - flush_interval (float): Flush at least this often (seconds) while items are pending.
+    - max_queue (int): Maximum queued items, and maximum items kept for a
+      retry after a failed write; further items are dropped.
+    """
+
+    def __init__(self, db, max_batch=DEFAULT_MAX_BATCH, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_queue=DEFAULT_MAX_QUEUE):
+        self.db = db
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._events = []
+        self._logins = {}  # user _id -> last_login date (later touches win)
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._retry_at = 0.0  # no size-triggered flush before this, after a failure
+        self.dropped = 0
+        self.written = 0
+        self.write_errors = 0
+        self.last_error = None
+
+    def start(self):
+        """Start the background flush thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="event-logger", daemon=True)
+            self._thread.start()
+        return self
+
+    def _enqueue(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def log(self, user_id, feature_name, details="", outcome="N/A"):
+        """Queue a feature_usage event (never blocks)."""
+        self._enqueue(("event", {
+            "user_id": user_id,
+            "feature_name": feature_name,
+            "interaction_date": datetime.now().strftime("%Y-%m-%d"),
+            "interaction_details": details,
+            "prediction_outcome": outcome,
+        }))
+
+    def touch_login(self, user_id, date=None):
+        """Queue a last_login update for a user _id (never blocks)."""
+        self._enqueue(("login", (user_id, date or datetime.now().strftime("%Y-%m-%d"))))
+
+    def _add_pending(self, item):
+        # Caller holds _pending_lock.
+        kind, payload = item
+        if kind == "event":
+            self._events.append(payload)
+        else:
+            user_id, date = payload
+            self._logins[user_id] = date
+
+    def _drain_queue(self, first=None):
+        """Move everything queued into the pending buffers; return the pending count."""
+        with self._pending_lock:
+            if first is not None:
+                self._add_pending(first)
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._add_pending(item)
+            return len(self._events) + len(self._logins)
+
+    def _requeue(self, events, logins):
+        """Put items whose write failed back in front of the pending ones, up to max_queue."""
+        with self._pending_lock:
+            merged = dict(logins)
+            merged.update(self._logins)  # touches queued since are newer
+            self._logins = merged
+            room = max(self.max_queue - len(self._events) - len(self._logins), 0)
+            kept = events[:room]
+            self._events = kept + self._events
+            self.dropped += len(events) - len(kept)
+
+    def flush(self):
+        """
+        Write everything queued so far.
+
+        Returns:
+        - bool: False if a write failed (the items are kept for the next flush).
+        """
+        with self._write_lock:
+            self._drain_queue()
+            with self._pending_lock:
+                events, self._events = self._events, []
+                logins, self._logins = self._logins, {}
+            try:
+                if events:
+                    record_events(self.db, events)
+                    self.written += len(events)
+                    events = []
+                if logins:
+                    self.db.users.bulk_write(
+                        [UpdateOne({"_id": user_id}, {"$set": {"last_login": date}})
+                         for user_id, date in logins.items()],
+                        ordered=False,
+                    )
+                    self.written += len(logins)
+                    logins = {}
+            except Exception as e:
+                # Telemetry must never break the CLI; keep the batch and retry later.
+                self.write_errors += 1
+                self.last_error = e
+                self._retry_at = time.monotonic() + self.flush_interval
+                logger.warning("Writing %d usage events and %d login updates failed, will retry: %r",
+                               len(events), len(logins), e)
+                self._requeue(events, logins)
+                return False
+            return True
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=min(timeout, self.flush_interval))
+            except queue.Empty:
+                item = None
+            pending = self._drain_queue(first=item)
+            now = time.monotonic()
+            if pending and now >= self._retry_at and (pending >= self.max_batch or now >= deadline):
+                self.flush()
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+    def close(self):
+        """Stop the background thread and write anything still pending."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if not self.flush():
+            with self._pending_lock:
+                lost = len(self._events) + len(self._logins)
+                self._events, self._logins = [], {}
+            self.dropped += lost
+            logger.warning("Dropped %d usage events and login updates that could not be written", lost)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+        }
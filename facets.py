@@ -0,0 +1,109 @@
+"""
+Facet metadata for the movie filter screen.
+
+Genre counts, value ranges and histograms are computed in a single $facet
+aggregation and cached in the process until the catalog version changes, so
+opening the filter screen normally costs no database queries.
+"""
+import threading
+import time
+
+from query_cache import catalog_version
+
+DEFAULT_TTL = 300.0
+
+# Numeric fields with a range and a histogram on the filter screen, and the
+# width of their histogram buckets.
+HISTOGRAM_WIDTHS = {
+    "release_year": 10,
+    "imdb_score": 1,
+    "budget": 50000000,
+}
+RANGE_FIELDS = tuple(HISTOGRAM_WIDTHS)
+
+
+def facet_pipeline(widths=HISTOGRAM_WIDTHS):
+    """Build the single-pass $facet pipeline over the movie collection."""
+    ranges = {"_id": None}
+    for field in RANGE_FIELDS:
+        ranges[f"min_{field}"] = {"$min": f"${field}"}
+        ranges[f"max_{field}"] = {"$max": f"${field}"}
+    facets = {
+        "genres": [
+            {"$group": {"_id": "$genre", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+        ],
+        "ranges": [{"$group": ranges}],
+    }
+    for field, width in widths.items():
+        facets[f"{field}_histogram"] = [
+            {"$match": {field: {"$type": "number"}}},
+            {"$group": {
+                "_id": {"$multiply": [{"$floor": {"$divide": [f"${field}", width]}}, width]},
+                "count": {"$sum": 1},
+            }},
+            {"$sort": {"_id": 1}},
+        ]
+    return [{"$facet": facets}]
+
+
+def _parse(result, widths=HISTOGRAM_WIDTHS):
+    ranges = result["ranges"][0] if result["ranges"] else {}
+    facets = {
+        "genres": [(genre["_id"], genre["count"]) for genre in result["genres"] if genre["_id"]],
+        "ranges": {
+            field: (ranges.get(f"min_{field}"), ranges.get(f"max_{field}"))
+            for field in RANGE_FIELDS
+        },
+        "histograms": {},
+    }
+    for field, width in widths.items():
+        facets["histograms"][field] = [
+            (bucket["_id"], bucket["_id"] + width, bucket["count"])
+            for bucket in result[f"{field}_histogram"]
+        ]
+    return facets
+
+
+class FacetService:
+    """
+    Caches the filter-screen facets and refreshes them after catalog writes.
+
+    Args:
+    - db: The movie_database handle.
+    - widths (dict): Histogram bucket width per numeric field.
+    - ttl (float): Seconds before a refresh even without local writes, to pick
+      up changes made by other processes.
+    - version (CatalogVersion): Counter bumped by catalog writes.
+    """
+
+    def __init__(self, db, widths=HISTOGRAM_WIDTHS, ttl=DEFAULT_TTL, version=catalog_version):
+        self.db = db
+        self.widths = widths
+        self.ttl = ttl
+        self.version = version
+        self._lock = threading.Lock()
+        self._facets = None
+        self._facets_version = None
+        self._expires_at = 0.0
+        self.refreshes = 0
+
+    def get(self):
+        """
+        Return the facets, running the aggregation only if the catalog changed.
+
+        Returns:
+        - dict: {'genres': [(genre, count)], 'ranges': {field: (min, max)},
+          'histograms': {field: [(low, high, count)]}}
+        """
+        with self._lock:
+            version = self.version.value
+            if (self._facets is None or self._facets_version != version
+                    or time.monotonic() >= self._expires_at):
+                # $facet always returns exactly one document
+                result = next(self.db.movie.aggregate(facet_pipeline(self.widths)))
+                self._facets = _parse(result, self.widths)
+                self._facets_version = version
+                self._expires_at = time.monotonic() + self.ttl
+                self.refreshes += 1
+            return self._facets
@@ -0,0 +1,174 @@
+import numpy as np
+
+# Rows evaluated together; bounds the (rows x trees) node-index working set.
+DEFAULT_BLOCK_SIZE = 4096
+
+
+def _float32_split_bounds(threshold):
+    """
+    Translate sklearn thresholds into exact float64 bounds.
+
+    sklearn casts inputs to float32 before comparing them with a threshold t, so
+    a split sends z left iff float32(z) <= t. That holds exactly when z does not
+    round above the largest float32 f <= t, i.e. when z <= midpoint(f, next(f)).
+
+    Args:
+    - threshold (ndarray[float64]): Split thresholds of the internal nodes.
+
+    Returns:
+    - bound (ndarray[float64]): Thresholds to compare float64 inputs against.
+    """
+    lower = threshold.astype(np.float32)
+    above = lower.astype(np.float64) > threshold
+    lower[above] = np.nextafter(lower[above], np.float32(-np.inf))
+    upper = np.nextafter(lower, np.float32(np.inf))
+    return (lower.astype(np.float64) + upper.astype(np.float64)) / 2
+
+
+class IdentityScaler:
+    """
+    Stand-in for a StandardScaler whose mean/scale were folded into a
+    CompiledForest. transform() only converts the input to a float64 array.
+
+    Args:
+    - folded_mean, folded_scale (ndarray, optional): The folded scaler's
+      mean/scale, for code that needs the standardization itself (e.g.
+      similar_movies); None if unknown.
+    """
+
+    with_mean = False
+    with_std = False
+
+    def __init__(self, folded_mean=None, folded_scale=None):
+        self.folded_mean = folded_mean
+        self.folded_scale = folded_scale
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64)
+
+
+class CompiledForest:
+    """
+    A RandomForestRegressor flattened into contiguous node arrays.
+
+    All trees share one set of arrays; tree t starts at roots[t]. Leaves point
+    to themselves on both sides, so every row can be stepped down every tree
+    for max_depth iterations without per-node branching. Thresholds are stored
+    as float64 bounds equivalent to sklearn's float32 comparisons, so inputs
+    are never cast.
+
+    Args:
+    - feature (ndarray[int64]): Split feature index per node (0 for leaves).
+    - threshold (ndarray[float64]): Split threshold per node (go left if x <= threshold).
+    - left (ndarray[int64]): Global index of the left child per node.
+    - right (ndarray[int64]): Global index of the right child per node.
+    - value (ndarray[float64]): Prediction stored at each node (used at leaves).
+    - roots (ndarray[int64]): Global index of each tree's root node.
+    - max_depth (int): Depth of the deepest tree.
+    - n_features (int): Number of input columns expected by predict().
+    - scaled_inputs (bool): True if predict() expects standardized inputs, False
+      if the scaler was folded into the thresholds.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth,
+                 n_features, scaled_inputs=True):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.scaled_inputs = scaled_inputs
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None):
+        """
+        Flatten a fitted sklearn forest of regression trees.
+
+        Args:
+        - model: A fitted RandomForestRegressor (or any forest exposing estimators_).
+        - scaler (StandardScaler, optional): If given, its mean/scale are folded
+          into the split thresholds so predict() takes unscaled features.
+
+        Returns:
+        - CompiledForest: The flattened forest.
+        """
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes, dtype=np.int64)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+            bounds = _float32_split_bounds(tree.threshold.astype(np.float64))
+            thresholds.append(np.where(is_leaf, np.inf, bounds))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            values.append(tree.value.reshape(n_nodes, -1)[:, 0].astype(np.float64))
+            roots.append(offset)
+
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        feature = np.concatenate(features)
+        threshold = np.concatenate(thresholds)
+        scaled_inputs = True
+        if scaler is not None:
+            # (x - mean) / scale <= t  <=>  x <= t * scale + mean  (scale > 0)
+            mean = scaler.mean_ if scaler.with_mean else np.zeros(model.n_features_in_)
+            scale = scaler.scale_ if scaler.with_std else np.ones(model.n_features_in_)
+            threshold = threshold * scale[feature] + mean[feature]
+            scaled_inputs = False
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            left=np.concatenate(lefts).astype(np.int64),
+            right=np.concatenate(rights).astype(np.int64),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int64),
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+            scaled_inputs=scaled_inputs,
+        )
+
+    def _predict_block(self, X):
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        rows = np.arange(X.shape[0])[:, None]
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes].mean(axis=1)
+
+    def predict(self, X, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Predict with every tree and average, like RandomForestRegressor.predict.
+
+        Args:
+        - X (array-like): Feature matrix of shape (n_rows, n_features), or a single row.
+        - block_size (int): Rows evaluated per vectorized pass.
+
+        Returns:
+        - prediction (ndarray): One averaged prediction per row.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+
+        if X.shape[0] <= block_size:
+            return self._predict_block(X)
+        prediction = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], block_size):
+            prediction[start:start + block_size] = self._predict_block(X[start:start + block_size])
+        return prediction
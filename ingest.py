@@ -0,0 +1,192 @@
+"""
+Bulk ingestion of movies_data.csv and imdb_top_1000.csv into movie_database.
+
+Replaces the row-at-a-time loading in create_database.ipynb. Rows are streamed
+in chunks and written with unordered bulk upserts, so the command can be
+re-run (or restarted after a failure) without creating duplicates.
+
+Run with:
+    python ingest.py [--movies movies_data.csv] [--imdb imdb_top_1000.csv]
+"""
+import argparse
+import csv
+import time
+from itertools import islice
+
+from data_store import UpdateOne, open_database
+from db_indexes import ensure_indexes
+from people_stats import rebuild as rebuild_people_stats
+from read_model import sync_movies
+
+DEFAULT_CHUNK_SIZE = 1000
+CSV_ENCODING = 'latin1'
+
+
+def read_chunks(filename, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream a CSV file as lists of row dicts.
+
+    Args:
+    - filename (str): Path to the CSV file.
+    - chunk_size (int): Maximum number of rows per chunk.
+
+    Yields:
+    - list of dict: The next chunk of rows.
+    """
+    with open(filename, mode='r', encoding=CSV_ENCODING, newline='') as file:
+        reader = csv.DictReader(file)
+        while True:
+            chunk = list(islice(reader, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+def _int_or_zero(value):
+    value = value.strip()
+    return int(float(value)) if value else 0
+
+
+def movie_fields(row):
+    """Build the `movie` fields from a movies_data.csv row (description excluded)."""
+    return {
+        "title": row['Movie'],
+        "director": row['Director'],
+        "actors": [row['Actor 1'], row['Actor 2'], row['Actor 3']],
+        "genre": row['Genre'],
+        "budget": int(row['Budget']),
+        "running_time": _int_or_zero(row['Running time']),
+        "release_year": int(row['Release year']),
+        "imdb_score": float(row['IMDb score']),
+    }
+
+
+def performance_fields(row):
+    """Build the `movie_performance` fields from a movies_data.csv row (movie_id excluded)."""
+    return {
+        "final_box_office": int(row['Box Office']),
+        "earnings": int(row['Earnings']),
+        "actor_boxoffice_%": float(row['Actors Box Office %']),
+        "director_boxoffice_%": float(row['Director Box Office %']),
+        "oscars_and_golden_globes_nominations": _int_or_zero(row['Oscar and Golden Globes nominations']),
+        "oscars_and_golden_globes_awards": _int_or_zero(row['Oscar and Golden Globes awards']),
+    }
+
+
+def _resolve_ids(db, titles, upsert_result):
+    """
+    Map titles to movie _ids from a bulk upsert result.
+
+    Newly inserted movies come back in upserted_ids; titles that already
+    existed are resolved with one $in query for the whole chunk.
+    """
+    title_to_id = {titles[index]: _id for index, _id in upsert_result.upserted_ids.items()}
+    existing = [title for title in titles if title not in title_to_id]
+    if existing:
+        for movie in db.movie.find({"title": {"$in": existing}}, {"title": 1}):
+            title_to_id.setdefault(movie["title"], movie["_id"])
+    return title_to_id
+
+
+def ingest_movies(db, filename, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Upsert movies and their performance rows from movies_data.csv.
+
+    Movies are keyed by title and performance rows by movie_id, so re-running
+    updates documents in place. Repeated titles collapse into one movie (the
+    last row wins), as the CSV lists some films more than once.
+
+    Args:
+    - db: The movie_database handle.
+    - filename (str): Path to movies_data.csv.
+    - chunk_size (int): Rows per bulk write.
+
+    Returns:
+    - int: Number of CSV rows processed.
+    """
+    rows_processed = 0
+    for chunk in read_chunks(filename, chunk_size):
+        by_title = {row['Movie']: row for row in chunk}
+        titles = list(by_title)
+
+        movie_ops = [
+            UpdateOne(
+                {"title": title},
+                {"$set": movie_fields(row), "$setOnInsert": {"description": "N/A"}},
+                upsert=True,
+            )
+            for title, row in by_title.items()
+        ]
+        result = db.movie.bulk_write(movie_ops, ordered=False)
+        title_to_id = _resolve_ids(db, titles, result)
+
+        performance_ops = [
+            UpdateOne(
+                {"movie_id": title_to_id[title]},
+                {"$set": performance_fields(row), "$setOnInsert": {"performance": "N/A"}},
+                upsert=True,
+            )
+            for title, row in by_title.items()
+        ]
+        db.movie_performance.bulk_write(performance_ops, ordered=False)
+        sync_movies(db, title_to_id.values())
+        rows_processed += len(chunk)
+    return rows_processed
+
+
+def ingest_descriptions(db, filename, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Set movie descriptions from imdb_top_1000.csv in a single bulk write.
+
+    Args:
+    - db: The movie_database handle.
+    - filename (str): Path to imdb_top_1000.csv.
+    - chunk_size (int): Rows read from the CSV at a time.
+
+    Returns:
+    - int: Number of CSV rows processed.
+    """
+    ops = []
+    for chunk in read_chunks(filename, chunk_size):
+        ops.extend(
+            UpdateOne({"title": row['Series_Title']}, {"$set": {"description": row['Overview']}})
+            for row in chunk
+        )
+    if ops:
+        db.movie.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def _report(label, rows, seconds):
+    rate = rows / seconds if seconds > 0 else float('inf')
+    print(f"{label:<15} {rows:>8} rows in {seconds:7.2f}s ({rate:,.0f} rows/s)")
+
+
+def run(db, movies_file, imdb_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Ingest both CSV files and print throughput for each step."""
+    # The upserts match on movie.title and movie_performance.movie_id; without
+    # their indexes every upsert scans the collection.
+    ensure_indexes(db)
+    start = time.perf_counter()
+    rows = ingest_movies(db, movies_file, chunk_size)
+    _report("movies", rows, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    rows = ingest_descriptions(db, imdb_file, chunk_size)
+    _report("descriptions", rows, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    people = rebuild_people_stats(db, chunk_size)
+    _report("people stats", sum(people.values()), time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load the movie catalog into MongoDB.")
+    parser.add_argument("--movies", default="movies_data.csv", help="Path to movies_data.csv")
+    parser.add_argument("--imdb", default="imdb_top_1000.csv", help="Path to imdb_top_1000.csv")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--uri", default=None, help="MongoDB connection string")
+    parser.add_argument("--db", default=None, help="Database name")
+    args = parser.parse_args()
+
+    run(open_database(uri=args.uri, name=args.db), args.movies, args.imdb, args.chunk_size)
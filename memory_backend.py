@@ -0,0 +1,1265 @@
+"""
+In-memory stand-in for a MongoDB database.
+
+Implements the part of the pymongo Database/Collection API the movie system
+uses (filters, projections, sorted and limited cursors, update operators,
+bulk writes, unique indexes and the aggregation stages in this repo) with
+MongoDB's matching and ordering rules, so the CLI, loaders and benchmarks can
+run without a mongod. Data lives only in the process.
+
+Equality and $in filters on indexed fields are answered from hash indexes;
+everything else is a scan, so timings reflect the application code rather
+than MongoDB.
+"""
+import math
+import re
+import threading
+from datetime import datetime
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from pymongo import DeleteMany, DeleteOne, IndexModel, InsertOne, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, WriteError
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+import data_store
+
+# Marks a field that is absent, as opposed to present with a null value.
+_MISSING = object()
+
+# BSON type names and codes accepted by $type.
+_TYPE_ALIASES = {
+    1: "double", 2: "string", 3: "object", 4: "array", 5: "binData", 7: "objectId",
+    8: "bool", 9: "date", 10: "null", 11: "regex", 16: "int", 18: "long", 19: "decimal",
+}
+
+
+def _type_rank(value):
+    """Position of a value's type in MongoDB's cross-type comparison order."""
+    if value is None or value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float, Decimal128)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, (list, tuple)):
+        return 5
+    if isinstance(value, (bytes, bytearray)):
+        return 6
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+
+def _sort_key(value):
+    """Key ordering values of any type the way MongoDB sorts them."""
+    rank = _type_rank(value)
+    if rank == 1:
+        return (1, 0)
+    if rank == 2 and isinstance(value, Decimal128):
+        return (2, float(value.to_decimal()))
+    if rank == 4:
+        return (4, tuple((key, _sort_key(item)) for key, item in value.items()))
+    if rank == 5:
+        return (5, tuple(_sort_key(item) for item in value))
+    if rank == 10:
+        return (10, str(value))
+    return (rank, value)
+
+
+def _copy(value):
+    """
+    Deep copy of a document value. Only dicts and lists are copied; BSON
+    scalars (str, numbers, ObjectId, datetime, bytes) are immutable and shared.
+    """
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def _freeze(value):
+    """Hashable form of a value, distinguishing types MongoDB distinguishes."""
+    if value is _MISSING:
+        value = None
+    return _sort_key(value)
+
+
+def _has_type(value, type_name):
+    type_name = _TYPE_ALIASES.get(type_name, type_name)
+    if value is _MISSING:
+        return False
+    if type_name == "number":
+        return _type_rank(value) == 2
+    if type_name in ("int", "long"):
+        return isinstance(value, int) and not isinstance(value, bool)
+    checks = {
+        "double": float, "string": str, "object": dict, "array": list, "binData": bytes,
+        "objectId": ObjectId, "bool": bool, "date": datetime, "decimal": Decimal128,
+        "regex": re.Pattern,
+    }
+    if type_name == "null":
+        return value is None
+    return isinstance(value, checks.get(type_name, ()))
+
+
+# -- paths ---------------------------------------------------------------------
+
+def _get(document, path):
+    """Value at a dotted path, or _MISSING (no array traversal)."""
+    value = document
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+    return value
+
+
+def _lookup(value, parts):
+    """All values reached by a dotted path, traversing arrays of documents."""
+    if not parts:
+        return [value]
+    if isinstance(value, dict):
+        return _lookup(value[parts[0]], parts[1:]) if parts[0] in value else [_MISSING]
+    if isinstance(value, list):
+        if parts[0].isdigit():
+            index = int(parts[0])
+            return _lookup(value[index], parts[1:]) if index < len(value) else [_MISSING]
+        found = []
+        for item in value:
+            if isinstance(item, dict):
+                found.extend(_lookup(item, parts))
+        return found or [_MISSING]
+    return [_MISSING]
+
+
+def _set_path(document, path, value):
+    parts = path.split(".")
+    target = document
+    for part in parts[:-1]:
+        if isinstance(target, list) and part.isdigit():
+            target = target[int(part)]
+            continue
+        child = target.get(part)
+        if not isinstance(child, (dict, list)):
+            child = target[part] = {}
+        target = child
+    if isinstance(target, list) and parts[-1].isdigit():
+        target[int(parts[-1])] = value
+    else:
+        target[parts[-1]] = value
+
+
+def _unset_path(document, path):
+    parts = path.split(".")
+    target = _get(document, ".".join(parts[:-1])) if len(parts) > 1 else document
+    if isinstance(target, dict):
+        target.pop(parts[-1], None)
+
+
+# -- query matching ------------------------------------------------------------
+
+def _is_operator_dict(value):
+    return isinstance(value, dict) and bool(value) and all(key.startswith("$") for key in value)
+
+
+def _expanded(values):
+    """Values plus the elements of any arrays among them."""
+    for value in values:
+        yield value
+        if isinstance(value, list):
+            yield from value
+
+
+def _equal(value, target):
+    if target is None:
+        return value is None or value is _MISSING
+    if isinstance(target, re.Pattern):
+        return isinstance(value, str) and target.search(value) is not None
+    return value is not _MISSING and _type_rank(value) == _type_rank(target) and _sort_key(value) == _sort_key(target)
+
+
+def _compare(op, value, target):
+    if target is None:
+        # Only null/missing equal null; nothing is greater or less than it.
+        return op in ("$gte", "$lte") and (value is None or value is _MISSING)
+    if value is _MISSING or _type_rank(value) != _type_rank(target):
+        return False
+    left, right = _sort_key(value), _sort_key(target)
+    if op == "$gt":
+        return left > right
+    if op == "$gte":
+        return left >= right
+    if op == "$lt":
+        return left < right
+    return left <= right
+
+
+def _regex(pattern, options=""):
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    flags = 0
+    for option, flag in (("i", re.IGNORECASE), ("m", re.MULTILINE), ("s", re.DOTALL), ("x", re.VERBOSE)):
+        if option in options:
+            flags |= flag
+    return re.compile(pattern, flags)
+
+
+class _Targets(list):
+    """$in/$nin argument with its hashable values frozen into a set once per query."""
+
+    def __init__(self, targets):
+        super().__init__(targets)
+        self.special = [target for target in targets if target is None or isinstance(target, re.Pattern)]
+        self.plain = {_freeze(target) for target in targets
+                      if target is not None and not isinstance(target, re.Pattern)}
+
+
+def _prepare(query):
+    """Copy of a filter with every $in/$nin list replaced by _Targets."""
+    if isinstance(query, list):
+        return [_prepare(clause) for clause in query]
+    if not isinstance(query, dict):
+        return query
+    prepared = {}
+    for key, value in query.items():
+        if key in ("$in", "$nin") and isinstance(value, list):
+            prepared[key] = _Targets(value)
+        elif isinstance(value, (dict, list)):
+            prepared[key] = _prepare(value)
+        else:
+            prepared[key] = value
+    return prepared
+
+
+def _in(values, targets):
+    """$in: hashable targets are looked up in a set, regexes and null checked one by one."""
+    if not isinstance(targets, _Targets):
+        targets = _Targets(targets)
+    for value in _expanded(values):
+        if value is not _MISSING and value is not None and _freeze(value) in targets.plain:
+            return True
+        if any(_equal(value, target) for target in targets.special):
+            return True
+    return False
+
+
+def _join_index(documents, field):
+    """
+    $lookup hash index: positions of the documents by every frozen value at
+    `field` (array elements included; missing counts as null), so each local
+    value is joined with a dict lookup instead of a scan.
+    """
+    index = {}
+    parts = field.split(".")
+    for position, document in enumerate(documents):
+        for value in _expanded(_lookup(document, parts)):
+            index.setdefault(_freeze(value), []).append(position)
+    return index
+
+
+def _match_values(values, condition):
+    """Whether the values found at a path satisfy a field condition."""
+    if isinstance(condition, re.Pattern):
+        condition = {"$regex": condition}
+    if not _is_operator_dict(condition):
+        return any(_equal(value, condition) for value in _expanded(values))
+    for op, argument in condition.items():
+        if op == "$options":
+            continue
+        if op == "$eq":
+            matched = any(_equal(value, argument) for value in _expanded(values))
+        elif op == "$ne":
+            matched = not any(_equal(value, argument) for value in _expanded(values))
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            matched = any(_compare(op, value, argument) for value in _expanded(values))
+        elif op == "$in":
+            matched = _in(values, argument)
+        elif op == "$nin":
+            matched = not _in(values, argument)
+        elif op == "$exists":
+            matched = any(value is not _MISSING for value in values) == bool(argument)
+        elif op == "$regex":
+            pattern = _regex(argument, condition.get("$options", ""))
+            matched = any(isinstance(value, str) and pattern.search(value) for value in _expanded(values))
+        elif op == "$type":
+            names = argument if isinstance(argument, list) else [argument]
+            matched = any(_has_type(value, name) for value in _expanded(values) for name in names)
+        elif op == "$not":
+            matched = not _match_values(values, argument)
+        elif op == "$size":
+            matched = any(isinstance(value, list) and len(value) == argument for value in values)
+        elif op == "$all":
+            matched = all(_match_values(values, target) for target in argument)
+        elif op == "$elemMatch":
+            matched = any(
+                isinstance(value, list) and any(
+                    _match(item, argument) if isinstance(item, dict) and not _is_operator_dict(argument)
+                    else _match_values([item], argument)
+                    for item in value
+                )
+                for value in values
+            )
+        else:
+            raise OperationFailure(f"unknown operator: {op}")
+        if not matched:
+            return False
+    return True
+
+
+def _match(document, query):
+    """Whether a document matches a MongoDB query filter."""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            matched = all(_match(document, clause) for clause in condition)
+        elif key == "$or":
+            matched = any(_match(document, clause) for clause in condition)
+        elif key == "$nor":
+            matched = not any(_match(document, clause) for clause in condition)
+        elif key.startswith("$"):
+            raise OperationFailure(f"unknown top level operator: {key}")
+        else:
+            matched = _match_values(_lookup(document, key.split(".")), condition)
+        if not matched:
+            return False
+    return True
+
+
+# -- projection and sorting ----------------------------------------------------
+
+def _path_tree(paths):
+    tree = {}
+    for path in paths:
+        node = tree
+        parts = path.split(".")
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is True:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = True
+    return tree
+
+
+def _include(document, tree):
+    result = {}
+    for key, value in document.items():
+        if key not in tree:
+            continue
+        subtree = tree[key]
+        if subtree is True:
+            result[key] = _copy(value)
+        elif isinstance(value, dict):
+            result[key] = _include(value, subtree)
+        elif isinstance(value, list):
+            result[key] = [_include(item, subtree) for item in value if isinstance(item, dict)]
+    return result
+
+
+def _exclude(document, tree):
+    result = {}
+    for key, value in document.items():
+        subtree = tree.get(key)
+        if subtree is True:
+            continue
+        if subtree and isinstance(value, dict):
+            result[key] = _exclude(value, subtree)
+        elif subtree and isinstance(value, list):
+            result[key] = [_exclude(item, subtree) if isinstance(item, dict) else _copy(item) for item in value]
+        else:
+            result[key] = _copy(value)
+    return result
+
+
+def _project(document, projection):
+    """Copy of a document with a find() projection applied."""
+    if not projection:
+        return _copy(document)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = bool(projection.get("_id", 1))
+    fields = {field: bool(flag) for field, flag in projection.items() if field != "_id"}
+    if any(fields.values()):
+        result = _include(document, _path_tree(field for field, flag in fields.items() if flag))
+        if include_id and "_id" in document:
+            result = {"_id": document["_id"], **result}
+        return result
+    excluded = [field for field in fields] + ([] if include_id else ["_id"])
+    return _exclude(document, _path_tree(excluded))
+
+
+def _normalize_sort(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [(key, order) for key, order in key_or_list]
+
+
+def _sort_documents(documents, spec):
+    """Sort documents in place by a list of (path, direction) pairs."""
+    for path, direction in reversed(spec):
+        def value(document, path=path, direction=direction):
+            found = _get(document, path)
+            if isinstance(found, list) and found:
+                # Arrays sort by their smallest element ascending, largest descending.
+                keys = [_sort_key(item) for item in found]
+                return min(keys) if direction == 1 else max(keys)
+            return _sort_key(None if found is _MISSING else found)
+        documents.sort(key=value, reverse=direction == -1)
+    return documents
+
+
+# -- aggregation expressions ---------------------------------------------------
+
+def _null(value):
+    return value is None or value is _MISSING
+
+
+def _arithmetic(op, values):
+    if any(_null(value) for value in values):
+        return None
+    if op == "$add":
+        return sum(values)
+    if op == "$subtract":
+        return values[0] - values[1]
+    if op == "$multiply":
+        result = 1
+        for value in values:
+            result *= value
+        return result
+    if op == "$divide":
+        if values[1] == 0:
+            raise OperationFailure("can't $divide by zero")
+        return values[0] / values[1]
+    if op == "$mod":
+        return math.fmod(values[0], values[1])
+    if op == "$pow":
+        return values[0] ** values[1]
+
+
+def _unary(op, value):
+    if _null(value):
+        return None
+    if op == "$floor":
+        return float(math.floor(value)) if isinstance(value, float) else value
+    if op == "$ceil":
+        return float(math.ceil(value)) if isinstance(value, float) else value
+    if op == "$abs":
+        return abs(value)
+    if op == "$sqrt":
+        return math.sqrt(value)
+    if op == "$exp":
+        return math.exp(value)
+    if op == "$ln":
+        return math.log(value)
+    if op == "$log10":
+        return math.log10(value)
+    if op == "$toLower":
+        return str(value).lower()
+    if op == "$toUpper":
+        return str(value).upper()
+    if op == "$toString":
+        return str(value)
+    if op == "$toDouble":
+        return float(value)
+    if op == "$toInt":
+        return int(value)
+
+
+_ARITHMETIC = ("$add", "$subtract", "$multiply", "$divide", "$mod", "$pow")
+_UNARY = ("$floor", "$ceil", "$abs", "$sqrt", "$exp", "$ln", "$log10",
+          "$toLower", "$toUpper", "$toString", "$toDouble", "$toInt")
+_COMPARISONS = ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$cmp")
+
+
+def _evaluate(expression, document):
+    """Evaluate an aggregation expression against a document."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        if expression in ("$$ROOT", "$$CURRENT"):
+            return document
+        if expression.startswith("$$"):
+            raise OperationFailure(f"unsupported variable: {expression}")
+        return _get(document, expression[1:])
+    if isinstance(expression, list):
+        return [_evaluate(item, document) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) != 1 or not next(iter(expression)).startswith("$"):
+        result = {}
+        for key, value in expression.items():
+            value = _evaluate(value, document)
+            if value is not _MISSING:
+                result[key] = value
+        return result
+
+    (op, argument), = expression.items()
+    if op == "$literal":
+        return argument
+    if op in ("$cond", "$ifNull", "$and", "$or"):
+        # Evaluated lazily below.
+        pass
+    elif isinstance(argument, list):
+        arguments = [_evaluate(item, document) for item in argument]
+    else:
+        arguments = [_evaluate(argument, document)]
+
+    if op in _ARITHMETIC:
+        return _arithmetic(op, arguments)
+    if op in _UNARY:
+        return _unary(op, arguments[0])
+    if op == "$round":
+        value, places = arguments[0], arguments[1] if len(arguments) > 1 else 0
+        return None if _null(value) else round(value, places)
+    if op == "$ifNull":
+        for item in argument:
+            value = _evaluate(item, document)
+            if not _null(value):
+                return value
+        return None
+    if op == "$cond":
+        if isinstance(argument, dict):
+            test, then, otherwise = argument["if"], argument["then"], argument["else"]
+        else:
+            test, then, otherwise = argument
+        return _evaluate(then if _truthy(_evaluate(test, document)) else otherwise, document)
+    if op == "$and":
+        return all(_truthy(_evaluate(item, document)) for item in argument)
+    if op == "$or":
+        return any(_truthy(_evaluate(item, document)) for item in argument)
+    if op == "$not":
+        return not _truthy(arguments[0])
+    if op in _COMPARISONS:
+        left, right = (_sort_key(None if _null(value) else value) for value in arguments)
+        comparison = (left > right) - (left < right)
+        return {
+            "$eq": comparison == 0, "$ne": comparison != 0, "$gt": comparison > 0,
+            "$gte": comparison >= 0, "$lt": comparison < 0, "$lte": comparison <= 0,
+            "$cmp": comparison,
+        }[op]
+    if op == "$in":
+        value, array = arguments
+        return any(_equal(item, value) for item in array)
+    if op == "$size":
+        return len(arguments[0])
+    if op == "$concat":
+        return None if any(_null(value) for value in arguments) else "".join(arguments)
+    if op == "$arrayElemAt":
+        array, index = arguments
+        return array[index] if -len(array) <= index < len(array) else _MISSING
+    if op in ("$sum", "$avg", "$min", "$max"):
+        values = arguments[0] if len(arguments) == 1 and isinstance(arguments[0], list) else arguments
+        return _accumulate(op, values)
+    if op == "$type":
+        value = arguments[0]
+        if value is _MISSING:
+            return "missing"
+        for name in ("null", "bool", "int", "double", "string", "object", "array", "objectId", "date"):
+            if _has_type(value, name):
+                return name
+        return "unknown"
+    raise OperationFailure(f"unsupported expression operator: {op}")
+
+
+def _truthy(value):
+    return not (_null(value) or value is False or value == 0)
+
+
+def _accumulate(op, values):
+    """Apply a $group accumulator to the evaluated values of one group."""
+    if op == "$sum":
+        return sum(value for value in values if _type_rank(value) == 2 and not isinstance(value, Decimal128))
+    if op == "$avg":
+        numbers = [value for value in values if _type_rank(value) == 2 and not isinstance(value, Decimal128)]
+        return sum(numbers) / len(numbers) if numbers else None
+    if op in ("$min", "$max"):
+        present = [value for value in values if not _null(value)]
+        if not present:
+            return None
+        return (min if op == "$min" else max)(present, key=_sort_key)
+    if op == "$first":
+        return None if not values or _null(values[0]) else values[0]
+    if op == "$last":
+        return None if not values or _null(values[-1]) else values[-1]
+    if op == "$push":
+        return [value for value in values if value is not _MISSING]
+    if op == "$addToSet":
+        seen = {}
+        for value in values:
+            if value is not _MISSING:
+                seen.setdefault(_freeze(value), value)
+        return list(seen.values())
+    raise OperationFailure(f"unsupported accumulator: {op}")
+
+
+def _group(documents, spec):
+    groups = {}
+    for document in documents:
+        key = _evaluate(spec["_id"], document)
+        key = None if key is _MISSING else key
+        group = groups.setdefault(_freeze(key), (key, []))
+        group[1].append(document)
+    results = []
+    for key, members in groups.values():
+        result = {"_id": key}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, expression), = accumulator.items()
+            if op == "$count":
+                result[field] = len(members)
+                continue
+            result[field] = _accumulate(op, [_evaluate(expression, member) for member in members])
+        results.append(result)
+    return results
+
+
+def _project_stage(document, spec):
+    """Apply a $project stage: inclusions, exclusions and computed fields."""
+    include_id = spec.get("_id", 1)
+    computed = {}
+    included, excluded = [], []
+    for field, value in spec.items():
+        if field == "_id" and value in (0, 1, True, False):
+            continue
+        if value in (1, True):
+            included.append(field)
+        elif value in (0, False):
+            excluded.append(field)
+        else:
+            computed[field] = value
+    if included or computed:
+        result = _include(document, _path_tree(included))
+        if include_id and "_id" in document:
+            result = {"_id": document["_id"], **result}
+        for field, expression in computed.items():
+            value = _evaluate(expression, document)
+            if value is not _MISSING:
+                _set_path(result, field, value)
+        return result
+    return _exclude(document, _path_tree(excluded + ([] if include_id else ["_id"])))
+
+
+def _add_fields(document, spec):
+    """Apply an $addFields/$set stage, evaluating every expression against the input."""
+    result = _copy(document)
+    for field, expression in spec.items():
+        value = _evaluate(expression, document)
+        if value is not _MISSING:
+            _set_path(result, field, value)
+    return result
+
+
+def _unwind(documents, spec):
+    if isinstance(spec, str):
+        spec = {"path": spec}
+    path = spec["path"][1:]
+    preserve = spec.get("preserveNullAndEmptyArrays", False)
+    results = []
+    for document in documents:
+        value = _get(document, path)
+        if isinstance(value, list) and value:
+            for item in value:
+                unwound = _copy(document) if "." in path else dict(document)
+                _set_path(unwound, path, item)
+                results.append(unwound)
+        elif not isinstance(value, list) and not _null(value):
+            results.append(document)
+        elif preserve:
+            results.append(document)
+    return results
+
+
+# -- collection ----------------------------------------------------------------
+
+class MemoryCursor:
+    """Lazily evaluated find() result supporting sort/skip/limit chaining."""
+
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._results = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def hint(self, index):
+        return self
+
+    def _execute(self):
+        with self._collection._lock:
+            documents = self._collection._find_documents(self._query)
+            if self._sort:
+                _sort_documents(documents, self._sort)
+            documents = documents[self._skip:]
+            if self._limit:
+                documents = documents[:abs(self._limit)]
+            return [_project(document, self._projection) for document in documents]
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._results is None:
+            self._results = iter(self._execute())
+        return next(self._results)
+
+    def close(self):
+        self._results = iter(())
+
+    def explain(self):
+        """Describe the plan: an index lookup when a hash index applies, else a scan."""
+        index = self._collection._usable_index(self._query)
+        stage = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": index}} if index else {"stage": "COLLSCAN"}
+        if self._sort:
+            stage = {"stage": "SORT", "inputStage": stage}
+        return {"queryPlanner": {"winningPlan": stage, "rejectedPlans": []}}
+
+
+class MemoryCollection:
+    """A collection of documents held in a dict keyed by _id."""
+
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._documents = {}   # frozen _id -> document
+        self._indexes = {"_id_": {"key": [("_id", 1)], "unique": True}}
+        self._unique = {}      # index name -> (fields, {frozen key: frozen _id})
+        self._hashed = {}      # field -> {frozen value: set of frozen _id}
+        self._lock = threading.RLock()
+
+    @property
+    def full_name(self):
+        return f"{self.database.name}.{self.name}"
+
+    def with_options(self, **kwargs):
+        return self
+
+    def __repr__(self):
+        return f"MemoryCollection({self.full_name!r})"
+
+    # -- indexes
+
+    def _index_entries(self, document):
+        """(field, frozen value) pairs to put in the hash indexes for a document."""
+        for field in self._hashed:
+            values = set(_freeze(value) for value in _expanded(_lookup(document, field.split("."))))
+            for value in values:
+                yield field, value
+
+    def _unique_key(self, document, fields):
+        return tuple(_freeze(_get(document, field)) for field in fields)
+
+    def _check_unique(self, document, doc_key):
+        for name, (fields, entries) in self._unique.items():
+            owner = entries.get(self._unique_key(document, fields))
+            if owner is not None and owner != doc_key:
+                values = {field: _get(document, field) for field in fields}
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.full_name} index: {name} dup key: {values}",
+                    11000,
+                )
+
+    def _add(self, document):
+        doc_key = _freeze(document["_id"])
+        for fields, entries in self._unique.values():
+            entries[self._unique_key(document, fields)] = doc_key
+        for field, value in self._index_entries(document):
+            self._hashed[field].setdefault(value, set()).add(doc_key)
+        self._documents[doc_key] = document
+
+    def _remove(self, document):
+        doc_key = _freeze(document["_id"])
+        for fields, entries in self._unique.values():
+            key = self._unique_key(document, fields)
+            if entries.get(key) == doc_key:
+                del entries[key]
+        for field, value in self._index_entries(document):
+            ids = self._hashed[field].get(value)
+            if ids is not None:
+                ids.discard(doc_key)
+                if not ids:
+                    del self._hashed[field][value]
+        del self._documents[doc_key]
+
+    def _replace(self, old, new):
+        doc_key = _freeze(old["_id"])
+        if _freeze(new["_id"]) != doc_key:
+            raise WriteError("Performing an update on the path '_id' would modify the immutable field '_id'", 66)
+        self._check_unique(new, doc_key)
+        self._remove(old)
+        self._add(new)
+
+    def create_index(self, keys, **kwargs):
+        return self.create_indexes([IndexModel(keys, **kwargs)])[0]
+
+    def create_indexes(self, indexes, **kwargs):
+        names = []
+        with self._lock:
+            for model in indexes:
+                spec = model.document
+                keys = list(spec["key"].items())
+                name = spec["name"]
+                fields = [field for field, _ in keys]
+                if spec.get("unique") and name not in self._unique:
+                    entries = {}
+                    for doc_key, document in self._documents.items():
+                        key = self._unique_key(document, fields)
+                        if key in entries:
+                            raise DuplicateKeyError(
+                                f"E11000 duplicate key error collection: {self.full_name} index: {name}", 11000)
+                        entries[key] = doc_key
+                    self._unique[name] = (fields, entries)
+                if fields[0] != "_id" and fields[0] not in self._hashed:
+                    self._hashed[fields[0]] = {}
+                    for doc_key, document in self._documents.items():
+                        for field, value in self._index_entries(document):
+                            if field == fields[0]:
+                                self._hashed[field].setdefault(value, set()).add(doc_key)
+                self._indexes[name] = {"key": keys, "unique": bool(spec.get("unique"))}
+                names.append(name)
+        return names
+
+    def index_information(self):
+        return _copy(self._indexes)
+
+    def list_indexes(self):
+        return iter([{"name": name, **info} for name, info in self.index_information().items()])
+
+    def drop_index(self, name):
+        with self._lock:
+            self._indexes.pop(name, None)
+            self._unique.pop(name, None)
+
+    def drop_indexes(self):
+        with self._lock:
+            self._indexes = {"_id_": self._indexes["_id_"]}
+            self._unique = {}
+            self._hashed = {}
+
+    def drop(self):
+        self.database.drop_collection(self.name)
+
+    # -- reads
+
+    def _usable_index(self, query):
+        if "_id" in query:
+            condition = query["_id"]
+            if not _is_operator_dict(condition) or set(condition) == {"$in"}:
+                return "_id_"
+        for field in query:
+            if field in self._hashed:
+                condition = query[field]
+                if _is_operator_dict(condition) and set(condition) != {"$in"}:
+                    continue
+                if isinstance(condition, re.Pattern):
+                    continue
+                return next((name for name, info in self._indexes.items() if info["key"][0][0] == field), field)
+        return None
+
+    def _find_documents(self, query):
+        """Stored documents matching a query (caller holds _lock; do not mutate)."""
+        candidates = self._candidates(query)
+        query = _prepare(query)
+        return [document for document in candidates if _match(document, query)]
+
+    def _candidates(self, query):
+        """Narrow the scan with the _id key or a hash index when the query allows it."""
+        for field, condition in query.items():
+            if field != "_id" and field not in self._hashed:
+                continue
+            if _is_operator_dict(condition):
+                if set(condition) != {"$in"} or any(isinstance(value, re.Pattern) for value in condition["$in"]):
+                    continue
+                values = condition["$in"]
+            elif isinstance(condition, re.Pattern):
+                continue
+            else:
+                values = [condition]
+            if field == "_id":
+                keys = {_freeze(value) for value in values}
+            else:
+                # Array-valued conditions also match whole arrays; fall back to a scan.
+                if any(isinstance(value, (list, dict)) or value is None for value in values):
+                    continue
+                keys = set()
+                for value in values:
+                    keys |= self._hashed[field].get(_freeze(value), set())
+            return [document for key, document in self._documents.items() if key in keys] \
+                if len(keys) > len(self._documents) // 8 else \
+                [self._documents[key] for key in keys if key in self._documents]
+        return list(self._documents.values())
+
+    def find(self, filter=None, projection=None, sort=None, limit=0, skip=0, **kwargs):
+        cursor = MemoryCursor(self, filter, projection)
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
+
+    def find_one(self, filter=None, *args, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        return next(self.find(filter, *args, **kwargs).limit(1), None)
+
+    def count_documents(self, filter, **kwargs):
+        with self._lock:
+            return len(self._find_documents(filter))
+
+    def estimated_document_count(self, **kwargs):
+        return len(self._documents)
+
+    def distinct(self, key, filter=None, **kwargs):
+        with self._lock:
+            seen = {}
+            for document in self._find_documents(filter or {}):
+                for value in _expanded(_lookup(document, key.split("."))):
+                    if value is not _MISSING and not isinstance(value, list):
+                        seen.setdefault(_freeze(value), _copy(value))
+            return list(seen.values())
+
+    def aggregate(self, pipeline, **kwargs):
+        with self._lock:
+            if pipeline and "$match" in pipeline[0]:
+                documents = self._find_documents(pipeline[0]["$match"])
+                pipeline = pipeline[1:]
+            else:
+                documents = list(self._documents.values())
+            # Stages never modify their input documents, so the pipeline runs
+            # over the stored documents and only the results are copied.
+            return iter([_copy(document) for document in self.database._run_pipeline(documents, pipeline)])
+
+    # -- writes
+
+    def _insert(self, document):
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        # MongoDB stores _id as the first field
+        stored = {"_id": document["_id"], **_copy(document)}
+        doc_key = _freeze(stored["_id"])
+        if doc_key in self._documents:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.full_name} index: _id_ dup key: {{ _id: {stored['_id']!r} }}",
+                11000,
+            )
+        self._check_unique(stored, doc_key)
+        self._add(stored)
+        return stored["_id"]
+
+    def insert_one(self, document, **kwargs):
+        with self._lock:
+            return InsertOneResult(self._insert(document), True)
+
+    def insert_many(self, documents, ordered=True, **kwargs):
+        result = self.bulk_write([data_store.InsertOne(document) for document in documents], ordered=ordered)
+        return InsertManyResult([document["_id"] for document in documents if "_id" in document][:result.inserted_count], True)
+
+    def _upsert(self, query, update, replacement=False):
+        document = {}
+        if not replacement:
+            _seed_from_query(document, query)
+        if replacement:
+            document = _copy(update)
+            if "_id" not in document and "_id" in query and not _is_operator_dict(query["_id"]):
+                document["_id"] = query["_id"]
+        else:
+            _apply_update(document, update, inserting=True)
+        return self._insert(document)
+
+    def _update(self, query, update, upsert=False, multi=False, replacement=False):
+        """Apply one update operation; returns the raw result counts."""
+        if replacement and _is_operator_dict(update):
+            raise ValueError("replacement can not include $ operators")
+        if not replacement and not _is_operator_dict(update):
+            raise ValueError("update only works with $ operators")
+        matches = self._find_documents(query)
+        if not multi:
+            matches = matches[:1]
+        if not matches:
+            if upsert:
+                return {"n": 1, "nModified": 0, "upserted": self._upsert(query, update, replacement)}
+            return {"n": 0, "nModified": 0}
+        modified = 0
+        for document in matches:
+            if replacement:
+                updated = _copy(update)
+                updated["_id"] = document["_id"]
+            else:
+                updated = _copy(document)
+                _apply_update(updated, update)
+            if updated != document:
+                self._replace(document, updated)
+                modified += 1
+        return {"n": len(matches), "nModified": modified}
+
+    def update_one(self, filter, update, upsert=False, **kwargs):
+        with self._lock:
+            return UpdateResult(self._update(filter, update, upsert), True)
+
+    def update_many(self, filter, update, upsert=False, **kwargs):
+        with self._lock:
+            return UpdateResult(self._update(filter, update, upsert, multi=True), True)
+
+    def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        with self._lock:
+            return UpdateResult(self._update(filter, replacement, upsert, replacement=True), True)
+
+    def _delete(self, query, multi):
+        matches = self._find_documents(query)
+        if not multi:
+            matches = matches[:1]
+        for document in matches:
+            self._remove(document)
+        return matches
+
+    def delete_one(self, filter, **kwargs):
+        with self._lock:
+            return DeleteResult({"n": len(self._delete(filter, multi=False))}, True)
+
+    def delete_many(self, filter, **kwargs):
+        with self._lock:
+            return DeleteResult({"n": len(self._delete(filter, multi=True))}, True)
+
+    def _first(self, filter, sort):
+        documents = self._find_documents(filter)
+        if sort:
+            _sort_documents(documents, _normalize_sort(sort))
+        return documents[0] if documents else None
+
+    def find_one_and_delete(self, filter, projection=None, sort=None, **kwargs):
+        with self._lock:
+            document = self._first(filter, sort)
+            if document is None:
+                return None
+            self._remove(document)
+            return _project(document, projection)
+
+    def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE, **kwargs):
+        with self._lock:
+            document = self._first(filter, sort)
+            if document is None:
+                if not upsert:
+                    return None
+                inserted_id = self._upsert(filter, update)
+                return _project(self._documents[_freeze(inserted_id)], projection) \
+                    if return_document == ReturnDocument.AFTER else None
+            updated = _copy(document)
+            _apply_update(updated, update)
+            if updated != document:
+                self._replace(document, updated)
+            return _project(updated if return_document == ReturnDocument.AFTER else document, projection)
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        counts = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []}
+        errors = []
+        with self._lock:
+            for index, request in enumerate(requests):
+                try:
+                    self._bulk_one(index, request, counts)
+                except DuplicateKeyError as e:
+                    errors.append({"index": index, "code": 11000, "errmsg": str(e), "op": request})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({**counts, "writeErrors": errors, "writeConcernErrors": []})
+        return BulkWriteResult(counts, True)
+
+    def _bulk_one(self, index, request, counts):
+        # pymongo keeps an operation's arguments in private fields; the
+        # data_store subclasses also expose them as `arguments`.
+        arguments = getattr(request, "arguments", None)
+        if arguments is None:
+            raise TypeError(f"{request!r} has no arguments; use the operation classes from data_store")
+        if isinstance(request, InsertOne):
+            self._insert(arguments[0])
+            counts["nInserted"] += 1
+            return
+        if isinstance(request, (DeleteOne, DeleteMany)):
+            counts["nRemoved"] += len(self._delete(arguments[0], multi=isinstance(request, DeleteMany)))
+            return
+        if isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+            filter_, document, upsert = arguments
+            raw = self._update(
+                filter_, document, upsert,
+                multi=isinstance(request, UpdateMany), replacement=isinstance(request, ReplaceOne),
+            )
+            if "upserted" in raw:
+                counts["nUpserted"] += 1
+                counts["upserted"].append({"index": index, "_id": raw["upserted"]})
+            else:
+                counts["nMatched"] += raw["n"]
+                counts["nModified"] += raw["nModified"]
+            return
+        raise TypeError(f"{request!r} is not a valid request")
+
+
+def _seed_from_query(document, query):
+    """Copy the equality conditions of a filter into a new upserted document."""
+    for field, condition in query.items():
+        if field == "$and":
+            for clause in condition:
+                _seed_from_query(document, clause)
+        elif field.startswith("$"):
+            continue
+        elif _is_operator_dict(condition):
+            if "$eq" in condition:
+                _set_path(document, field, _copy(condition["$eq"]))
+        elif not isinstance(condition, re.Pattern):
+            _set_path(document, field, _copy(condition))
+
+
+def _apply_update(document, update, inserting=False):
+    """Apply update operators to a document in place."""
+    for op, fields in update.items():
+        if op == "$setOnInsert" and not inserting:
+            continue
+        for path, value in fields.items():
+            if op in ("$set", "$setOnInsert"):
+                _set_path(document, path, _copy(value))
+            elif op == "$unset":
+                _unset_path(document, path)
+            elif op == "$inc":
+                current = _get(document, path)
+                if current is _MISSING:
+                    current = 0
+                elif _type_rank(current) != 2:
+                    raise WriteError(f"Cannot apply $inc to a value of non-numeric type at '{path}'", 14)
+                _set_path(document, path, current + value)
+            elif op in ("$min", "$max"):
+                current = _get(document, path)
+                if (current is _MISSING
+                        or op == "$min" and _sort_key(value) < _sort_key(current)
+                        or op == "$max" and _sort_key(value) > _sort_key(current)):
+                    _set_path(document, path, _copy(value))
+            elif op in ("$push", "$addToSet"):
+                current = _get(document, path)
+                if current is _MISSING:
+                    current = []
+                    _set_path(document, path, current)
+                elif not isinstance(current, list):
+                    raise WriteError(f"The field '{path}' must be an array", 2)
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                for item in items:
+                    if op == "$push" or not any(_equal(existing, item) for existing in current):
+                        current.append(_copy(item))
+            else:
+                raise WriteError(f"Unknown modifier: {op}", 9)
+
+
+class MemoryDatabase:
+    """
+    A database of MemoryCollections, created on first access like pymongo's.
+
+    Args:
+    - name (str): Database name.
+    """
+
+    def __init__(self, name="movie_database"):
+        self.name = name
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"MemoryDatabase({self.name!r})"
+
+    def get_collection(self, name, **kwargs):
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = MemoryCollection(self, name)
+            return collection
+
+    def __getitem__(self, name):
+        return self.get_collection(name)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.get_collection(name)
+
+    def list_collection_names(self, **kwargs):
+        return [name for name, collection in self._collections.items() if collection._documents]
+
+    def drop_collection(self, name, **kwargs):
+        with self._lock:
+            self._collections.pop(getattr(name, "name", name), None)
+
+    def _run_pipeline(self, documents, pipeline):
+        """Run aggregation stages over a list of documents without modifying them."""
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$match":
+                prepared = _prepare(spec)
+                documents = [document for document in documents if _match(document, prepared)]
+            elif name == "$project":
+                documents = [_project_stage(document, spec) for document in documents]
+            elif name in ("$addFields", "$set"):
+                documents = [_add_fields(document, spec) for document in documents]
+            elif name == "$unset":
+                fields = [spec] if isinstance(spec, str) else spec
+                documents = [_exclude(document, _path_tree(fields)) for document in documents]
+            elif name == "$group":
+                documents = _group(documents, spec)
+            elif name == "$sort":
+                documents = _sort_documents(list(documents), _normalize_sort(spec))
+            elif name == "$skip":
+                documents = documents[spec:]
+            elif name == "$limit":
+                documents = documents[:spec]
+            elif name == "$count":
+                documents = [{spec: len(documents)}] if documents else []
+            elif name == "$unwind":
+                documents = _unwind(documents, spec)
+            elif name == "$replaceRoot":
+                documents = [_evaluate(spec["newRoot"], document) for document in documents]
+            elif name == "$lookup":
+                foreign = self.get_collection(spec["from"])
+                with foreign._lock:
+                    foreign_documents = list(foreign._documents.values())
+                index = _join_index(foreign_documents, spec["foreignField"])
+                joined = []
+                for document in documents:
+                    local = _get(document, spec["localField"])
+                    locals_ = local if isinstance(local, list) else [local]
+                    positions = sorted({position for value in locals_
+                                        for position in index.get(_freeze(value), ())})
+                    matches = [foreign_documents[position] for position in positions]
+                    document = _copy(document)
+                    _set_path(document, spec["as"], matches)
+                    joined.append(document)
+                documents = joined
+            elif name == "$facet":
+                documents = [{
+                    field: self._run_pipeline(documents, sub_pipeline)
+                    for field, sub_pipeline in spec.items()
+                }]
+            else:
+                raise OperationFailure(f"Unrecognized pipeline stage name: '{name}'")
+        return documents
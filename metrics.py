@@ -0,0 +1,361 @@
+"""
+Latency histograms and MongoDB command monitoring.
+
+Code paths time themselves with `metrics.timer(name, **labels)`; each distinct
+name and label set gets a histogram with fixed, logarithmically spaced buckets
+from which p50/p95/p99 are estimated. A pymongo CommandListener records the
+duration, collection and returned document count of every database command.
+Results are available as Prometheus text (prometheus_text) or as a JSON-ready
+report (json_report).
+
+Recording is off unless MOVIE_METRICS=1 (or enable() is called). While it is
+off, timer() returns a shared no-op context manager and no command listener is
+registered with the client, so the instrumented code runs at its usual speed.
+
+Metrics:
+    movie_cli_action_seconds{action}                   work of main_menu actions, after their prompts
+    movie_ml_stage_seconds{stage, mode}                ML_Api load (mode cached or disk),
+                                                       preprocess and predict (mode single or batch)
+    movie_mongodb_command_seconds{command, collection} database commands
+    movie_mongodb_documents_returned_total{command, collection}
+    movie_mongodb_command_failures_total{command, collection}
+"""
+import bisect
+import math
+import os
+import threading
+import time
+
+from pymongo import monitoring
+
+# Bucket upper bounds in seconds: 10 us growing by sqrt(2) up to about 84 s.
+DEFAULT_BUCKETS = tuple(round(1e-5 * 2 ** (i / 2), 9) for i in range(47))
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+HELP = {
+    "movie_cli_action_seconds": "Time a main menu action spends working after its prompts are answered (up to its first page of results).",
+    "movie_ml_stage_seconds": "Time spent in an ML_Api stage.",
+    "movie_mongodb_command_seconds": "Duration of MongoDB commands as reported by the driver.",
+    "movie_mongodb_documents_returned_total": "Documents returned or affected by MongoDB commands.",
+    "movie_mongodb_command_failures_total": "MongoDB commands that failed.",
+}
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram.
+
+    Args:
+    - buckets (tuple of float): Sorted bucket upper bounds in seconds.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds < self.min:
+                self.min = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by interpolating inside the bucket that holds it.
+
+        Args:
+        - q (float): Quantile between 0 and 1.
+
+        Returns:
+        - float: Estimated value in seconds, or None if nothing was observed.
+        """
+        with self._lock:
+            if not self.count:
+                return None
+            counts = list(self.counts)
+            total, low_value, high_value = self.count, self.min, self.max
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else high_value
+                lower, upper = max(lower, low_value), min(upper, high_value)
+                # Latencies are roughly log-normal, so interpolate on a log scale.
+                fraction = (rank - seen) / count
+                if lower > 0:
+                    estimate = lower * (upper / lower) ** fraction
+                else:
+                    estimate = lower + (upper - lower) * fraction
+                return min(max(estimate, low_value), high_value)
+            seen += count
+        return high_value
+
+    def summary(self):
+        """Count, sum, min, max, mean and the QUANTILES in seconds."""
+        result = {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "mean": self.sum / self.count if self.count else None,
+        }
+        for q in QUANTILES:
+            result[f"p{round(q * 100)}"] = self.quantile(q)
+        return result
+
+
+class _NullTimer:
+    """Context manager that does nothing; returned by timer() while disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Histograms and counters keyed by metric name and labels.
+
+    Args:
+    - enabled (bool): Whether observations are recorded.
+    - buckets (tuple of float): Bucket upper bounds for new histograms.
+    """
+
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._histograms = {}  # (name, label key) -> Histogram
+        self._counters = {}    # (name, label key) -> number
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def observe(self, name, seconds, **labels):
+        """Record one duration in the histogram for `name` and `labels`."""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(self.buckets))
+        histogram.observe(seconds)
+
+    def increment(self, name, value=1, **labels):
+        """Add `value` to the counter for `name` and `labels`."""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def timer(self, name, **labels):
+        """
+        Context manager that records the time spent in its block.
+
+        Usage:
+            with metrics.timer("movie_ml_stage_seconds", stage="predict", mode="single"):
+                ...
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def command_listeners(self):
+        """
+        Listeners to pass to MongoClient(event_listeners=...); empty while
+        disabled so the driver does not publish command events at all.
+        """
+        return [CommandMetricsListener(self)] if self.enabled else []
+
+    def json_report(self):
+        """
+        Summaries of every histogram and counter.
+
+        Returns:
+        - dict: {'histograms': [{'name', 'labels', 'count', 'sum', 'min', 'max',
+          'mean', 'p50', 'p95', 'p99'}, ...], 'counters': [{'name', 'labels', 'value'}, ...]}
+        """
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        return {
+            "enabled": self.enabled,
+            "histograms": [
+                {"name": name, "labels": dict(labels), **histogram.summary()}
+                for (name, labels), histogram in histograms
+            ],
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in counters
+            ],
+        }
+
+    def prometheus_text(self):
+        """Render every metric in the Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), histogram in histograms:
+            describe(name, "histogram")
+            with histogram._lock:
+                counts = list(histogram.counts)
+                total, count = histogram.sum, histogram.count
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == math.inf else f"{bound:.6g}"
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.9g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _command_collection(command_name, command):
+    """The collection a command targets ('' for database-level commands)."""
+    if command_name == "getMore":
+        return command.get("collection", "")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+def _documents_returned(reply):
+    """Documents in a command reply's batch, or affected by a write."""
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+        return len(batch) if batch is not None else 0
+    if "values" in reply:  # distinct
+        return len(reply["values"])
+    if "value" in reply:  # findAndModify
+        return 1 if reply["value"] is not None else 0
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    Records duration, collection and returned documents of MongoDB commands.
+
+    Args:
+    - registry (MetricsRegistry): Where the observations go.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._pending = {}  # (connection, request id) -> (command, collection)
+
+    def started(self, event):
+        if self.registry.enabled:
+            self._pending[(event.connection_id, event.request_id)] = (
+                event.command_name, _command_collection(event.command_name, event.command))
+
+    def succeeded(self, event):
+        started = self._pending.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        command, collection = started
+        self.registry.observe("movie_mongodb_command_seconds", event.duration_micros / 1e6,
+                              command=command, collection=collection)
+        documents = _documents_returned(event.reply)
+        if documents:
+            self.registry.increment("movie_mongodb_documents_returned_total", documents,
+                                    command=command, collection=collection)
+
+    def failed(self, event):
+        started = self._pending.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        command, collection = started
+        self.registry.observe("movie_mongodb_command_seconds", event.duration_micros / 1e6,
+                              command=command, collection=collection)
+        self.registry.increment("movie_mongodb_command_failures_total",
+                                command=command, collection=collection)
+
+
+# Process-wide registry used by the CLI, ML_Api, data_store and the prediction server.
+default_registry = MetricsRegistry(enabled=os.environ.get("MOVIE_METRICS", "0") == "1")
+
+enable = default_registry.enable
+disable = default_registry.disable
+reset = default_registry.reset
+observe = default_registry.observe
+increment = default_registry.increment
+timer = default_registry.timer
+command_listeners = default_registry.command_listeners
+json_report = default_registry.json_report
+prometheus_text = default_registry.prometheus_text
+
+
+def enabled():
+    return default_registry.enabled
@@ -0,0 +1,255 @@
+"""
+Memory-mappable model artifacts.
+
+export_artifacts() flattens the pickled forest into a CompiledForest (with the
+scaler folded into its thresholds) and writes its node arrays, the scaler
+parameters and the feature columns as .npy files plus a manifest.json:
+
+    model_arrays/
+        manifest.json          points at the current version, written last
+        <version>/             one directory per exported model
+            manifest.json
+            feature.npy threshold.npy left.npy right.npy value.npy roots.npy
+            scaler_mean.npy scaler_scale.npy
+
+load_artifacts() opens the arrays with np.load(mmap_mode='r'), so it needs
+neither pickle nor scikit-learn, and every process serving the same version
+shares one copy of the pages through the page cache instead of holding a
+private unpickled copy.
+
+Run with:
+    python model_artifacts.py export
+    python model_artifacts.py verify
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from forest_engine import CompiledForest, IdentityScaler
+
+FORMAT_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+ARTIFACT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_arrays")
+
+FOREST_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+
+def _array_digest(filename):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_json_atomic(filename, payload):
+    """Write JSON next to its destination and rename it into place."""
+    temp = f"{filename}.tmp"
+    with open(temp, "w") as file:
+        json.dump(payload, file, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp, filename)
+
+
+def export_artifacts(output_dir=ARTIFACT_DIR, model_path=None, features_path=None, scaler_path=None):
+    """
+    Write the pickled model, feature columns and scaler as versioned .npy arrays.
+
+    The version is the same content hash ML_Api.model_version() reports for
+    the pickles. Arrays go into a temporary directory that is renamed to
+    <output_dir>/<version> once complete; the top-level manifest is replaced
+    last, so readers never see a partially written version.
+
+    Args:
+    - output_dir (str): Root of the artifact store.
+    - model_path, features_path, scaler_path (str, optional): Source pickles
+      (default: ML_Api's artifact locations).
+
+    Returns:
+    - dict: The manifest of the exported version.
+    """
+    import sklearn
+
+    import ML_Api
+
+    paths = (
+        model_path or ML_Api.MODEL_FILENAME,
+        features_path or ML_Api.FEATURES_FILENAME,
+        scaler_path or ML_Api.SCALER_FILENAME,
+    )
+    registry = ML_Api.ModelRegistry(*paths, engine="sklearn")
+    model, feature_columns, scaler = registry.get()
+    forest = CompiledForest.from_sklearn(model, scaler)
+
+    n_features = model.n_features_in_
+    arrays = {name: getattr(forest, name) for name in FOREST_ARRAYS}
+    arrays["scaler_mean"] = np.asarray(scaler.mean_ if scaler.with_mean else np.zeros(n_features), dtype=np.float64)
+    arrays["scaler_scale"] = np.asarray(scaler.scale_ if scaler.with_std else np.ones(n_features), dtype=np.float64)
+
+    os.makedirs(output_dir, exist_ok=True)
+    version = registry.version
+    version_dir = os.path.join(output_dir, version)
+    staging = tempfile.mkdtemp(prefix=f".{version}-", dir=output_dir)
+    try:
+        os.chmod(staging, 0o755)  # mkdtemp creates it private to this user
+        entries = {}
+        for name, array in arrays.items():
+            filename = os.path.join(staging, f"{name}.npy")
+            np.save(filename, np.ascontiguousarray(array))
+            entries[name] = {
+                "file": f"{name}.npy",
+                "dtype": str(array.dtype),
+                "shape": list(array.shape),
+                "sha256": _array_digest(filename),
+            }
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "version": version,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "sklearn_version": sklearn.__version__,
+            "numpy_version": np.__version__,
+            "n_features": int(n_features),
+            "n_estimators": forest.n_estimators,
+            "max_depth": int(forest.max_depth),
+            "scaled_inputs": forest.scaled_inputs,
+            "feature_columns": list(feature_columns),
+            "arrays": entries,
+        }
+        write_json_atomic(os.path.join(staging, MANIFEST_FILENAME), manifest)
+        if os.path.exists(version_dir):
+            # Same content hash: the arrays are already there.
+            shutil.rmtree(staging)
+        else:
+            os.replace(staging, version_dir)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    write_json_atomic(os.path.join(output_dir, MANIFEST_FILENAME), {
+        "format_version": FORMAT_VERSION,
+        "current": version,
+    })
+    return manifest
+
+
+def read_manifest(path=ARTIFACT_DIR):
+    """
+    Return the manifest of the current version under `path`, or of the version
+    directory `path` itself.
+
+    Returns:
+    - tuple: (version directory, manifest dict)
+
+    Raises:
+    - FileNotFoundError: If no artifacts were exported there.
+    - ValueError: If the manifest has an unsupported format version.
+    """
+    with open(os.path.join(path, MANIFEST_FILENAME)) as file:
+        manifest = json.load(file)
+    if "current" in manifest:
+        path = os.path.join(path, manifest["current"])
+        with open(os.path.join(path, MANIFEST_FILENAME)) as file:
+            manifest = json.load(file)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format_version')!r} in {path}; "
+                         f"expected {FORMAT_VERSION}. Re-run `python model_artifacts.py export`.")
+    return path, manifest
+
+
+def load_artifacts(path=ARTIFACT_DIR, mmap_mode="r", verify=False):
+    """
+    Open exported artifacts without unpickling anything.
+
+    Args:
+    - path (str): Artifact root (uses its current version) or a version directory.
+    - mmap_mode (str or None): Passed to np.load; 'r' maps the files read-only
+      so processes share their pages, None reads them into private memory.
+    - verify (bool): Check each file's SHA-256 against the manifest (reads
+      every file once).
+
+    Returns:
+    - tuple: (CompiledForest, feature_columns, IdentityScaler, manifest), the
+      first three usable with ML_Api's processing and prediction functions.
+
+    Raises:
+    - FileNotFoundError: If the manifest or an array file is missing.
+    - ValueError: If an array is corrupt or does not match the manifest.
+    """
+    version_dir, manifest = read_manifest(path)
+    arrays = {}
+    for name, entry in manifest["arrays"].items():
+        filename = os.path.join(version_dir, entry["file"])
+        if verify and _array_digest(filename) != entry["sha256"]:
+            raise ValueError(f"Checksum mismatch for {filename}")
+        array = np.load(filename, mmap_mode=mmap_mode, allow_pickle=False)
+        if str(array.dtype) != entry["dtype"] or list(array.shape) != entry["shape"]:
+            raise ValueError(f"{filename} is {array.dtype}{array.shape}, manifest says "
+                             f"{entry['dtype']}{tuple(entry['shape'])}")
+        # A plain ndarray view over the mapping avoids np.memmap's per-operation overhead.
+        arrays[name] = array.view(np.ndarray)
+
+    forest = CompiledForest(
+        **{name: arrays[name] for name in FOREST_ARRAYS},
+        max_depth=manifest["max_depth"],
+        n_features=manifest["n_features"],
+        scaled_inputs=manifest["scaled_inputs"],
+    )
+    scaler = IdentityScaler(arrays["scaler_mean"], arrays["scaler_scale"])
+    return forest, list(manifest["feature_columns"]), scaler, manifest
+
+
+def verify_artifacts(path=ARTIFACT_DIR, samples=1000, seed=0):
+    """
+    Check exported artifacts against the pickled model.
+
+    Args:
+    - path (str): Artifact root or version directory.
+    - samples (int): Random rows to compare predictions on.
+    - seed (int): Random seed for the rows.
+
+    Returns:
+    - dict: Version, whether it matches the pickles, and the largest
+      prediction difference.
+    """
+    import ML_Api
+
+    forest, feature_columns, _, manifest = load_artifacts(path, verify=True)
+    model, pickled_columns, scaler = ML_Api.ModelRegistry(engine="sklearn").get()
+    rng = np.random.default_rng(seed)
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(len(pickled_columns))
+    scale = scaler.scale_ if scaler.with_std else np.ones(len(pickled_columns))
+    raw = rng.normal(mean, scale, size=(samples, len(pickled_columns)))
+    expected = model.predict(scaler.transform(raw))
+    actual = forest.predict(raw)
+    return {
+        "version": manifest["version"],
+        "pickle_version": ML_Api.model_version("sklearn"),
+        "feature_columns_match": feature_columns == list(pickled_columns),
+        "max_abs_difference": float(np.max(np.abs(expected - actual))),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or check memory-mappable model artifacts.")
+    parser.add_argument("command", choices=["export", "verify"])
+    parser.add_argument("--output", default=ARTIFACT_DIR, help="Artifact root directory")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        manifest = export_artifacts(args.output)
+        size = sum(np.prod(entry["shape"]) * np.dtype(entry["dtype"]).itemsize
+                   for entry in manifest["arrays"].values())
+        print(f"Exported model version {manifest['version']} "
+              f"({manifest['n_estimators']} trees, {size / 1024:.0f} KiB) to {args.output}")
+    else:
+        result = verify_artifacts(args.output)
+        print(f"Artifact version {result['version']}, pickles {result['pickle_version']}, "
+              f"feature columns match: {result['feature_columns_match']}, "
+              f"max prediction difference {result['max_abs_difference']:.3g}")
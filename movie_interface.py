@@ -1,19 +1,277 @@
-import bcrypt
 import pprint
-from pymongo import MongoClient
-from ML_Api import load_model_and_resources, process_user_input, predict_box_office
+from pymongo.errors import DuplicateKeyError
+from data_store import open_database
+from db_indexes import ensure_indexes
+from read_model import embedded_performance, sync_movie
+from pagination import iter_keyset
+from title_search import TitleIndex, normalize_title
+from query_cache import QueryCache, catalog_version, make_key
+from facets import FacetService
+from usage_rollups import usage_summary
+from event_logger import EventLogger
+from auth import AuthService, AuthBusy
+import metrics
+import people_stats
+import json
+import os
+import threading
+import time
 import warnings
-from sklearn.exceptions import InconsistentVersionWarning
-import numpy as np
-from datetime import datetime
 
 
-# MongoDB connection 
-client = MongoClient("mongodb://localhost:27017/")
-db = client["movie_database"]
+# Database handle; MongoDB connects on first use (backend, URI and pool
+# settings come from the MOVIE_DB_* environment variables, see data_store.py)
+db = open_database()
 
 pp = pprint.PrettyPrinter(indent=4)
 
+# Rows shown per page in the listing screens
+PAGE_SIZE = 20
+
+# Title search matches whose sort field is fetched per query
+SEARCH_BATCH = 1000
+
+# Only the fields shown in the listing tables are fetched
+LISTING_PROJECTION = {
+    "title": 1,
+    "director": 1,
+    "actors": 1,
+    "genre": 1,
+    "release_year": 1,
+    "imdb_score": 1,
+    "performance.final_box_office": 1,
+}
+
+
+# Cache of listing pages; add/update/delete bump catalog_version to invalidate it
+listing_cache = QueryCache()
+
+# bcrypt runs in a thread pool; logins open in-memory sessions
+auth_service = AuthService(db)
+
+# Feature usage events and last_login updates are written in the background
+event_logger = EventLogger(db)
+
+# Genre counts, ranges and histograms for the filter screen, cached until the catalog changes
+facet_service = FacetService(db)
+
+# Preload the ML stack on a background thread after login (MOVIE_PRELOAD_ML=0 disables)
+PRELOAD_ML = os.environ.get("MOVIE_PRELOAD_ML", "1") != "0"
+
+# In-memory title index (exact, substring and prefix search), built on first use
+title_index = None
+
+# Similar-movies index (similar_movies.py), loaded from disk on first use and
+# saved after this many admin changes, on logout and on exit
+similar_index = None
+SIMILAR_SAVE_EVERY = 50
+
+
+def load_ml_api():
+    """
+    Import the prediction API on first use.
+
+    ML_Api pulls in NumPy, pandas and scikit-learn, which take longer to import
+    than the rest of the CLI, so sessions that only browse the catalog never
+    load them.
+    """
+    import ML_Api
+    return ML_Api
+
+
+def preload_ml():
+    """Import the ML stack and unpickle the model on a background thread."""
+    def preload():
+        try:
+            load_ml_api().warm_up()
+        except Exception:
+            pass  # predict_movie_box_office reports loading errors when it is used
+    threading.Thread(target=preload, name="ml-preload", daemon=True).start()
+
+
+def get_title_index():
+    """Return the title index, building it from the catalog the first time."""
+    global title_index
+    if title_index is None:
+        title_index = TitleIndex().build(db)
+    return title_index
+
+
+def load_similar_movies():
+    """Import the similar-movies module (and NumPy) on first use."""
+    import similar_movies
+    return similar_movies
+
+
+def get_similar_index():
+    """
+    Return the similar-movies index, loading or building it the first time and
+    again whenever the served model (and so its scaler) has changed.
+    """
+    global similar_index
+    similar_movies = load_similar_movies()
+    if similar_index is None or similar_index.model_version != similar_movies.served_model_version():
+        similar_index = similar_movies.load_or_build(db)
+    return similar_index
+
+
+def refresh_similar_index(movie_id):
+    """
+    Re-encode (or drop, if deleted) one movie in the loaded similar-movies index.
+
+    The index file is rewritten every SIMILAR_SAVE_EVERY changes and by
+    save_similar_index(); changes not yet saved are picked up from the catalog
+    when the file is next loaded.
+    """
+    if similar_index is None:
+        return  # load_or_build() reconciles the saved index with the catalog
+    similar_movies = load_similar_movies()
+    movie = db.movie.find_one({"_id": movie_id}, similar_movies.MOVIE_PROJECTION)
+    if movie:
+        similar_index.upsert(similar_movies.with_box_office_percentages(db, [movie]))
+    else:
+        similar_index.remove(movie_id)
+    if similar_index.unsaved >= SIMILAR_SAVE_EVERY:
+        similar_index.save()
+
+
+def save_similar_index():
+    """Write the loaded similar-movies index to disk if it has unsaved changes."""
+    if similar_index is not None and similar_index.unsaved:
+        try:
+            similar_index.save()
+        except OSError as e:
+            print(f"Error saving the similar-movies index: {e}")
+
+
+def show_similar_movies(movie, limit=5):
+    """Print the catalog movies most similar to a movie, with their box office."""
+    try:
+        results = get_similar_index().similar_to(movie, limit)
+    except Exception as e:
+        print(f"Error loading the similar-movies index: {e}")
+        return
+    found = {similar["_id"]: similar for similar in db.movie.find(
+        {"_id": {"$in": [movie_id for movie_id, _ in results]}},
+        {"title": 1, "release_year": 1, "performance.final_box_office": 1})}
+    print("\nSimilar movies:")
+    for movie_id, score in results:
+        similar = found.get(movie_id)
+        if similar is None:
+            continue
+        box_office = (similar.get("performance") or {}).get("final_box_office") or 0
+        box_office = f"${box_office:,.0f}" if box_office else "N/A"
+        print(f"  {score:.2f}  {similar['title']} ({similar.get('release_year', 'N/A')}) - Box Office: {box_office}")
+
+
+def find_movie_by_title(title):
+    """Find a movie by title, ignoring case, accents and extra spaces."""
+    movie_ids = get_title_index().lookup(title)
+    if not movie_ids:
+        return None
+    return db.movie.find_one({"_id": {"$in": movie_ids}})
+
+
+def suggest_titles(title):
+    """Print the closest titles for a title that was not found."""
+    suggestions = get_title_index().autocomplete(title, limit=5)
+    if suggestions:
+        print("Did you mean: " + ", ".join(suggestion for suggestion, _ in suggestions))
+
+
+def record_action(action, started):
+    """Record the latency of a CLI action's work, timed from `started` (after its prompts)."""
+    metrics.observe("movie_cli_action_seconds", time.perf_counter() - started, action=action)
+
+
+def show_movie_pages(query, sort_key, sort_order, limit, format_row, action=None):
+    """
+    Print matching movies page by page using keyset pagination.
+
+    Rows are printed as each page arrives; the next page is only fetched once
+    the user asks for it.
+    """
+    started = time.perf_counter()
+    movies = iter_keyset(db.movie, query, sort_key, sort_order,
+                         page_size=PAGE_SIZE, projection=LISTING_PROJECTION, limit=limit,
+                         cache=listing_cache)
+    print_pages(movies, limit, format_row, action, started)
+
+
+def print_pages(movies, limit, format_row, action=None, started=None):
+    """
+    Print rows from an iterable of movies, pausing after every PAGE_SIZE rows.
+
+    With an `action`, the time from `started` until the first page is shown
+    (or the rows run out) is recorded as that CLI action's latency.
+    """
+    started = started if started is not None else time.perf_counter()
+    shown = 0
+    for movie in movies:
+        if limit is not None and shown >= limit:
+            break
+        print(format_row(movie))
+        shown += 1
+        if shown % PAGE_SIZE == 0 and (limit is None or shown < limit):
+            if action is not None:
+                record_action(action, started)
+                action = None
+            if input("-- Press Enter for more, or 'q' to stop: ").strip().lower() == "q":
+                break
+    if shown == 0:
+        print("No movies found.")
+    if action is not None:
+        record_action(action, started)
+
+
+def _sort_value(movie, sort_key):
+    value = movie
+    for part in sort_key.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def search_result_ids(title, sort_key, sort_order):
+    """
+    Order the title index matches for `title` by a movie field.
+
+    Only the sort field is fetched, SEARCH_BATCH ids per query, and equal
+    values keep the index's relevance order. Missing values sort first when
+    ascending, as in MongoDB.
+    """
+    index = get_title_index()
+    movie_ids = index.search(title)
+    if sort_key == "title":
+        values = {movie_id: index.titles[movie_id][0] for movie_id in movie_ids}
+    else:
+        values = {}
+        for start in range(0, len(movie_ids), SEARCH_BATCH):
+            for movie in db.movie.find({"_id": {"$in": movie_ids[start:start + SEARCH_BATCH]}}, {sort_key: 1}):
+                values[movie["_id"]] = _sort_value(movie, sort_key)
+
+    def key(movie_id):
+        value = values.get(movie_id)
+        return (value is not None, value if value is not None else 0)
+    return sorted(movie_ids, key=key, reverse=sort_order == -1)
+
+
+def iter_search_pages(title, sort_key, sort_order, movie_ids):
+    """
+    Yield the movies for an ordered _id list, fetching (or reading from the
+    listing cache) one PAGE_SIZE slice at a time. Pages are cached by the
+    normalized query, sort and page number rather than by the ids.
+    """
+    query_key = normalize_title(title)
+    for page, start in enumerate(range(0, len(movie_ids), PAGE_SIZE)):
+        page_ids = movie_ids[start:start + PAGE_SIZE]
+        key = make_key("search", query_key, sort_key, sort_order, page)
+        rows = listing_cache.get_or_load(key, lambda: db.movie.find({"_id": {"$in": page_ids}}, LISTING_PROJECTION))
+        by_id = {row["_id"]: row for row in rows}
+        for movie_id in page_ids:
+            if movie_id in by_id:
+                yield by_id[movie_id]
+
+
 def signup():
     """Signup a new user."""
     print("\n--- Signup ---")
@@ -25,21 +283,22 @@ def signup():
         print("Username already exists. Please choose a different username.")
         return None
     
-    # Get password and hash it
     password = input("Enter a password: ")
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
 
     role = input("Enter role (admin/user): ").lower()
     if role not in ["admin", "user"]:
         print("Invalid role. Defaulting to 'user'.")
         role = "user"
 
-    # Save the new user to the database
-    db.users.insert_one({
-        "username": username,
-        "password": hashed_password,
-        "role": role
-    })
+    # Hash the password and save the new user (users.username is uniquely indexed)
+    try:
+        auth_service.register(username, password, role)
+    except DuplicateKeyError:
+        print("Username already exists. Please choose a different username.")
+        return None
+    except AuthBusy as e:
+        print(f"{e} Please try again.")
+        return None
     print("User registered successfully! Please login to continue.")
 
 
@@ -51,24 +310,39 @@ def login():
     username = input("Enter your username: ")
     password = input("Enter your password: ")
 
-    # Find the user in the database
-    user = db.users.find_one({"username": username})
-    if not user or not bcrypt.checkpw(password.encode('utf-8'), user["password"]):
+    # Check the password and open a session
+    try:
+        result = auth_service.authenticate(username, password)
+    except AuthBusy as e:
+        print(f"{e} Please try again.")
+        return None
+    if result is None:
         print("Invalid username or password. Please try again.")
         return None
+    user, token = result
+    user["session_token"] = token
 
-    # Update the last_login field to the current date
-    current_date = datetime.now().strftime("%Y-%m-%d")
-    db.users.update_one({"_id": user["_id"]}, {"$set": {"last_login": current_date}})
+    # Update the last_login field to the current date (written in the background)
+    event_logger.touch_login(user["_id"])
 
     print(f"Welcome, {username}!")
     return user
 
 def list_movies():
     """List all movies or filter by multiple criteria."""
-    genres = db.movie.distinct("genre")
+    with metrics.timer("movie_cli_action_seconds", action="movie_filter_facets"):
+        facets = facet_service.get()
     print("\nAvailable Genres:")
-    print(", ".join(genres))  # Display genres as a comma-separated list
+    print(", ".join(f"{genre} ({count})" for genre, count in facets["genres"]))
+
+    # Show the valid ranges so the filters below can be chosen sensibly
+    ranges = facets["ranges"]
+    if ranges["release_year"][0] is not None:
+        print(f"Release years: {ranges['release_year'][0]}-{ranges['release_year'][1]}   "
+              f"IMDB scores: {ranges['imdb_score'][0]}-{ranges['imdb_score'][1]}   "
+              f"Budgets: ${ranges['budget'][0]:,}-${ranges['budget'][1]:,}")
+        decades = ", ".join(f"{int(low)}s: {count}" for low, _, count in facets["histograms"]["release_year"])
+        print(f"Movies per decade: {decades}")
 
     # Filters
     genre = input("Enter genre to filter by (or press Enter for all): ")
@@ -78,6 +352,9 @@ def list_movies():
 
     # Build the query based on filters
     query = {}
+    # The genre match is case-insensitive; lower-casing it lets equivalent
+    # filters share a cache entry
+    genre = genre.strip().lower()
     if genre:
         query["genre"] = {"$regex": f"^{genre}$", "$options": "i"}
     if min_year:
@@ -113,38 +390,24 @@ def list_movies():
     limit = input("Enter the maximum number of results to display (or press Enter for no limit): ")
     limit = int(limit) if limit.isdigit() else None
 
-    # Aggregation to join with `movie_performance`, sort, and limit
-    pipeline = [
-        {"$match": query},
-        {"$lookup": {
-            "from": "movie_performance",
-            "localField": "_id",
-            "foreignField": "movie_id",
-            "as": "performance"
-        }},
-        {"$unwind": {"path": "$performance", "preserveNullAndEmptyArrays": True}},
-        {"$sort": {sort_key: sort_order}}
-    ]
-    if limit:  # if the user specifies a limit
-        pipeline.append({"$limit": limit})
-
-    movies = db.movie.aggregate(pipeline)
+    def format_row(movie):
+        box_office = movie.get("performance", {}).get("final_box_office", "N/A")
+        actors = ", ".join(movie.get("actors", []))
+        return f"{movie['title']:<50} {movie['director']:<20} {actors:<60} {movie['genre']:<10} {movie['release_year']:<5} {movie['imdb_score']:<5} {box_office:<15}"
 
     # Display the movies
     print("\nMovies:")
     print(f"{'Title':<50} {'Director':<20} {'Cast':<60} {'Genre':<10} {'Year':<5} {'IMDB':<5} {'Box Office':<15}")
     print("-" * 160)
-    for movie in movies:
-        box_office = movie.get("performance", {}).get("final_box_office", "N/A")
-        actors = ", ".join(movie.get("actors", []))
-        print(f"{movie['title']:<50} {movie['director']:<20} {actors:<60} {movie['genre']:<10} {movie['release_year']:<5} {movie['imdb_score']:<5} {box_office:<15}")
+    # Performance data is embedded in each movie (see read_model.py), so the
+    # pages are read from `movie` alone and the sort can use an index
+    show_movie_pages(query, sort_key, sort_order, limit, format_row, action="movie_filter")
 
 
 
 def search_movies():
     """Search movies by title and sort results."""
     title = input("Enter part of the movie title: ")
-    query = {"title": {"$regex": title, "$options": "i"}}
 
     # Sorting Options
     print("\nSort Options:")
@@ -171,31 +434,27 @@ def search_movies():
     limit = input("Enter the maximum number of results to display (or press Enter for no limit): ")
     limit = int(limit) if limit.isdigit() else None
 
-    # Aggregation to join with `movie_performance` and sort
-    pipeline = [
-        {"$match": query},
-        {"$lookup": {
-            "from": "movie_performance",
-            "localField": "_id",
-            "foreignField": "movie_id",
-            "as": "performance"
-        }},
-        {"$unwind": {"path": "$performance", "preserveNullAndEmptyArrays": True}},
-        {"$sort": {sort_key: sort_order}}
-    ]
-    if limit:  # if the user specifies a limit
-        pipeline.append({"$limit": limit})
-
-    movies = db.movie.aggregate(pipeline)
+    def format_row(movie):
+        box_office = movie.get("performance", {}).get("final_box_office", "N/A")
+        actors = ", ".join(movie.get("actors", []))
+        genre = movie.get("genre", "N/A")
+        return f"{movie['title']:<50} {movie['director']:<20} {genre:<15} {actors:<60} {movie['imdb_score']:<10} {movie['release_year']:<5} {box_office:<15}"
+
     # Display the movies
     print("\nSearch Results:")
     print(f"{'Title':<50} {'Director':<20} {'Genre':<15} {'Cast':<60} {'IMDB Score':<10} {'Year':<5} {'Box Office':<15}")
     print("-" * 160)
-    for movie in movies:
-        box_office = movie.get("performance", {}).get("final_box_office", "N/A")
-        actors = ", ".join(movie.get("actors", []))
-        genre = movie.get("genre", "N/A")
-        print(f"{movie['title']:<50} {movie['director']:<20} {genre:<15} {actors:<60} {movie['imdb_score']:<10} {movie['release_year']:<5} {box_office:<15}")
+    if not title.strip():
+        # Performance data is embedded in each movie (see read_model.py), so the
+        # pages are read from `movie` alone and the sort can use an index
+        show_movie_pages({}, sort_key, sort_order, limit, format_row, action="movie_search")
+        return
+    # Substring search runs against the in-memory trigram index; the matches
+    # are ordered and paged in memory, fetching one page of movies at a time
+    started = time.perf_counter()
+    movie_ids = search_result_ids(title, sort_key, sort_order)
+    print_pages(iter_search_pages(title, sort_key, sort_order, movie_ids), limit, format_row,
+                "movie_search", started)
 
 def show_active_users():
     """Display active users."""
@@ -214,18 +473,62 @@ def show_active_users():
 def show_feature_usage():
     """Display most used features."""
 
-    # Aggregate feature usage counts
-    features = db.feature_usage.aggregate([
-        { "$group": { "_id": "$feature_name", "usage_count": { "$sum": 1 } } },
-        { "$sort": { "usage_count": -1 } }
-    ])
+    # Optional date range (rollups are stored per day)
+    start_date = input("Start date YYYY-MM-DD (or press Enter for all): ").strip()
+    end_date = input("End date YYYY-MM-DD (or press Enter for all): ").strip()
+
+    # Read the pre-aggregated daily rollups instead of grouping raw events
+    with metrics.timer("movie_cli_action_seconds", action="user_analytics"):
+        features = usage_summary(db, start_date or None, end_date or None)
     
     # Display feature usage
     print("\nMost Used Features:")
-    print(f"{'Feature Name':<20} {'Usage Count':<10}")
-    print("-" * 30)
+    print(f"{'Feature Name':<25} {'Usage Count':<12} {'Success':<8} {'Failure':<8} {'N/A':<8}")
+    print("-" * 65)
     for feature in features:
-        print(f"{feature['_id']:<20} {feature['usage_count']:<10}")
+        outcomes = feature["outcomes"]
+        print(f"{feature['feature_name']:<25} {feature['usage_count']:<12} "
+              f"{outcomes['success']:<8} {outcomes['failure']:<8} {outcomes['N/A']:<8}")
+
+def show_cache_stats():
+    """Display hit/miss statistics of the listing cache."""
+    stats = listing_cache.stats()
+    print("\nListing Cache:")
+    print(f"{'Entries':<20} {stats['entries']}")
+    print(f"{'Memory':<20} {stats['bytes'] / 1024:.1f} KiB of {stats['max_bytes'] / 1024:.0f} KiB")
+    print(f"{'Hits / Misses':<20} {stats['hits']} / {stats['misses']} ({stats['hit_rate']:.1%} hit rate)")
+    print(f"{'Evictions':<20} {stats['evictions']}")
+    print(f"{'Expired/invalidated':<20} {stats['expirations']}")
+    print(f"{'Catalog version':<20} {stats['catalog_version']}")
+
+def show_latency_metrics():
+    """Display latency percentiles, or dump all metrics as JSON or Prometheus text."""
+    if not metrics.enabled():
+        print("Latency metrics are disabled. Start the CLI with MOVIE_METRICS=1 to record them.")
+        return
+    print("\n1. Summary table")
+    print("2. JSON report")
+    print("3. Prometheus text format")
+    choice = input("Choose an option: ")
+
+    if choice == "1":
+        report = metrics.json_report()
+        print(f"\n{'Metric':<50} {'Count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        print("-" * 88)
+        for histogram in report["histograms"]:
+            labels = ",".join(f"{key}={value}" for key, value in histogram["labels"].items())
+            name = histogram["name"].replace("movie_", "", 1).replace("_seconds", "")
+            print(f"{name + '{' + labels + '}':<50} {histogram['count']:>7} "
+                  f"{histogram['p50'] * 1000:>9.2f} {histogram['p95'] * 1000:>9.2f} {histogram['p99'] * 1000:>9.2f}")
+        for counter in report["counters"]:
+            labels = ",".join(f"{key}={value}" for key, value in counter["labels"].items())
+            print(f"{counter['name'] + '{' + labels + '}':<50} {counter['value']:>7}")
+    elif choice == "2":
+        print(json.dumps(metrics.json_report(), indent=2))
+    elif choice == "3":
+        print(metrics.prometheus_text())
+    else:
+        print("Invalid choice.")
 
 def user_analytics():
     """View active users and feature usage."""
@@ -233,12 +536,20 @@ def user_analytics():
     # Allow the user to choose between viewing active users or feature usage
     print("\n1. View active users")
     print("2. View most used features")
+    print("3. View listing cache statistics")
+    print("4. View latency metrics")
     choice = input("Choose an option: ")
     
     if choice == "1":
-        show_active_users()
+        with metrics.timer("movie_cli_action_seconds", action="user_analytics"):
+            show_active_users()
     elif choice == "2":
         show_feature_usage()
+    elif choice == "3":
+        with metrics.timer("movie_cli_action_seconds", action="user_analytics"):
+            show_cache_stats()
+    elif choice == "4":
+        show_latency_metrics()
     else:
         print("Invalid choice.")
 
@@ -253,6 +564,7 @@ def add_movie():
     imdb_score = float(input("IMDB Score: "))
     actors = input("Actors (comma-separated): ").split(",")
     final_box_office = int(input("Final Box Office (or 0 if not available): "))
+    started = time.perf_counter()
 
     # Insert the movie into the `movie` collection
     movie = {
@@ -267,6 +579,7 @@ def add_movie():
     }
     result = db.movie.insert_one(movie)
     movie_id = result.inserted_id
+    get_title_index().add(movie_id, title)
 
     # Insert the box office data into the `movie_performance` collection
     performance = {
@@ -278,6 +591,13 @@ def add_movie():
     }
     db.movie_performance.insert_one(performance)
 
+    # Keep the embedded copy used by the listing screens in sync
+    db.movie.update_one({"_id": movie_id}, {"$set": {"performance": embedded_performance(performance)}})
+    catalog_version.bump()
+    people_stats.apply_change(db, after={**movie, "performance": embedded_performance(performance)})
+    refresh_similar_index(movie_id)
+    record_action("add_movie", started)
+
     print(f"Movie added with ID: {movie_id}")
 
 
@@ -286,10 +606,14 @@ def update_movie():
 
     # Prompt user for the movie title
     title = input("Enter the title of the movie to update: ")
-    movie = db.movie.find_one({"title": {"$regex": f"^{title}$", "$options": "i"}})
+    started = time.perf_counter()
+    movie = find_movie_by_title(title)
     if not movie:
         print("Movie not found.")
+        suggest_titles(title)
         return
+    performance = db.movie_performance.find_one({"movie_id": movie["_id"]})
+    lookup_seconds = time.perf_counter() - started
 
     # Allow user to update each field or keep the existing value
     print("Leave fields blank to keep current values.")
@@ -302,6 +626,14 @@ def update_movie():
     new_year = int(new_year) if new_year else movie['release_year']
     new_score = input(f"New IMDB score ({movie['imdb_score']}): ")
     new_score = float(new_score) if new_score else movie['imdb_score']
+    if performance:
+        new_box_office = input(f"New box office ({performance['final_box_office']}): ")
+        new_box_office = int(new_box_office) if new_box_office else performance["final_box_office"]
+    else:
+        new_box_office = int(input("Enter final box office (or 0 if not available): "))
+
+    # Only the lookup and the writes count towards the action's latency
+    started = time.perf_counter() - lookup_seconds
 
     # Update movie details in the `movie` collection
     db.movie.update_one(
@@ -316,18 +648,16 @@ def update_movie():
         }}
     )
 
+    get_title_index().update(movie["_id"], new_title)
+
     # Update box office data in the `movie_performance` collection
-    performance = db.movie_performance.find_one({"movie_id": movie["_id"]})
     if performance:
-        new_box_office = input(f"New box office ({performance['final_box_office']}): ")
-        new_box_office = int(new_box_office) if new_box_office else performance["final_box_office"]
         db.movie_performance.update_one(
             {"movie_id": movie["_id"]},
             {"$set": {"final_box_office": new_box_office}}
         )
     else:
         # Add new box office data if it doesn't exist
-        new_box_office = int(input("Enter final box office (or 0 if not available): "))
         db.movie_performance.insert_one({
             "movie_id": movie["_id"],
             "final_box_office": new_box_office,
@@ -336,6 +666,14 @@ def update_movie():
             "performance": "N/A"
         })
 
+    # Keep the embedded copy used by the listing screens in sync
+    sync_movie(db, movie["_id"])
+    catalog_version.bump()
+    people_stats.apply_change(db, before=movie,
+                              after=db.movie.find_one({"_id": movie["_id"]}, people_stats.STATS_PROJECTION))
+    refresh_similar_index(movie["_id"])
+    record_action("update_movie", started)
+
     print(f"Movie '{title}' updated successfully, including box office data.")
 
 
@@ -345,28 +683,52 @@ def delete_movie():
 
     # Prompt the user for the title of the movie to delete
     title = input("Enter the title of the movie to delete: ")
-    result = db.movie.delete_one({"title": title})
-    if result.deleted_count > 0:
+    started = time.perf_counter()
+    movie = db.movie.find_one_and_delete({"title": title}, projection=people_stats.STATS_PROJECTION)
+    if movie:
+        get_title_index().remove(movie["_id"])
+        # Remove its performance data as well so no orphaned rows are left
+        db.movie_performance.delete_many({"movie_id": movie["_id"]})
+        catalog_version.bump()
+        people_stats.apply_change(db, before=movie)
+        refresh_similar_index(movie["_id"])
+        record_action("delete_movie", started)
         print(f"Movie '{title}' deleted.")
     else:
         print("Movie not found.")
 
+def derive_box_office_percentages(director, actors, actors_boxoffice=None, directors_boxoffice=None):
+    """
+    Actors and Director Box Office % for a prediction: the given values, with
+    missing (None) ones derived by people_stats.fill_box_office_percentages,
+    printing the derived values.
+
+    Returns:
+    - tuple: (actors %, director %), 0 for people without a known box office.
+    """
+    filled = people_stats.fill_box_office_percentages(
+        db, [(director, actors, actors_boxoffice, directors_boxoffice)])[0]
+    for label, given, value in (("Actors", actors_boxoffice, filled[0]), ("Director", directors_boxoffice, filled[1])):
+        if given is None:
+            print(f"{label} Box Office % from the catalog: {value}")
+    return filled
+
+
 def predict_movie_box_office():
     """Predict the box office of a movie based on user inputs or database data."""
     print("\n--- Predict Movie Box Office ---")
 
     # Suppress warnings
-    warnings.filterwarnings("ignore", category=InconsistentVersionWarning)
     warnings.filterwarnings("ignore", category=UserWarning)
-    warnings.filterwarnings("ignore", message="DataFrame is highly fragmented")
 
-    # Load model, feature columns, and scaler
-    print("Loading model resources...")
+    # Load model, feature columns, and scaler (cached after the first call)
     try:
-        model, features, scaler = load_model_and_resources()
+        ml_api = load_ml_api()
+        model, features, scaler = ml_api.load_model_and_resources()
     except Exception as e:
         print(f"Error loading model resources: {e}")
         return
+    print(f"Using model version {ml_api.model_version()}")
 
     # Choose input source
     print("\n1. Use a movie from the database")
@@ -376,9 +738,11 @@ def predict_movie_box_office():
     if choice == "1":
         # Select a movie from the database
         title = input("Enter the title of the movie to predict: ")
-        movie = db.movie.find_one({"title": {"$regex": f"^{title}$", "$options": "i"}})
+        started = time.perf_counter()
+        movie = find_movie_by_title(title)
         if not movie:
             print("Movie not found in the database.")
+            suggest_titles(title)
             return
 
         # Get performance data from movie_performance collection
@@ -387,12 +751,17 @@ def predict_movie_box_office():
             print("Performance data for this movie is not available.")
             return
 
+        # Movies added in the CLI have no precomputed percentages; derive them
+        movie_id, director, actors, genre = movie["_id"], movie.get("director"), movie.get("actors"), movie.get("genre")
+        actors_boxoffice, directors_boxoffice = derive_box_office_percentages(
+            director, actors, performance.get("actor_boxoffice_%"), performance.get("director_boxoffice_%"))
+
         # Create the user input dictionary from the database data
         user_input = {
             'Running time': movie.get("running_time", 0),  # Default to 0 if not available
             'budget': movie.get("budget", 0),
-            'Actors Box Office %': performance.get("actor_boxoffice_%", 0),
-            'Director Box Office %': performance.get("director_boxoffice_%", 0),
+            'Actors Box Office %': actors_boxoffice,
+            'Director Box Office %': directors_boxoffice,
             'Oscar and Golden Globes nominations': performance.get("oscars_and_golden_globes_nominations", 0),
             'Release year': movie.get("release_year", 0),
             'IMDb score': movie.get("imdb_score", 0),
@@ -402,11 +771,19 @@ def predict_movie_box_office():
         try:
             running_time = int(input("Enter the movie's running time (in minutes): "))
             budget = int(input("Enter the movie's budget (e.g., 50000000): "))
-            actors_boxoffice = float(input("Enter Actors Box Office % (e.g., 50): "))
-            directors_boxoffice = float(input("Enter Director Box Office % (e.g., 69.23): "))
+            actors_boxoffice = input("Enter Actors Box Office % (e.g., 50, blank to derive): ").strip()
+            directors_boxoffice = input("Enter Director Box Office % (e.g., 69.23, blank to derive): ").strip()
+            movie_id = genre = None
+            director = "" if directors_boxoffice else input("Director: ")
+            actors = "" if actors_boxoffice else input("Actors (comma-separated): ")
+            actors_boxoffice, directors_boxoffice = derive_box_office_percentages(
+                director, actors,
+                float(actors_boxoffice) if actors_boxoffice else None,
+                float(directors_boxoffice) if directors_boxoffice else None)
             oscar_nominations = int(input("Enter Oscar and Golden Globes nominations (e.g., 0): "))
             release_year = int(input("Enter the movie's release year (e.g., 2016): "))
             imdb_score = float(input("Enter the movie's IMDb score (e.g., 7.4): "))
+            started = time.perf_counter()
 
             user_input = {
                 'Running time': running_time,
@@ -426,19 +803,124 @@ def predict_movie_box_office():
 
     # Process user input
     try:
-        input_scaled = process_user_input(user_input, features, scaler)
+        input_scaled = ml_api.process_user_input(user_input, features, scaler)
     except Exception as e:
         print(f"Error processing user input: {e}")
         return
 
     # Predict
     try:
-        predicted_box_office = predict_box_office(model, input_scaled)
-        if isinstance(predicted_box_office, np.ndarray):
+        predicted_box_office = ml_api.predict_box_office(model, input_scaled)
+        if hasattr(predicted_box_office, "__len__"):
             predicted_box_office = float(predicted_box_office[0])
         print(f"\nPredicted Box Office Revenue: ${predicted_box_office:,.2f}")
     except Exception as e:
         print(f"Error predicting box office: {e}")
+        return
+    record_action("box_office_prediction", started)
+
+    if input("\nShow similar movies for comparison? (y/n): ").strip().lower() == "y":
+        show_similar_movies(load_similar_movies().movie_from_inputs(user_input, director, actors, genre, movie_id))
+    if input("\nRun a what-if sweep on this movie? (y/n): ").strip().lower() == "y":
+        run_what_if_sweep(ml_api, model, features, scaler, user_input)
+    return predicted_box_office
+
+
+def parse_sweep(text):
+    """
+    Parse a what-if range typed by the user.
+
+    Args:
+    - text (str): 'start:stop:steps' (e.g. '30000000:120000000:10') or
+      comma-separated values (e.g. '2018, 2020, 2022').
+
+    Returns:
+    - dict or list: A sweep spec for ML_Api.what_if_sweep (a range dict or the values).
+
+    Raises:
+    - ValueError: If the text is neither form.
+    """
+    if ":" in text:
+        start, stop, steps = text.split(":")
+        if int(steps) < 1:
+            raise ValueError("steps must be at least 1")
+        return {"start": float(start), "stop": float(stop), "steps": int(steps)}
+    values = [float(value) for value in text.split(",") if value.strip()]
+    if not values:
+        raise ValueError("no values given")
+    return values
+
+
+def _format_money(value):
+    return f"${value / 1e6:,.1f}M"
+
+
+def _format_value(value):
+    # Thousands separators for money-sized values only, so years print as 2016
+    if abs(value) >= 10000:
+        return f"{value:,.0f}"
+    return f"{value:g}"
+
+
+def run_what_if_sweep(ml_api, model, features, scaler, user_input):
+    """Vary inputs of a movie over ranges and show how the prediction responds."""
+    fields = ml_api.INPUT_COLUMNS
+    sweeps = {}
+    while True:
+        print("\nInputs:")
+        for number, field in enumerate(fields, start=1):
+            chosen = " (swept)" if field in sweeps else ""
+            print(f"{number}. {field} = {_format_value(float(user_input[field]))}{chosen}")
+        choice = input("Input to vary (number, or press Enter to run): ").strip()
+        if not choice:
+            break
+        if not choice.isdigit() or not 1 <= int(choice) <= len(fields):
+            print("Invalid choice.")
+            continue
+        field = fields[int(choice) - 1]
+        try:
+            sweeps[field] = parse_sweep(input(f"Values for {field} (start:stop:steps or comma-separated): "))
+        except ValueError as e:
+            print(f"Invalid range: {e}")
+
+    if not sweeps:
+        print("No inputs to vary.")
+        return None
+    try:
+        result = ml_api.what_if_sweep(model, features, scaler, user_input, sweeps)
+    except (KeyError, ValueError) as e:
+        print(f"Error running the sweep: {e}")
+        return None
+
+    predictions = result["predictions"]
+    print(f"\nScored {predictions.size} combinations (base prediction {_format_money(result['base_prediction'])}).")
+
+    # Full table for one or two swept inputs
+    if len(result["fields"]) == 1:
+        print(f"\n{result['fields'][0]:<30} {'Predicted':>12}")
+        for value, predicted in zip(result["values"][0], predictions):
+            print(f"{_format_value(value):<30} {_format_money(predicted):>12}")
+    elif len(result["fields"]) == 2:
+        row_field, column_field = result["fields"]
+        print(f"\nRows: {row_field}, columns: {column_field}")
+        print(f"{'':<16}" + "".join(f"{_format_value(value):>12}" for value in result["values"][1]))
+        for value, row in zip(result["values"][0], predictions):
+            print(f"{_format_value(value):<16}" + "".join(f"{_format_money(predicted):>12}" for predicted in row))
+
+    best = result["best"]
+    print("\nBest combination: " + ", ".join(
+        f"{field} = {_format_value(value)}" for field, value in best["inputs"].items())
+        + f" -> {_format_money(best['prediction'])}")
+
+    # Sensitivity: how far the average prediction moves across each input's range
+    print(f"\n{'Input':<38} {'Range':<28} {'Swing':>10}")
+    print("-" * 78)
+    by_swing = sorted(result["sensitivity"].items(), key=lambda item: -item[1]["swing"])
+    for field, sensitivity in by_swing:
+        values = sensitivity["values"]
+        value_range = f"{_format_value(values[0])} .. {_format_value(values[-1])}"
+        print(f"{field:<38} {value_range:<28} {_format_money(sensitivity['swing']):>10}")
+    return result
 
 
 
@@ -454,11 +936,16 @@ def menu():
         if choice == "1":
             user = login()
             if user:
+                if PRELOAD_ML:
+                    preload_ml()
                 main_menu(user)  # Proceed to the main menu after successful login
         elif choice == "2":
             signup()  # Redirect to signup and then back to login
         elif choice == "3":
             print("Goodbye!")
+            save_similar_index()
+            event_logger.close()
+            auth_service.close()
             break
         else:
             print("Invalid choice. Try again.")
@@ -467,6 +954,13 @@ def menu():
 def main_menu(user):
     """CLI menu for logged-in users."""
     while True:
+        # Later actions are authorized by the session, not the password
+        if auth_service.session(user["session_token"]) is None:
+            print("Your session has expired. Please log in again.")
+            save_similar_index()
+            event_logger.flush()
+            break
+
         # Display menu options
         print("\n--- Main Menu ---")
         print("1. Filter movies")
@@ -484,23 +978,35 @@ def main_menu(user):
         
         choice = input("Choose an option: ")
         
-        # Handle user input
+        # Handle user input (each action records the latency of its work, after its prompts)
         if choice == "1":
             list_movies()
+            event_logger.log(user["username"], "movie_filter", "User filtered the movie list.")
         elif choice == "2":
             search_movies()
+            event_logger.log(user["username"], "movie_search", "User searched movies by title.")
         elif choice == "3":
             user_analytics()
+            event_logger.log(user["username"], "user_analytics", "User viewed user analytics.")
         elif choice == "4":
-            predict_movie_box_office()  # Call the new function
+            predicted = predict_movie_box_office()
+            event_logger.log(user["username"], "box_office_prediction",
+                             "User predicted a movie's box office.",
+                             "success" if predicted is not None else "failure")
         elif choice == "5" and user["role"] == "admin":
             add_movie()
+            event_logger.log(user["username"], "add_movie", "Admin added a movie.")
         elif choice == "6" and user["role"] == "admin":
             update_movie()
+            event_logger.log(user["username"], "update_movie", "Admin updated a movie.")
         elif choice == "7" and user["role"] == "admin":
             delete_movie()
+            event_logger.log(user["username"], "delete_movie", "Admin deleted a movie.")
         elif choice == "8":
             print("Logging out...")
+            auth_service.logout(user["session_token"])
+            save_similar_index()
+            event_logger.flush()
             break
         else:
             print("Invalid choice or insufficient permissions. Try again.")
@@ -509,4 +1015,11 @@ def main_menu(user):
 
 # Run the CLI
 if __name__ == "__main__":
+    # Make sure the collections are indexed (no-op when they already are)
+    ensure_indexes(db)
+
+    # The pickled model was saved with an older scikit-learn; match the warning
+    # by message so scikit-learn does not have to be imported here
+    warnings.filterwarnings("ignore", message="Trying to unpickle estimator")
+    event_logger.start()
     menu()
@@ -0,0 +1,112 @@
+"""
+Keyset pagination over MongoDB collections.
+
+Pages are requested with a filter on the last row's (sort key, _id) instead of
+skip/offset, so every page costs the same no matter how deep the user goes.
+"""
+from query_cache import make_key
+
+DEFAULT_PAGE_SIZE = 20
+
+
+def keyset_filter(sort_key, sort_order, last_value, last_id):
+    """
+    Build the filter selecting rows strictly after (last_value, last_id).
+
+    Missing/null sort values order before every other value, matching
+    MongoDB's sort order, and are handled explicitly because range operators
+    never match null.
+
+    Args:
+    - sort_key (str): Field the rows are sorted on.
+    - sort_order (int): 1 for ascending, -1 for descending.
+    - last_value: Sort key value of the last row already shown (None if missing).
+    - last_id (ObjectId): _id of the last row already shown.
+
+    Returns:
+    - dict: A MongoDB filter.
+    """
+    id_op = "$gt" if sort_order == 1 else "$lt"
+    same_value = {sort_key: last_value, "_id": {id_op: last_id}}
+    if last_value is None:
+        if sort_order == 1:
+            return {"$or": [same_value, {sort_key: {"$ne": None}}]}
+        return same_value
+    value_op = "$gt" if sort_order == 1 else "$lt"
+    branches = [{sort_key: {value_op: last_value}}, same_value]
+    if sort_order == -1:
+        branches.append({sort_key: None})
+    return {"$or": branches}
+
+
+def _get_path(document, path):
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def fetch_page(collection, query, sort_key, sort_order, after, size, projection=None):
+    """
+    Fetch one page of rows following the keyset position `after`.
+
+    Args:
+    - after (tuple or None): (sort value, _id) of the last row already shown,
+      or None for the first page.
+
+    Returns:
+    - list of dict: Up to `size` documents.
+    """
+    page_query = query if after is None else {"$and": [query, keyset_filter(sort_key, sort_order, *after)]}
+    cursor = (
+        collection.find(page_query, projection or None)
+        .sort([(sort_key, sort_order), ("_id", sort_order)])
+        .limit(size)
+        .batch_size(size)
+    )
+    return list(cursor)
+
+
+def iter_keyset(collection, query, sort_key, sort_order, page_size=DEFAULT_PAGE_SIZE,
+                projection=None, limit=None, cache=None):
+    """
+    Yield the rows matching a query in sort order, fetching one page at a time.
+
+    The next page is only queried once the caller has consumed the previous
+    one, so rows can be rendered as they arrive and memory stays at one page.
+
+    Args:
+    - collection: The pymongo collection to read.
+    - query (dict): Filter applied to every page.
+    - sort_key (str): Field to sort on; _id breaks ties.
+    - sort_order (int): 1 for ascending, -1 for descending.
+    - page_size (int): Rows per page (also used as the cursor batch size).
+    - projection (dict, optional): Fields to fetch; the sort key is added.
+    - limit (int, optional): Stop after this many rows in total.
+    - cache (QueryCache, optional): Cache pages by (query, sort, position, size).
+
+    Yields:
+    - dict: The next document.
+    """
+    projection = dict(projection or {})
+    if projection:
+        projection.setdefault(sort_key, 1)
+    remaining = limit
+    after = None
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        args = (collection, query, sort_key, sort_order, after, size, projection)
+        if cache is None:
+            page = fetch_page(*args)
+        else:
+            key = make_key(collection.name, query, sort_key, sort_order, after, size, projection)
+            page = cache.get_or_load(key, lambda: fetch_page(*args))
+        for document in page:
+            yield document
+        if len(page) < size:
+            return
+        after = (_get_path(page[-1], sort_key), page[-1]["_id"])
+        if remaining is not None:
+            remaining -= len(page)
@@ -0,0 +1,249 @@
+"""
+Per-actor and per-director box office aggregates.
+
+One document per person in actor_stats and director_stats:
+
+    {_id: lookup key (normalized name), name, films, hits, total_gross}
+
+films counts the person's movies with a known final box office, hits those
+that made at least HIT_MULTIPLE times their budget (the definition behind the
+CSV's 'Actors Box Office %' and 'Director Box Office %' columns) and
+total_gross sums their box office. Adding, updating or deleting a movie
+applies the difference between its old and new contribution with $inc
+upserts, so nothing is rescanned, and box_office_percentages() derives the
+model's two inputs with one lookup per collection.
+
+fill_box_office_percentages() is how every caller gets those inputs for a
+movie (the prediction CLI, prediction_backfill and similar_movies): the stored
+value when there is one, otherwise the derived value, and 0 only for people
+without any film with a known box office.
+
+Run with:
+    python people_stats.py --rebuild
+    python people_stats.py --director "Christopher Nolan" --actors "Christian Bale, Michael Caine"
+"""
+import argparse
+
+from data_store import UpdateOne, open_database
+from title_search import normalize_title
+
+HIT_MULTIPLE = 2
+ACTOR_COLLECTION = "actor_stats"
+DIRECTOR_COLLECTION = "director_stats"
+
+# Movie fields a movie's contribution depends on.
+STATS_PROJECTION = {"director": 1, "actors": 1, "budget": 1, "performance.final_box_office": 1}
+
+
+def _people(names):
+    """{key: name} for a name or list of names, skipping blanks and duplicates."""
+    if isinstance(names, str):
+        names = names.split(",")
+    people = {}
+    for name in names or []:
+        name = str(name).strip()
+        key = normalize_title(name)
+        if key:
+            people.setdefault(key, name)
+    return people
+
+
+def contribution(movie):
+    """
+    What a movie adds to its director's and actors' aggregates.
+
+    Args:
+    - movie (dict): Movie document with director, actors, budget and the
+      embedded performance.final_box_office (see STATS_PROJECTION).
+
+    Returns:
+    - dict: {collection: {key: (name, films, hits, gross)}}; empty while the
+      final box office is unknown (0).
+    """
+    if not movie:
+        return {}
+    box_office = (movie.get("performance") or {}).get("final_box_office") or 0
+    if box_office <= 0:
+        return {}
+    hit = int(box_office >= HIT_MULTIPLE * (movie.get("budget") or 0))
+    return {
+        DIRECTOR_COLLECTION: {key: (name, 1, hit, box_office)
+                              for key, name in _people([movie.get("director") or ""]).items()},
+        ACTOR_COLLECTION: {key: (name, 1, hit, box_office)
+                           for key, name in _people(movie.get("actors")).items()},
+    }
+
+
+def contribution_deltas(before=None, after=None):
+    """
+    Difference between a movie's old and new contribution.
+
+    Args:
+    - before (dict, optional): The movie as it was (None for an insert).
+    - after (dict, optional): The movie as it is now (None for a delete).
+
+    Returns:
+    - dict: {collection: {key: (name, films, hits, gross)}}, only for people
+      whose numbers change.
+    """
+    deltas = {}
+    for sign, movie in ((-1, before), (1, after)):
+        for collection, people in contribution(movie).items():
+            for key, (name, films, hits, gross) in people.items():
+                delta = deltas.setdefault(collection, {}).setdefault(key, [name, 0, 0, 0])
+                if sign > 0:
+                    delta[0] = name
+                delta[1] += sign * films
+                delta[2] += sign * hits
+                delta[3] += sign * gross
+    return {
+        collection: {key: tuple(delta) for key, delta in people.items() if any(delta[1:])}
+        for collection, people in deltas.items()
+    }
+
+
+def apply_change(db, before=None, after=None):
+    """
+    Update the aggregates for an inserted (before=None), updated or deleted
+    (after=None) movie with $inc upserts, dropping people left without films.
+
+    Returns:
+    - int: Number of person documents updated.
+    """
+    updated = 0
+    for collection, people in contribution_deltas(before, after).items():
+        if not people:
+            continue
+        ops = [
+            UpdateOne(
+                {"_id": key},
+                {"$inc": {"films": films, "hits": hits, "total_gross": gross}, "$set": {"name": name}},
+                upsert=True,
+            )
+            for key, (name, films, hits, gross) in people.items()
+        ]
+        db[collection].bulk_write(ops, ordered=False)
+        db[collection].delete_many({"_id": {"$in": list(people)}, "films": {"$lte": 0}})
+        updated += len(ops)
+    return updated
+
+
+def rebuild(db, batch_size=1000):
+    """
+    Recompute every aggregate from the movie collection.
+
+    Counts are set rather than incremented and people no longer in the catalog
+    are removed, so the rebuild can be re-run.
+
+    Returns:
+    - dict: Number of people per collection.
+    """
+    totals = {ACTOR_COLLECTION: {}, DIRECTOR_COLLECTION: {}}
+    for movie in db.movie.find({}, STATS_PROJECTION, batch_size=batch_size):
+        for collection, people in contribution(movie).items():
+            for key, (name, films, hits, gross) in people.items():
+                total = totals[collection].setdefault(key, [name, 0, 0, 0])
+                total[1] += films
+                total[2] += hits
+                total[3] += gross
+    for collection, people in totals.items():
+        ops = [
+            UpdateOne({"_id": key}, {"$set": {"name": name, "films": films, "hits": hits, "total_gross": gross}},
+                      upsert=True)
+            for key, (name, films, hits, gross) in people.items()
+        ]
+        for start in range(0, len(ops), batch_size):
+            db[collection].bulk_write(ops[start:start + batch_size], ordered=False)
+        db[collection].delete_many({"_id": {"$nin": list(people)}})
+    return {collection: len(people) for collection, people in totals.items()}
+
+
+def box_office_percentages(db, director, actors):
+    """
+    Derive the model's 'Actors Box Office %' and 'Director Box Office %'.
+
+    Each is the share of hits among the person's (pooled, for the cast) films
+    with a known box office, as a percentage rounded like the CSV columns.
+
+    Args:
+    - db: The movie_database handle.
+    - director (str): Director name.
+    - actors (list of str or str): Cast names (a string is split on commas).
+
+    Returns:
+    - tuple: (actors %, director %), each None if nobody has any films.
+    """
+    return box_office_percentages_many(db, [(director, actors)])[0]
+
+
+def box_office_percentages_many(db, people):
+    """
+    box_office_percentages() for many movies, with one lookup per collection.
+
+    Args:
+    - db: The movie_database handle.
+    - people (list of tuple): (director, actors) per movie.
+
+    Returns:
+    - list of tuple: (actors %, director %) per movie, each None if nobody has any films.
+    """
+    def percentage(documents):
+        films = sum(document.get("films", 0) for document in documents)
+        hits = sum(document.get("hits", 0) for document in documents)
+        return round(100 * hits / films, 2) if films > 0 else None
+
+    keys = [(list(_people(actors)), list(_people([director or ""]))) for director, actors in people]
+    found = {}
+    for collection, wanted in ((ACTOR_COLLECTION, {key for actor_keys, _ in keys for key in actor_keys}),
+                               (DIRECTOR_COLLECTION, {key for _, director_keys in keys for key in director_keys})):
+        found[collection] = {document["_id"]: document
+                             for document in db[collection].find({"_id": {"$in": list(wanted)}})} if wanted else {}
+    return [
+        (percentage([found[ACTOR_COLLECTION][key] for key in actor_keys if key in found[ACTOR_COLLECTION]]),
+         percentage([found[DIRECTOR_COLLECTION][key] for key in director_keys if key in found[DIRECTOR_COLLECTION]]))
+        for actor_keys, director_keys in keys
+    ]
+
+
+def fill_box_office_percentages(db, movies):
+    """
+    The model's 'Actors Box Office %' and 'Director Box Office %' for a batch
+    of movies: the stored value where there is one, otherwise the value derived
+    from the aggregates, and 0 when nobody has a film with a known box office.
+
+    Args:
+    - db: The movie_database handle.
+    - movies (list of tuple): (director, actors, actors %, director %) per
+      movie, with None for a missing percentage.
+
+    Returns:
+    - list of tuple: (actors %, director %) per movie.
+    """
+    missing = [i for i, (_, _, actors_pct, director_pct) in enumerate(movies)
+               if actors_pct is None or director_pct is None]
+    derived = dict(zip(missing, box_office_percentages_many(db, [movies[i][:2] for i in missing])))
+    filled = []
+    for i, (_, _, actors_pct, director_pct) in enumerate(movies):
+        derived_actors, derived_director = derived.get(i, (None, None))
+        filled.append((actors_pct if actors_pct is not None else derived_actors or 0,
+                       director_pct if director_pct is not None else derived_director or 0))
+    return filled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain per-actor and per-director box office aggregates.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every aggregate from the movie collection")
+    parser.add_argument("--director", default=None, help="Print the derived Director Box Office %% for this name")
+    parser.add_argument("--actors", default=None, help="Print the derived Actors Box Office %% for these names")
+    parser.add_argument("--uri", default=None, help="MongoDB connection string")
+    parser.add_argument("--db", default=None, help="Database name")
+    args = parser.parse_args()
+
+    database = open_database(uri=args.uri, name=args.db)
+    if args.rebuild:
+        counts = rebuild(database)
+        print(f"Rebuilt {counts[ACTOR_COLLECTION]} actor and {counts[DIRECTOR_COLLECTION]} director aggregates")
+    if args.director or args.actors:
+        actors_pct, director_pct = box_office_percentages(database, args.director, args.actors)
+        print(f"Actors Box Office %: {actors_pct if actors_pct is not None else 'N/A'}")
+        print(f"Director Box Office %: {director_pct if director_pct is not None else 'N/A'}")
@@ -0,0 +1,265 @@
+"""
+Backfill of predicted vs. actual box office.
+
+Streams movie_performance rows joined with their movie, scores them in chunks
+across a process pool and writes back to movie_performance:
+
+    predicted_box_office    model prediction
+    residual                final_box_office - predicted_box_office
+    performance             the residual (previously always "N/A"); "N/A"
+                            while the final box office is unknown (0)
+    model_version           ML_Api.model_version() of the model that scored it
+    prediction_fingerprint  hash of the inputs that were scored
+
+after which the movies' embedded performance (read_model.py) is refreshed.
+A row is rescored only when its model_version differs from the current one or
+its inputs no longer match the fingerprint, so repeated runs are cheap.
+
+Run with:
+    python prediction_backfill.py
+    python prediction_backfill.py --workers 8 --chunk-size 5000 --engine mmap
+    python prediction_backfill.py --full      # rescore every movie
+"""
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+import numpy as np
+
+import ML_Api
+import people_stats
+from data_store import UpdateOne, open_database
+from read_model import sync_movies
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Model input -> (collection, field) it is read from. Missing box office
+# percentages are derived by people_stats.fill_box_office_percentages and other
+# missing values count as 0, as in movie_interface.predict_movie_box_office.
+INPUT_SOURCES = {
+    'Running time': ('movie', 'running_time'),
+    'budget': ('movie', 'budget'),
+    'Actors Box Office %': ('movie_performance', 'actor_boxoffice_%'),
+    'Director Box Office %': ('movie_performance', 'director_boxoffice_%'),
+    'Oscar and Golden Globes nominations': ('movie_performance', 'oscars_and_golden_globes_nominations'),
+    'Release year': ('movie', 'release_year'),
+    'IMDb score': ('movie', 'imdb_score'),
+}
+
+
+def backfill_pipeline():
+    """
+    Aggregation over movie_performance that joins each row with the movie
+    fields the model needs, fetching nothing else.
+    """
+    performance_fields = {field: 1 for source, field in INPUT_SOURCES.values() if source == 'movie_performance'}
+    movie_fields = {field: 1 for source, field in INPUT_SOURCES.values() if source == 'movie'}
+    movie_fields.update({"director": 1, "actors": 1})
+    return [
+        {"$project": {
+            "movie_id": 1,
+            "final_box_office": 1,
+            "model_version": 1,
+            "prediction_fingerprint": 1,
+            **performance_fields,
+        }},
+        {"$lookup": {"from": "movie", "localField": "movie_id", "foreignField": "_id", "as": "movie"}},
+        {"$unwind": "$movie"},
+        {"$project": {
+            "movie_id": 1,
+            "final_box_office": 1,
+            "model_version": 1,
+            "prediction_fingerprint": 1,
+            **performance_fields,
+            **{f"movie.{field}": 1 for field in movie_fields},
+        }},
+    ]
+
+
+def input_row(row, percentages):
+    """
+    Return a joined row's model inputs in ML_Api.INPUT_COLUMNS order.
+
+    Args:
+    - row (dict): A row of backfill_pipeline().
+    - percentages (tuple): The row's (actors %, director %) from
+      people_stats.fill_box_office_percentages.
+    """
+    filled = dict(zip(('Actors Box Office %', 'Director Box Office %'), percentages))
+    values = []
+    for column in ML_Api.INPUT_COLUMNS:
+        if column in filled:
+            values.append(float(filled[column]))
+            continue
+        source, field = INPUT_SOURCES[column]
+        document = row["movie"] if source == 'movie' else row
+        values.append(float(document.get(field) or 0))
+    return values
+
+
+def input_rows(db, rows):
+    """input_row() for a batch of joined rows, deriving their missing box office % together."""
+    percentages = people_stats.fill_box_office_percentages(db, [
+        (row["movie"].get("director"), row["movie"].get("actors"),
+         row.get(INPUT_SOURCES['Actors Box Office %'][1]), row.get(INPUT_SOURCES['Director Box Office %'][1]))
+        for row in rows
+    ])
+    return [input_row(row, row_percentages) for row, row_percentages in zip(rows, percentages)]
+
+
+def fingerprint(inputs, actual):
+    """Short hash of the scored inputs and the actual box office."""
+    return hashlib.blake2b(repr((inputs, actual)).encode('ascii'), digest_size=8).hexdigest()
+
+
+def stale_chunks(db, version, chunk_size=DEFAULT_CHUNK_SIZE, full=False, stats=None):
+    """
+    Yield chunks of rows that need (re)scoring.
+
+    Args:
+    - db: The movie_database handle.
+    - version (str): Current model version.
+    - chunk_size (int): Rows per chunk.
+    - full (bool): Rescore every row.
+    - stats (dict, optional): 'scanned' and 'skipped' counts are added here.
+
+    Yields:
+    - tuple: (movie_ids, raw ndarray in INPUT_COLUMNS order, actuals, fingerprints)
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("scanned", 0)
+    stats.setdefault("skipped", 0)
+    movie_ids, rows, actuals, fingerprints = [], [], [], []
+    cursor = db.movie_performance.aggregate(backfill_pipeline(), batchSize=chunk_size)
+    while True:
+        batch = list(islice(cursor, chunk_size))
+        if not batch:
+            break
+        for row, inputs in zip(batch, input_rows(db, batch)):
+            stats["scanned"] += 1
+            actual = row.get("final_box_office") or 0
+            row_fingerprint = fingerprint(inputs, actual)
+            if (not full and row.get("model_version") == version
+                    and row.get("prediction_fingerprint") == row_fingerprint):
+                stats["skipped"] += 1
+                continue
+            movie_ids.append(row["movie_id"])
+            rows.append(inputs)
+            actuals.append(actual)
+            fingerprints.append(row_fingerprint)
+            if len(rows) == chunk_size:
+                yield movie_ids, np.array(rows, dtype=np.float64), actuals, fingerprints
+                movie_ids, rows, actuals, fingerprints = [], [], [], []
+    if rows:
+        yield movie_ids, np.array(rows, dtype=np.float64), actuals, fingerprints
+
+
+_worker_engine = None
+
+
+def _init_worker(engine):
+    global _worker_engine
+    _worker_engine = engine
+    ML_Api.warm_up(engine=engine)
+
+
+def score_chunk(raw, engine=None):
+    """
+    Predict the box office of a chunk of raw inputs.
+
+    Returns:
+    - tuple: (model version, list of predictions)
+    """
+    engine = engine or _worker_engine
+    # One snapshot, so a model swapped in meanwhile cannot be credited with these predictions
+    (model, feature_columns, scaler), version = ML_Api.get_registry(engine).snapshot()
+    predictions = ML_Api.predict_box_office_batch(
+        model, ML_Api.process_user_inputs_batch(raw, feature_columns, scaler))
+    return version, predictions.tolist()
+
+
+def write_predictions(db, movie_ids, actuals, fingerprints, version, predictions):
+    """
+    Store one scored chunk on movie_performance and refresh the read model.
+
+    Returns:
+    - int: Number of rows written.
+    """
+    ops = []
+    for movie_id, actual, row_fingerprint, predicted in zip(movie_ids, actuals, fingerprints, predictions):
+        residual = actual - predicted if actual else None
+        ops.append(UpdateOne({"movie_id": movie_id}, {"$set": {
+            "predicted_box_office": predicted,
+            "residual": residual,
+            "performance": residual if residual is not None else "N/A",
+            "model_version": version,
+            "prediction_fingerprint": row_fingerprint,
+        }}))
+    if ops:
+        db.movie_performance.bulk_write(ops, ordered=False)
+        sync_movies(db, movie_ids)
+    return len(ops)
+
+
+def backfill(db, engine=None, workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE, full=False):
+    """
+    Score every movie whose inputs or model version changed since the last run.
+
+    Chunks are scored in a process pool while later chunks are read and
+    earlier results written; at most two chunks per worker are in flight.
+    With workers <= 1 chunks are scored in this process.
+
+    Args:
+    - db: The movie_database handle.
+    - engine (str, optional): ML_Api engine ('mmap' lets workers start
+      without unpickling).
+    - workers (int): Scoring processes.
+    - chunk_size (int): Rows per chunk and per bulk write.
+    - full (bool): Rescore every movie.
+
+    Returns:
+    - dict: scanned, skipped and scored row counts, model version and seconds.
+    """
+    start = time.perf_counter()
+    _, version = ML_Api.get_registry(engine).snapshot()
+    stats = {"scanned": 0, "skipped": 0, "scored": 0, "model_version": version}
+    chunks = stale_chunks(db, version, chunk_size, full, stats)
+
+    if workers <= 1:
+        for movie_ids, raw, actuals, fingerprints in chunks:
+            scored_version, predictions = score_chunk(raw, engine)
+            stats["scored"] += write_predictions(db, movie_ids, actuals, fingerprints, scored_version, predictions)
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(engine,)) as executor:
+            pending = {}
+            for movie_ids, raw, actuals, fingerprints in chunks:
+                future = executor.submit(score_chunk, raw)
+                pending[future] = (movie_ids, actuals, fingerprints)
+                if len(pending) >= 2 * workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stats["scored"] += write_predictions(db, *pending.pop(future), *future.result())
+            for future in list(pending):
+                stats["scored"] += write_predictions(db, *pending.pop(future), *future.result())
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill predicted vs. actual box office into movie_performance.")
+    parser.add_argument("--engine", choices=list(ML_Api.ENGINES), default=None, help="Inference engine")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Scoring processes (1 = in-process)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk")
+    parser.add_argument("--full", action="store_true", help="Rescore every movie, not only changed ones")
+    parser.add_argument("--uri", default=None, help="MongoDB connection string")
+    parser.add_argument("--db", default=None, help="Database name")
+    args = parser.parse_args()
+
+    result = backfill(open_database(uri=args.uri, name=args.db), args.engine, args.workers, args.chunk_size, args.full)
+    print(f"Model {result['model_version']}: scanned {result['scanned']}, scored {result['scored']}, "
+          f"unchanged {result['skipped']} in {result['seconds']:.1f}s")
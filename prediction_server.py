@@ -0,0 +1,298 @@
+"""
+Asyncio HTTP/JSON prediction service built on ML_Api.
+
+Concurrent requests are collected into micro-batches (bounded by a time window
+and a maximum size) and scored with one vectorized call in an executor thread.
+
+Run with:
+    python prediction_server.py --port 8080
+
+Endpoints:
+- POST /predict  body: a user_input object, or {"movies": [user_input, ...]}
+- GET  /health
+- GET  /metrics  latency histograms in Prometheus text format (with --metrics)
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import metrics
+from ML_Api import (
+    INPUT_COLUMNS,
+    get_feature_schema,
+    get_registry,
+    predict_box_office_batch,
+    process_user_inputs_batch,
+)
+
+MAX_BODY_BYTES = 1 << 20
+
+
+class ServiceUnavailable(Exception):
+    """Raised when the request queue is full."""
+
+
+class MicroBatcher:
+    """
+    Collects prediction requests and scores them in batches.
+
+    Args:
+    - registry (ModelRegistry): Source of the model, feature columns and scaler.
+    - window (float): Seconds to wait for more requests after the first one arrives.
+    - max_batch (int): Maximum number of movies scored in one batch.
+    - queue_size (int): Maximum number of pending requests before rejecting new ones.
+    - executor (Executor, optional): Where inference runs; defaults to one worker thread.
+    """
+
+    def __init__(self, registry, window=0.005, max_batch=256, queue_size=1024, executor=None):
+        self.registry = registry
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='predict')
+        self._task = None
+        self.schema = None  # FeatureSchema of the model version last scored
+        self.schema_version = None
+        self.batches = 0
+        self.rejected = 0
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, movies):
+        """
+        Queue a list of user_input dicts and wait for their predictions.
+
+        Returns:
+        - (predictions, version): A list of floats and the model version id.
+
+        Raises:
+        - ServiceUnavailable: If the queue is full (backpressure).
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((movies, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise ServiceUnavailable("Prediction queue is full, retry later")
+        return await future
+
+    async def _collect(self):
+        """Wait for one request, then gather more until the window or size limit."""
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.window
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _snapshot(self):
+        """Model resources and their version, refreshing the cached schema on a swap."""
+        resources, version = self.registry.snapshot()
+        if version != self.schema_version:
+            self.schema = get_feature_schema(resources[1])
+            self.schema_version = version
+        return resources, version
+
+    async def feature_schema(self):
+        """
+        FeatureSchema for validating requests, without touching the registry on
+        the event loop (it is refreshed by the executor as batches are scored).
+        """
+        if self.schema is None:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._snapshot)
+        return self.schema
+
+    def _score(self, movies):
+        (model, feature_columns, scaler), version = self._snapshot()
+        input_scaled = process_user_inputs_batch(movies, feature_columns, scaler)
+        return predict_box_office_batch(model, input_scaled).tolist(), version
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            movies = [movie for request_movies, _ in batch for movie in request_movies]
+            try:
+                predictions, version = await loop.run_in_executor(self.executor, self._score, movies)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            start = 0
+            for request_movies, future in batch:
+                stop = start + len(request_movies)
+                if not future.done():
+                    future.set_result((predictions[start:stop], version))
+                start = stop
+
+
+class PredictionServer:
+    """
+    Minimal HTTP/1.1 front end for a MicroBatcher.
+
+    Args:
+    - batcher (MicroBatcher): The batcher that scores requests.
+    - host (str): Interface to bind.
+    - port (int): Port to bind.
+    """
+
+    def __init__(self, batcher, host='127.0.0.1', port=8080):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+
+    async def _respond(self, writer, status, payload, content_type='application/json'):
+        body = payload.encode('utf-8') if isinstance(payload, str) else json.dumps(payload).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, path, _ = request_line.decode('latin-1').split(' ', 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return method, path, headers, body
+
+    async def _predict(self, body):
+        payload = json.loads(body or b'null')
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object")
+        single = 'movies' not in payload
+        movies = [payload] if single else payload['movies']
+        if not isinstance(movies, list) or not movies or not all(isinstance(m, dict) for m in movies):
+            raise ValueError("Expected a movie object or {\"movies\": [movie, ...]}")
+
+        # Reject malformed inputs here so one bad request cannot fail a whole batch.
+        schema = await self.batcher.feature_schema()
+        for movie in movies:
+            schema.validate(movie)
+            for col in INPUT_COLUMNS:
+                float(movie[col])
+
+        predictions, version = await self.batcher.submit(movies)
+        if single:
+            return {"prediction": predictions[0], "model_version": version}
+        return {"predictions": predictions, "model_version": version}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError) as e:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": str(e)})
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+
+                if method == 'GET' and path == '/health':
+                    await self._respond(writer, HTTPStatus.OK, {
+                        "status": "ok",
+                        "model_version": self.batcher.registry.version,
+                        "queue_depth": self.batcher.queue.qsize(),
+                        "batches": self.batcher.batches,
+                        "rejected": self.batcher.rejected,
+                    })
+                elif method == 'GET' and path == '/metrics':
+                    await self._respond(writer, HTTPStatus.OK, metrics.prometheus_text(),
+                                        'text/plain; version=0.0.4; charset=utf-8')
+                elif method == 'POST' and path == '/predict':
+                    try:
+                        result = await self._predict(body)
+                        await self._respond(writer, HTTPStatus.OK, result)
+                    except ServiceUnavailable as e:
+                        await self._respond(writer, HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)})
+                    except (ValueError, KeyError, TypeError) as e:
+                        await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": str(e)})
+                    except Exception as e:
+                        await self._respond(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+                else:
+                    await self._respond(writer, HTTPStatus.NOT_FOUND, {"error": f"No route for {method} {path}"})
+
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"Serving predictions on http://{self.host}:{self.port} "
+              f"(model version {self.batcher.registry.version})")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+
+async def main(args):
+    if args.metrics:
+        metrics.enable()
+    registry = get_registry(args.engine)
+    registry.warm_up()  # load the model once, before accepting traffic
+    batcher = MicroBatcher(
+        registry,
+        window=args.window_ms / 1000,
+        max_batch=args.max_batch,
+        queue_size=args.queue_size,
+    )
+    await PredictionServer(batcher, args.host, args.port).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve box office predictions over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--window-ms", type=float, default=5.0, help="Micro-batch collection window")
+    parser.add_argument("--max-batch", type=int, default=256, help="Maximum movies per batch")
+    parser.add_argument("--queue-size", type=int, default=1024, help="Pending requests before returning 503")
+    parser.add_argument("--engine", choices=["sklearn", "compiled", "mmap"], default=None)
+    parser.add_argument("--metrics", action="store_true", help="Record ML stage latencies for GET /metrics")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,139 @@
+"""
+Result cache for catalog browsing queries.
+
+Entries are keyed by the normalized query/sort spec plus the catalog version,
+evicted least-recently-used under a memory budget, and expire after a TTL.
+Writes to the catalog bump the version, which makes every older entry
+unreachable; the TTL bounds staleness from writes made by other processes.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import bson
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_TTL = 300.0
+
+
+class CatalogVersion:
+    """Monotonic counter bumped by every write to the movie catalog."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def bump(self):
+        with self._lock:
+            self.value += 1
+            return self.value
+
+
+# Process-wide catalog version shared by every cache of catalog data.
+catalog_version = CatalogVersion()
+
+
+def make_key(*parts):
+    """
+    Build a canonical cache key from query/sort components.
+
+    Dict keys are sorted and non-JSON values (ObjectId, datetime) are
+    stringified, so equivalent specs map to the same key.
+    """
+    return json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def _entry_size(key, rows):
+    return len(key) + sum(len(bson.encode(row)) for row in rows)
+
+
+class QueryCache:
+    """
+    LRU cache of query results with a memory budget and a TTL.
+
+    Args:
+    - max_bytes (int): Approximate budget for keys plus BSON-encoded rows.
+    - ttl (float): Seconds an entry stays valid.
+    - version (CatalogVersion): Counter whose bumps invalidate all entries.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL, version=catalog_version):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version = version
+        self._entries = OrderedDict()  # key -> (version, expires_at, size, rows)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, key):
+        _, _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def get(self, key):
+        """Return the cached rows for a key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                version, expires_at, _, rows = entry
+                if version == self.version.value and expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return rows
+                self._drop(key)
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, rows):
+        """Store rows for a key, evicting least-recently-used entries as needed."""
+        size = _entry_size(key, rows)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            version = self.version.value
+            if self._entries and next(reversed(self._entries.values()))[0] != version:
+                # The catalog changed since the most recent entry was stored, so
+                # no entry can hit again.
+                self.expirations += len(self._entries)
+                self._entries.clear()
+                self.bytes = 0
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (version, time.monotonic() + self.ttl, size, rows)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """Return cached rows for a key, calling loader() and caching on a miss."""
+        rows = self.get(key)
+        if rows is None:
+            rows = list(loader())
+            self.put(key, rows)
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "catalog_version": self.version.value,
+        }
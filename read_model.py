@@ -0,0 +1,108 @@
+"""
+Denormalized movie read model.
+
+Each `movie` document carries a copy of its `movie_performance` row under the
+`performance` field (the same shape the old $lookup/$unwind produced), so the
+listing and search screens can filter, sort and limit on the `movie`
+collection alone and use the `performance.final_box_office` index.
+
+Run with:
+    python read_model.py --rebuild
+"""
+import argparse
+
+from data_store import UpdateOne, open_database
+
+DEFAULT_BATCH_SIZE = 1000
+
+# movie_performance fields copied onto the movie document.
+PERFORMANCE_FIELDS = (
+    "final_box_office",
+    "earnings",
+    "actor_boxoffice_%",
+    "director_boxoffice_%",
+    "oscars_and_golden_globes_nominations",
+    "oscars_and_golden_globes_awards",
+    "performance",
+    "predicted_box_office",
+    "residual",
+    "model_version",
+)
+
+
+def embedded_performance(performance):
+    """Return the subset of a movie_performance document stored on its movie."""
+    return {field: performance[field] for field in PERFORMANCE_FIELDS if field in performance}
+
+
+def sync_movies(db, movie_ids):
+    """
+    Refresh the embedded performance of the given movies from movie_performance.
+
+    Movies without a performance row have the embedded copy removed.
+
+    Args:
+    - db: The movie_database handle.
+    - movie_ids (iterable of ObjectId): Movies to refresh.
+
+    Returns:
+    - int: Number of movies refreshed.
+    """
+    movie_ids = list(movie_ids)
+    if not movie_ids:
+        return 0
+    performances = {
+        performance["movie_id"]: performance
+        for performance in db.movie_performance.find({"movie_id": {"$in": movie_ids}})
+    }
+    ops = []
+    for movie_id in movie_ids:
+        if movie_id in performances:
+            update = {"$set": {"performance": embedded_performance(performances[movie_id])}}
+        else:
+            update = {"$unset": {"performance": ""}}
+        ops.append(UpdateOne({"_id": movie_id}, update))
+    db.movie.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def sync_movie(db, movie_id):
+    """Refresh the embedded performance of one movie."""
+    return sync_movies(db, [movie_id])
+
+
+def rebuild(db, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Regenerate the embedded performance of every movie.
+
+    Args:
+    - db: The movie_database handle.
+    - batch_size (int): Movies refreshed per bulk write.
+
+    Returns:
+    - int: Number of movies refreshed.
+    """
+    refreshed = 0
+    batch = []
+    for movie in db.movie.find({}, {"_id": 1}).batch_size(batch_size):
+        batch.append(movie["_id"])
+        if len(batch) == batch_size:
+            refreshed += sync_movies(db, batch)
+            batch = []
+    refreshed += sync_movies(db, batch)
+    return refreshed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the denormalized movie read model.")
+    parser.add_argument("--rebuild", action="store_true", help="Regenerate the embedded performance of every movie")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--uri", default=None, help="MongoDB connection string")
+    parser.add_argument("--db", default=None, help="Database name")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        count = rebuild(open_database(uri=args.uri, name=args.db), args.batch_size)
+        print(f"Rebuilt read model for {count} movies.")
+    else:
+        parser.print_help()
@@ -0,0 +1,473 @@
+"""
+Similar-movies index over the catalog.
+
+Every movie is encoded as the model's numeric features (the columns and
+StandardScaler of the served model, see ML_Api) plus one-hot genre and
+director and multi-hot cast. The numeric part is a dense matrix; the one-hot
+parts are kept as their sparse columns, i.e. inverted lists of rows per genre,
+director and actor. A top-k query is one matrix-vector product for the
+numeric distances, a few array additions for the postings of the query movie's
+genre, director and actors, and np.argpartition.
+
+    similarity = (NUMERIC * 1 / (1 + squared distance / n_features)
+                  + GENRE * same genre + DIRECTOR * same director
+                  + CAST * share of the query's actors in the movie) / total weight
+
+The index is kept current with upsert()/remove() as movies change and saved
+to an .npz file together with the version of the model whose scaler encoded
+it. On load it is rebuilt if that model is no longer the one served, and
+otherwise reconciled with the catalog by per-movie fingerprints, so only
+changed movies are re-encoded (which also covers changes made since the last
+save).
+
+Run with:
+    python similar_movies.py --rebuild
+    python similar_movies.py --title "Inception" --k 10
+"""
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+from bson import ObjectId
+
+import people_stats
+from data_store import open_database
+from title_search import normalize_title
+
+FORMAT_VERSION = 2
+INDEX_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "similar_movies.npz")
+DEFAULT_K = 10
+
+WEIGHTS = {"numeric": 1.0, "genre": 0.3, "director": 0.4, "cast": 0.6}
+TOTAL_WEIGHT = sum(WEIGHTS.values())
+
+# Model input -> movie document field (performance.* is the read model's embedded copy).
+INPUT_FIELDS = {
+    'Running time': 'running_time',
+    'budget': 'budget',
+    'Actors Box Office %': 'performance.actor_boxoffice_%',
+    'Director Box Office %': 'performance.director_boxoffice_%',
+    'Oscar and Golden Globes nominations': 'performance.oscars_and_golden_globes_nominations',
+    'Release year': 'release_year',
+    'IMDb score': 'imdb_score',
+}
+
+MOVIE_PROJECTION = {"genre": 1, "director": 1, "actors": 1, **{field: 1 for field in INPUT_FIELDS.values()}}
+
+_ACTOR_SEPARATOR = "\x1f"
+
+
+def _field(movie, path):
+    value = movie
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def movie_terms(movie):
+    """Normalized (genre, director, actors) keys of a movie document."""
+    actors = movie.get("actors") or []
+    if isinstance(actors, str):
+        actors = actors.split(",")
+    return (
+        normalize_title(movie.get("genre") or ""),
+        normalize_title(movie.get("director") or ""),
+        tuple(sorted({normalize_title(actor) for actor in actors if str(actor).strip()})),
+    )
+
+
+def movie_inputs(movie):
+    """
+    The model's raw inputs for a movie document (missing values count as 0;
+    fill in the box office percentages first with with_box_office_percentages).
+    """
+    return [float(_field(movie, field) or 0) for field in INPUT_FIELDS.values()]
+
+
+def with_box_office_percentages(db, movies):
+    """
+    Movie documents whose missing Actors/Director Box Office % are filled in by
+    people_stats.fill_box_office_percentages, as for a prediction.
+
+    Returns:
+    - list of dict: The movies, copied where a percentage was filled in.
+    """
+    movies = list(movies)
+    filled = people_stats.fill_box_office_percentages(db, [
+        (movie.get("director"), movie.get("actors"),
+         _field(movie, INPUT_FIELDS['Actors Box Office %']), _field(movie, INPUT_FIELDS['Director Box Office %']))
+        for movie in movies
+    ])
+    result = []
+    for movie, (actors_pct, director_pct) in zip(movies, filled):
+        performance = movie.get("performance") or {}
+        if performance.get("actor_boxoffice_%") is None or performance.get("director_boxoffice_%") is None:
+            movie = {**movie, "performance": {**performance, "actor_boxoffice_%": actors_pct,
+                                              "director_boxoffice_%": director_pct}}
+        result.append(movie)
+    return result
+
+
+def movie_from_inputs(user_input, director=None, actors=None, genre=None, movie_id=None):
+    """
+    A movie document carrying the model's raw inputs, e.g. for similar_to().
+
+    Args:
+    - user_input (dict): The model inputs, keyed like INPUT_FIELDS.
+    - director (str, optional): Director name.
+    - actors (list of str or str, optional): Cast names (a string is split on commas).
+    - genre (str, optional): Genre.
+    - movie_id (ObjectId, optional): _id of a catalog movie, left out of its own results.
+    """
+    movie = {"_id": movie_id, "genre": genre, "director": director, "actors": actors}
+    for column, path in INPUT_FIELDS.items():
+        *parents, field = path.split(".")
+        target = movie
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[field] = user_input.get(column, 0)
+    return movie
+
+
+def movie_fingerprint(movie):
+    """64-bit hash of everything the index encodes for a movie."""
+    payload = repr((movie_inputs(movie), movie_terms(movie))).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(payload, digest_size=8).digest(), "little")
+
+
+def model_scaling(engine=None):
+    """
+    Feature columns, mean and scale of the served model's scaler, and the
+    model version they belong to.
+
+    Args:
+    - engine (str, optional): ML_Api engine serving the model (default: the
+      configured ML_API_ENGINE). The compiled and mmap engines keep the scaler
+      they folded in, so nothing is unpickled for them.
+
+    Imports ML_Api on first use.
+    """
+    import ML_Api
+    (_, feature_columns, scaler), version = ML_Api.get_registry(engine).snapshot()
+    n_features = len(feature_columns)
+    if hasattr(scaler, "folded_mean"):
+        mean, scale = scaler.folded_mean, scaler.folded_scale
+        if mean is None or scale is None:
+            raise ValueError("The served model does not carry its scaler's mean and scale")
+    else:
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+    return list(feature_columns), np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64), version
+
+
+def served_model_version(engine=None):
+    """Version of the model whose scaler a current index must be encoded with."""
+    import ML_Api
+    return ML_Api.get_registry(engine).snapshot()[1]
+
+
+class SimilarityIndex:
+    """
+    Top-k similar movies by numeric features, genre, director and cast.
+
+    Args:
+    - feature_columns (list): Model feature columns used for the numeric part.
+    - mean, scale (ndarray): Standardization of those columns.
+    - model_version (str): Version of the model they were taken from.
+    """
+
+    def __init__(self, feature_columns, mean, scale, model_version=""):
+        self.feature_columns = list(feature_columns)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.model_version = model_version or ""
+        self.unsaved = 0     # upserts and removals since the last save()
+        n_features = len(self.feature_columns)
+        self.ids = []        # row -> _id, None for free rows
+        self.rows = {}       # _id -> row
+        self.terms = []      # row -> (genre, director, actors)
+        self.free = []       # rows freed by remove(), reused by upsert()
+        self.numeric = np.zeros((0, n_features), dtype=np.float64)
+        self.sq_norms = np.zeros(0, dtype=np.float64)
+        self.fingerprints = np.zeros(0, dtype=np.uint64)
+        self.active = np.zeros(0, dtype=bool)
+        self.postings = {"genre": {}, "director": {}, "cast": {}}  # kind -> key -> set of rows
+        self._arrays = {}    # (kind, key) -> cached ndarray of rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    # -- encoding
+
+    def encode(self, movies):
+        """Standardized numeric feature matrix for movie documents."""
+        import ML_Api
+        raw = np.array([movie_inputs(movie) for movie in movies], dtype=np.float64).reshape(-1, len(INPUT_FIELDS))
+        features = ML_Api.FeatureSchema(self.feature_columns).build_batch(raw)
+        return (features - self.mean) / self.scale
+
+    def _grow(self, size):
+        capacity = len(self.active)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 64)
+        extra = capacity - len(self.active)
+        self.numeric = np.vstack([self.numeric, np.zeros((extra, self.numeric.shape[1]))])
+        self.sq_norms = np.concatenate([self.sq_norms, np.zeros(extra)])
+        self.fingerprints = np.concatenate([self.fingerprints, np.zeros(extra, dtype=np.uint64)])
+        self.active = np.concatenate([self.active, np.zeros(extra, dtype=bool)])
+
+    def _post(self, row, terms, add):
+        genre, director, actors = terms
+        for kind, keys in (("genre", [genre]), ("director", [director]), ("cast", actors)):
+            for key in keys:
+                if not key:
+                    continue
+                self._arrays.pop((kind, key), None)
+                rows = self.postings[kind]
+                if add:
+                    rows.setdefault(key, set()).add(row)
+                else:
+                    rows[key].discard(row)
+                    if not rows[key]:
+                        del rows[key]
+
+    def _place(self, movie_id, vector, terms, fingerprint):
+        row = self.rows.get(movie_id)
+        if row is not None:
+            self._post(row, self.terms[row], add=False)
+        elif self.free:
+            row = self.free.pop()
+        else:
+            row = len(self.ids)
+            self._grow(row + 1)
+            self.ids.append(None)
+            self.terms.append(None)
+        self.ids[row] = movie_id
+        self.rows[movie_id] = row
+        self.terms[row] = terms
+        self.numeric[row] = vector
+        self.sq_norms[row] = vector @ vector
+        self.fingerprints[row] = fingerprint
+        self.active[row] = True
+        self._post(row, terms, add=True)
+
+    # -- maintenance
+
+    def upsert(self, movies):
+        """
+        Add or re-encode movie documents (with _id and MOVIE_PROJECTION fields,
+        box office percentages filled in by with_box_office_percentages).
+        """
+        movies = list(movies)
+        if not movies:
+            return 0
+        vectors = self.encode(movies)
+        for movie, vector in zip(movies, vectors):
+            self._place(movie["_id"], vector, movie_terms(movie), movie_fingerprint(movie))
+        self.unsaved += len(movies)
+        return len(movies)
+
+    def remove(self, movie_id):
+        """Drop a movie (no-op if it is not indexed)."""
+        row = self.rows.pop(movie_id, None)
+        if row is None:
+            return
+        self._post(row, self.terms[row], add=False)
+        self.ids[row] = None
+        self.terms[row] = None
+        self.active[row] = False
+        self.free.append(row)
+        self.unsaved += 1
+
+    def sync(self, db):
+        """
+        Reconcile the index with db.movie: re-encode new or changed movies and
+        drop deleted ones.
+
+        Returns:
+        - tuple: (movies upserted, movies removed)
+        """
+        seen = set()
+        changed = []
+        for movie in with_box_office_percentages(db, db.movie.find({}, MOVIE_PROJECTION)):
+            seen.add(movie["_id"])
+            row = self.rows.get(movie["_id"])
+            if row is None or int(self.fingerprints[row]) != movie_fingerprint(movie):
+                changed.append(movie)
+        removed = [movie_id for movie_id in self.rows if movie_id not in seen]
+        for movie_id in removed:
+            self.remove(movie_id)
+        return self.upsert(changed), len(removed)
+
+    # -- queries
+
+    def _rows(self, kind, key):
+        array = self._arrays.get((kind, key))
+        if array is None:
+            rows = self.postings[kind].get(key, ())
+            array = self._arrays[(kind, key)] = np.fromiter(rows, dtype=np.intp, count=len(rows))
+        return array
+
+    def query(self, vector, terms, k=DEFAULT_K, exclude=None):
+        """
+        Top-k movies for an encoded vector and (genre, director, actors) terms.
+
+        Returns:
+        - list of tuple: (_id, similarity between 0 and 1), best first.
+        """
+        size = len(self.ids)
+        if not size or k <= 0:
+            return []
+        numeric = self.numeric[:size]
+        squared = np.maximum(self.sq_norms[:size] - 2 * (numeric @ vector) + vector @ vector, 0)
+        scores = WEIGHTS["numeric"] / (1 + squared / numeric.shape[1])
+
+        genre, director, actors = terms
+        if genre:
+            scores[self._rows("genre", genre)] += WEIGHTS["genre"]
+        if director:
+            scores[self._rows("director", director)] += WEIGHTS["director"]
+        for actor in actors:
+            scores[self._rows("cast", actor)] += WEIGHTS["cast"] / len(actors)
+
+        scores[~self.active[:size]] = -np.inf
+        if exclude is not None and exclude in self.rows:
+            scores[self.rows[exclude]] = -np.inf
+        k = min(k, len(self.rows) - (exclude in self.rows))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.ids[row], float(scores[row] / TOTAL_WEIGHT)) for row in top]
+
+    def similar(self, movie_id, k=DEFAULT_K):
+        """Top-k movies most similar to an indexed movie (itself excluded)."""
+        row = self.rows.get(movie_id)
+        if row is None:
+            return []
+        return self.query(self.numeric[row], self.terms[row], k, exclude=movie_id)
+
+    def similar_to(self, movie, k=DEFAULT_K):
+        """Top-k indexed movies most similar to any movie document."""
+        return self.query(self.encode([movie])[0], movie_terms(movie), k, exclude=movie.get("_id"))
+
+    # -- persistence
+
+    def save(self, filename=INDEX_FILENAME):
+        """Write the active rows to an .npz file (atomically replaced)."""
+        rows = [row for row, movie_id in enumerate(self.ids) if movie_id is not None]
+        ids = np.frombuffer(b"".join(self.ids[row].binary for row in rows), dtype=np.uint8).reshape(-1, 12)
+        terms = [self.terms[row] for row in rows]
+        temp = f"{filename}.tmp.npz"
+        np.savez(
+            temp,
+            format_version=np.array(FORMAT_VERSION),
+            model_version=np.array(self.model_version, dtype=str),
+            feature_columns=np.array(self.feature_columns, dtype=str),
+            mean=self.mean,
+            scale=self.scale,
+            ids=ids,
+            numeric=self.numeric[rows],
+            fingerprints=self.fingerprints[rows],
+            genres=np.array([genre for genre, _, _ in terms], dtype=str),
+            directors=np.array([director for _, director, _ in terms], dtype=str),
+            actors=np.array([_ACTOR_SEPARATOR.join(actors) for _, _, actors in terms], dtype=str),
+        )
+        os.replace(temp, filename)
+        self.unsaved = 0
+
+    @classmethod
+    def load(cls, filename=INDEX_FILENAME):
+        """
+        Read an index written by save().
+
+        Raises:
+        - FileNotFoundError: If the file does not exist.
+        - ValueError: If it was written in another format version.
+        """
+        with np.load(filename, allow_pickle=False) as data:
+            if int(data["format_version"]) != FORMAT_VERSION:
+                raise ValueError(f"{filename} has format {int(data['format_version'])}, expected {FORMAT_VERSION}")
+            index = cls(data["feature_columns"].tolist(), data["mean"], data["scale"], str(data["model_version"]))
+            n = len(data["ids"])
+            index._grow(n)
+            index.numeric[:n] = data["numeric"]
+            index.sq_norms[:n] = np.einsum("ij,ij->i", index.numeric[:n], index.numeric[:n])
+            index.fingerprints[:n] = data["fingerprints"]
+            index.active[:n] = True
+            index.ids = [ObjectId(raw.tobytes()) for raw in data["ids"]]
+            index.rows = {movie_id: row for row, movie_id in enumerate(index.ids)}
+            for row, (genre, director, actors) in enumerate(zip(data["genres"].tolist(), data["directors"].tolist(),
+                                                                data["actors"].tolist())):
+                terms = (genre, director, tuple(actors.split(_ACTOR_SEPARATOR)) if actors else ())
+                index.terms.append(terms)
+                index._post(row, terms, add=True)
+        return index
+
+
+def load_or_build(db, filename=INDEX_FILENAME, engine=None):
+    """
+    Load the saved index and bring it up to date with the catalog, or build it
+    if there is no usable file or the file was encoded for another model
+    version. The result is saved when anything changed.
+
+    Args:
+    - db: The movie_database handle.
+    - filename (str): Index file.
+    - engine (str, optional): ML_Api engine serving the model (see model_scaling).
+
+    Returns:
+    - SimilarityIndex: The current index.
+    """
+    scaling = model_scaling(engine)
+    try:
+        index = SimilarityIndex.load(filename)
+    except (FileNotFoundError, ValueError, KeyError):
+        index = None
+    if index is None or index.model_version != scaling[3]:
+        index = SimilarityIndex(*scaling)
+    index.sync(db)
+    if index.unsaved or not os.path.exists(filename):
+        index.save(filename)
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the similar-movies index.")
+    parser.add_argument("--rebuild", action="store_true", help="Re-encode every movie with the current model's scaler")
+    parser.add_argument("--title", default=None, help="Print the movies most similar to this title")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="Number of similar movies")
+    parser.add_argument("--file", default=INDEX_FILENAME, help="Index file")
+    parser.add_argument("--engine", choices=["sklearn", "compiled", "mmap"], default=None,
+                        help="ML_Api engine serving the model (default ML_API_ENGINE)")
+    parser.add_argument("--uri", default=None, help="MongoDB connection string")
+    parser.add_argument("--db", default=None, help="Database name")
+    args = parser.parse_args()
+
+    database = open_database(uri=args.uri, name=args.db)
+    start = time.perf_counter()
+    if args.rebuild:
+        similarity_index = SimilarityIndex(*model_scaling(args.engine))
+        similarity_index.sync(database)
+        similarity_index.save(args.file)
+    else:
+        similarity_index = load_or_build(database, args.file, args.engine)
+    print(f"Index of {len(similarity_index)} movies ready in {time.perf_counter() - start:.2f}s")
+
+    if args.title:
+        movie = database.movie.find_one({"title": args.title}, {"_id": 1})
+        if movie is None:
+            raise SystemExit(f"No movie titled '{args.title}'")
+        start = time.perf_counter()
+        results = similarity_index.similar(movie["_id"], args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        titles = {found["_id"]: found for found in database.movie.find(
+            {"_id": {"$in": [movie_id for movie_id, _ in results]}}, {"title": 1, "release_year": 1})}
+        for movie_id, score in results:
+            print(f"{score:6.3f}  {titles[movie_id]['title']} ({titles[movie_id].get('release_year')})")
+        print(f"Query took {elapsed_ms:.3f} ms")
@@ -0,0 +1,120 @@
+"""
+Cold-start benchmark for the movie CLI.
+
+Imports a module in fresh interpreters under `python -X importtime`, reports
+the wall-clock and import time, lists the slowest imports and checks that the
+ML stack (NumPy, pandas, scikit-learn) is not loaded at startup.
+
+Run with:
+    python startup_benchmark.py
+    python startup_benchmark.py --runs 10 --max-ms 400 --output startup.json
+The exit status is 1 if a limit is exceeded or a deferred module was imported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_MODULE = "movie_interface"
+DEFAULT_RUNS = 5
+
+# Packages that must only be imported once a prediction is requested.
+DEFERRED_PACKAGES = ("numpy", "pandas", "sklearn", "scipy")
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+
+    Returns:
+    - list of tuple: (module, self_us, cumulative_us, depth) per imported module.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def measure(module=DEFAULT_MODULE, python=sys.executable):
+    """
+    Import `module` once in a new interpreter.
+
+    Returns:
+    - dict: {'wall_ms', 'import_ms', 'imports'} for the run.
+    """
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PACKAGE_DIR, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+    imports = parse_importtime(completed.stderr)
+    top = next((cumulative for name, _, cumulative, depth in imports if name == module and depth == 0), 0)
+    return {"wall_ms": wall_ms, "import_ms": top / 1000, "imports": imports}
+
+
+def run(module=DEFAULT_MODULE, runs=DEFAULT_RUNS, top=15):
+    """
+    Measure several cold starts and summarize them.
+
+    Returns:
+    - dict: Median/min/max timings, the slowest imports of the last run and
+      any deferred packages that were imported.
+    """
+    samples = [measure(module) for _ in range(runs)]
+    last = samples[-1]["imports"]
+    loaded = {name.split(".")[0] for name, _, _, _ in last}
+    slowest = sorted(last, key=lambda item: -item[1])[:top]
+    return {
+        "module": module,
+        "runs": runs,
+        "python": sys.version.split()[0],
+        "wall_ms_median": statistics.median(sample["wall_ms"] for sample in samples),
+        "wall_ms_min": min(sample["wall_ms"] for sample in samples),
+        "import_ms_median": statistics.median(sample["import_ms"] for sample in samples),
+        "import_ms_max": max(sample["import_ms"] for sample in samples),
+        "modules_imported": len(last),
+        "deferred_imported": sorted(loaded.intersection(DEFERRED_PACKAGES)),
+        "slowest_self_ms": [(name, self_us / 1000) for name, self_us, _, _ in slowest],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure CLI cold-start time with -X importtime.")
+    parser.add_argument("--module", default=DEFAULT_MODULE, help="Module to import")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Fresh interpreters to start")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if the median import time exceeds this")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    result = run(args.module, args.runs)
+    print(f"{result['module']}: import {result['import_ms_median']:.1f} ms median "
+          f"(max {result['import_ms_max']:.1f} ms), process {result['wall_ms_median']:.1f} ms median, "
+          f"{result['modules_imported']} modules")
+    print("\nSlowest imports (self time):")
+    for name, self_ms in result["slowest_self_ms"]:
+        print(f"  {self_ms:8.2f} ms  {name}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+
+    failed = False
+    if result["deferred_imported"]:
+        print(f"\nFAIL: imported at startup: {', '.join(result['deferred_imported'])}")
+        failed = True
+    if args.max_ms is not None and result["import_ms_median"] > args.max_ms:
+        print(f"\nFAIL: median import time {result['import_ms_median']:.1f} ms exceeds {args.max_ms:.1f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,144 @@
+"""
+Synthetic catalogs scaled from movies_data.csv.
+
+Each original row is emitted `scale` times. The first copy is unchanged; later
+copies get a numbered title and small multiplicative noise on money columns,
+additive noise on score, year and running time, so every column keeps the
+shape of the original distribution. Directors and actors are split into
+numbered namesakes so the number of distinct people grows like
+scale ** PEOPLE_EXPONENT (sublinearly, as in real catalogs) while each
+person's films stay in one genre and era. Output is deterministic for a seed.
+
+Run with:
+    python synthetic_data.py --scale 10 --output movies_x10.csv
+"""
+import argparse
+import csv
+import math
+import random
+
+from ingest import CSV_ENCODING
+
+SOURCE_FILENAME = "movies_data.csv"
+DEFAULT_SEED = 0
+
+# Distinct people grow as scale ** PEOPLE_EXPONENT.
+PEOPLE_EXPONENT = 0.7
+
+# Standard deviation of the noise applied to copies after the first.
+MONEY_SIGMA = 0.15      # log-normal, on budget and box office
+SCORE_SIGMA = 0.2       # IMDb points
+RUNNING_TIME_SIGMA = 5  # minutes
+YEAR_SPREAD = 2         # +/- years
+
+
+def read_source(filename=SOURCE_FILENAME):
+    """Return the header and rows of movies_data.csv."""
+    with open(filename, mode='r', encoding=CSV_ENCODING, newline='') as file:
+        reader = csv.DictReader(file)
+        return reader.fieldnames, list(reader)
+
+
+def _namesake(name, variants, rng):
+    variant = rng.randrange(variants)
+    return name if variant == 0 else f"{name} #{variant + 1}"
+
+
+def scaled_rows(rows, scale, seed=DEFAULT_SEED):
+    """
+    Yield `scale` copies of every row with jitter and numbered namesakes.
+
+    Args:
+    - rows (list of dict): movies_data.csv rows.
+    - scale (int): Copies per original row.
+    - seed (int): Random seed.
+
+    Yields:
+    - dict: A row with the same columns as the source.
+    """
+    rng = random.Random(seed)
+    variants = max(1, round(scale ** PEOPLE_EXPONENT))
+    max_year = max(int(row['Release year']) for row in rows)
+    for copy_number in range(scale):
+        for row in rows:
+            if copy_number == 0:
+                yield row
+                continue
+            budget = round(int(row['Budget']) * rng.lognormvariate(0, MONEY_SIGMA))
+            box_office = round(int(row['Box Office']) * rng.lognormvariate(0, MONEY_SIGMA))
+            score = float(row['IMDb score']) + rng.gauss(0, SCORE_SIGMA)
+            running_time = row['Running time'].strip()
+            if running_time:
+                running_time = str(max(1, round(float(running_time) + rng.gauss(0, RUNNING_TIME_SIGMA))))
+            synthetic = dict(row)
+            synthetic.update({
+                'Movie': f"{row['Movie']} ({copy_number + 1})",
+                'Director': _namesake(row['Director'], variants, rng),
+                'Actor 1': _namesake(row['Actor 1'], variants, rng),
+                'Actor 2': _namesake(row['Actor 2'], variants, rng),
+                'Actor 3': _namesake(row['Actor 3'], variants, rng),
+                'Budget': str(budget),
+                'Box Office': str(box_office),
+                'Earnings': str(box_office - budget),
+                'Running time': running_time,
+                'Release year': str(min(max_year, int(row['Release year']) + rng.randint(-YEAR_SPREAD, YEAR_SPREAD))),
+                'IMDb score': f"{min(10.0, max(1.0, score)):.1f}",
+            })
+            yield synthetic
+
+
+def write_scaled(output, scale, seed=DEFAULT_SEED, source=SOURCE_FILENAME):
+    """
+    Write a catalog `scale` times the size of movies_data.csv.
+
+    Returns:
+    - int: Number of rows written.
+    """
+    fieldnames, rows = read_source(source)
+    count = 0
+    with open(output, mode='w', encoding=CSV_ENCODING, newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in scaled_rows(rows, scale, seed):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def summarize(filename):
+    """Row count, distinct people and numeric means of a catalog CSV."""
+    _, rows = read_source(filename)
+    directors = {row['Director'] for row in rows}
+    actors = {row[column] for row in rows for column in ('Actor 1', 'Actor 2', 'Actor 3')}
+
+    def mean(column):
+        return sum(float(row[column]) for row in rows) / len(rows)
+
+    def log_mean(column):
+        return sum(math.log1p(max(0, float(row[column]))) for row in rows) / len(rows)
+
+    return {
+        "rows": len(rows),
+        "directors": len(directors),
+        "actors": len(actors),
+        "mean_imdb_score": mean('IMDb score'),
+        "mean_release_year": mean('Release year'),
+        "mean_log_budget": log_mean('Budget'),
+        "mean_log_box_office": log_mean('Box Office'),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a scaled synthetic movies_data.csv.")
+    parser.add_argument("--scale", type=int, required=True, help="Copies of each source row (e.g. 10, 100, 1000)")
+    parser.add_argument("--output", required=True, help="CSV file to write")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Random seed")
+    parser.add_argument("--source", default=SOURCE_FILENAME, help="Source catalog")
+    parser.add_argument("--summary", action="store_true", help="Print distribution summaries of source and output")
+    args = parser.parse_args()
+
+    written = write_scaled(args.output, args.scale, args.seed, args.source)
+    print(f"Wrote {written} rows to {args.output}")
+    if args.summary:
+        for label, filename in (("source", args.source), ("output", args.output)):
+            print(label, summarize(filename))
@@ -0,0 +1,152 @@
+"""
+In-memory title search for the movie catalog.
+
+Titles are normalized (case-folded, accents stripped, whitespace collapsed)
+into a key used for exact lookups. A trigram inverted index over the keys
+answers substring searches, and a sorted key list answers prefix
+autocomplete, so neither needs an unanchored regex scan of `movie`.
+"""
+import bisect
+import re
+import unicodedata
+
+GRAM_SIZE = 3
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_title(title):
+    """
+    Return the lookup key for a title: case-folded, accent-stripped and with
+    runs of whitespace collapsed, e.g. 'Amélie  ' -> 'amelie'.
+    """
+    decomposed = unicodedata.normalize("NFKD", str(title))
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _whitespace.sub(" ", stripped.casefold()).strip()
+
+
+def _grams(key):
+    return {key[i:i + GRAM_SIZE] for i in range(len(key) - GRAM_SIZE + 1)}
+
+
+class TitleIndex:
+    """
+    Exact, substring and prefix title search over movie _ids.
+
+    Build it once with build() and keep it current with add(), update() and
+    remove() as movies change.
+    """
+
+    def __init__(self):
+        self.titles = {}    # _id -> (title, key)
+        self.exact = {}     # key -> set of _id
+        self.grams = {}     # trigram -> set of _id
+        self.sorted_keys = []  # sorted (key, str(_id), _id) for prefix search
+
+    def __len__(self):
+        return len(self.titles)
+
+    def build(self, db):
+        """Index every movie in db.movie (replacing current contents)."""
+        self.__init__()
+        for movie in db.movie.find({}, {"title": 1}):
+            self.sorted_keys.append(self._insert(movie["_id"], movie.get("title", "")))
+        self.sorted_keys.sort()
+        return self
+
+    def _insert(self, movie_id, title):
+        key = normalize_title(title)
+        self.titles[movie_id] = (title, key)
+        self.exact.setdefault(key, set()).add(movie_id)
+        for gram in _grams(key):
+            self.grams.setdefault(gram, set()).add(movie_id)
+        return (key, str(movie_id), movie_id)
+
+    def add(self, movie_id, title):
+        """Index a new movie."""
+        if movie_id in self.titles:
+            self.remove(movie_id)
+        bisect.insort(self.sorted_keys, self._insert(movie_id, title))
+
+    def remove(self, movie_id):
+        """Drop a movie from the index (no-op if it is not indexed)."""
+        entry = self.titles.pop(movie_id, None)
+        if entry is None:
+            return
+        _, key = entry
+        self._discard(self.exact, key, movie_id)
+        for gram in _grams(key):
+            self._discard(self.grams, gram, movie_id)
+        position = bisect.bisect_left(self.sorted_keys, (key, str(movie_id)))
+        if position < len(self.sorted_keys) and self.sorted_keys[position][2] == movie_id:
+            del self.sorted_keys[position]
+
+    def update(self, movie_id, title):
+        """Re-index a movie whose title may have changed."""
+        entry = self.titles.get(movie_id)
+        if entry is not None and entry[0] == title:
+            return
+        self.remove(movie_id)
+        self.add(movie_id, title)
+
+    @staticmethod
+    def _discard(postings, term, movie_id):
+        ids = postings.get(term)
+        if ids is not None:
+            ids.discard(movie_id)
+            if not ids:
+                del postings[term]
+
+    def lookup(self, title):
+        """Return the _ids whose title equals `title` after normalization."""
+        return list(self.exact.get(normalize_title(title), ()))
+
+    def _rank(self, movie_id, query):
+        title, key = self.titles[movie_id]
+        position = key.find(query)
+        word_start = position == 0 or not key[position - 1].isalnum()
+        return (key != query, position != 0, not word_start, position, len(key), title)
+
+    def search(self, text, limit=None):
+        """
+        Return the _ids whose normalized title contains `text`, best first.
+
+        Ranking: exact match, then prefix match, then matches at a word start,
+        then earlier and shorter titles.
+        """
+        query = normalize_title(text)
+        if not query:
+            candidates = list(self.titles)
+        elif len(query) < GRAM_SIZE:
+            candidates = [movie_id for movie_id, (_, key) in self.titles.items() if query in key]
+        else:
+            postings = sorted((self.grams.get(gram, set()) for gram in _grams(query)), key=len)
+            candidates = set.intersection(*postings) if postings else set()
+            # Trigrams can co-occur without being contiguous; confirm the substring.
+            candidates = [movie_id for movie_id in candidates if query in self.titles[movie_id][1]]
+        ranked = sorted(candidates, key=lambda movie_id: self._rank(movie_id, query))
+        return ranked if limit is None else ranked[:limit]
+
+    def autocomplete(self, prefix, limit=10):
+        """
+        Return up to `limit` (title, _id) pairs whose normalized title starts
+        with `prefix`, falling back to substring matches to fill the list.
+        """
+        query = normalize_title(prefix)
+        results = []
+        seen = set()
+        position = bisect.bisect_left(self.sorted_keys, (query,))
+        while position < len(self.sorted_keys) and len(results) < limit:
+            key, _, movie_id = self.sorted_keys[position]
+            if not key.startswith(query):
+                break
+            results.append((self.titles[movie_id][0], movie_id))
+            seen.add(movie_id)
+            position += 1
+        if len(results) < limit and query:
+            for movie_id in self.search(query):
+                if movie_id not in seen:
+                    results.append((self.titles[movie_id][0], movie_id))
+                    if len(results) == limit:
+                        break
+        return results
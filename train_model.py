@@ -0,0 +1,263 @@
+"""
+Retraining pipeline for the box office model (the steps of
+machine_learning.ipynb as a command).
+
+1. Stream movie_performance joined with movie from MongoDB into NumPy arrays.
+2. Drop IQR outliers with one vectorized pass over all columns.
+3. Keep the features whose random forest importance exceeds a threshold.
+4. Grid-search a RandomForestRegressor with cross-validation on all cores.
+5. Write the model, feature columns and scaler to models/<version>/ and then
+   atomically replace model_version.json to point at that directory.
+
+Running processes pick up the new model on their next prediction:
+ModelRegistry notices the new pointer and loads the directory it names, after
+checking the files against the hashes it lists, so a mixed set is never served.
+
+Run with:
+    python train_model.py                  # notebook grid, publish the model
+    python train_model.py --grid quick --dry-run
+    python train_model.py --export-arrays  # also refresh model_arrays/ for the mmap engine
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from itertools import islice
+
+import numpy as np
+import sklearn
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import GridSearchCV, train_test_split
+from sklearn.preprocessing import StandardScaler
+
+import ML_Api
+from data_store import open_database
+from model_artifacts import export_artifacts, write_json_atomic
+from prediction_backfill import backfill_pipeline, input_rows
+
+HISTORY_DIR = os.path.join(ML_Api.MODEL_DIR, "models")
+DEFAULT_BATCH_SIZE = 2000
+RANDOM_STATE = 42
+TEST_SIZE = 0.2
+CV_FOLDS = 5
+IQR_FACTOR = 1.5
+IMPORTANCE_THRESHOLD = 0.05
+
+# Candidate features, as in the notebook.
+CANDIDATE_FEATURES = [
+    'Running time',
+    'log_budget',
+    'Actors Box Office %',
+    'Director Box Office %',
+    'Oscar and Golden Globes nominations',
+    'Release year',
+    'IMDb score',
+]
+
+# The notebook's grid, and a small one for quick checks.
+PARAM_GRIDS = {
+    "full": {
+        'n_estimators': [50, 100, 150],
+        'max_depth': [None, 10, 20],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 2, 4],
+        'max_features': ['sqrt', 'log2'],
+    },
+    "quick": {
+        'n_estimators': [50],
+        'max_depth': [None, 20],
+        'min_samples_leaf': [1, 2],
+        'max_features': ['sqrt'],
+    },
+}
+
+
+def load_training_set(db, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Stream every movie with its performance row into arrays.
+
+    Rows are read in batches (so missing box office percentages are derived
+    with one lookup per batch) and written into float64 blocks, so no
+    per-movie Python objects outlive their batch.
+
+    Returns:
+    - raw (ndarray): (n_rows, len(INPUT_COLUMNS)) model inputs.
+    - box_office (ndarray): Final box office per row (0 if unknown).
+    """
+    width = len(ML_Api.INPUT_COLUMNS) + 1
+    blocks = [np.empty((0, width), dtype=np.float64)]
+    cursor = db.movie_performance.aggregate(backfill_pipeline(), batchSize=batch_size)
+    while True:
+        batch = list(islice(cursor, batch_size))
+        if not batch:
+            break
+        block = np.empty((len(batch), width), dtype=np.float64)
+        block[:, :-1] = input_rows(db, batch)
+        block[:, -1] = [row.get("final_box_office") or 0 for row in batch]
+        blocks.append(block)
+    data = np.concatenate(blocks)
+    return data[:, :-1], data[:, -1]
+
+
+def iqr_mask(matrix, factor=IQR_FACTOR):
+    """
+    Rows inside [Q1 - factor * IQR, Q3 + factor * IQR] in every column.
+
+    All quartiles are computed at once on the full set (the notebook
+    recomputed them after filtering each column in turn).
+
+    Returns:
+    - ndarray[bool]: One flag per row.
+    """
+    q1, q3 = np.percentile(matrix, [25, 75], axis=0)
+    spread = factor * (q3 - q1)
+    return np.all((matrix >= q1 - spread) & (matrix <= q3 + spread), axis=1)
+
+
+def select_features(X, y, columns, threshold=IMPORTANCE_THRESHOLD, n_jobs=-1):
+    """
+    Return the columns whose importance in a 100-tree forest exceeds `threshold`.
+    """
+    forest = RandomForestRegressor(n_estimators=100, random_state=RANDOM_STATE, n_jobs=n_jobs)
+    forest.fit(StandardScaler().fit_transform(X), y)
+    return [column for column, importance in zip(columns, forest.feature_importances_) if importance > threshold]
+
+
+def train(raw, box_office, param_grid, cv=CV_FOLDS, n_jobs=-1):
+    """
+    Filter outliers, select features and grid-search the forest.
+
+    Args:
+    - raw (ndarray): Model inputs in INPUT_COLUMNS order.
+    - box_office (ndarray): Final box office per row.
+    - param_grid (dict): GridSearchCV parameter grid.
+    - cv (int): Cross-validation folds.
+    - n_jobs (int): Parallel fits (-1 = all cores). Each forest is single
+      threaded so grid points, not trees, are spread over the cores.
+
+    Returns:
+    - tuple: (model, feature_columns, scaler, report dict)
+    """
+    known = box_office > 0
+    raw, box_office = raw[known], box_office[known]
+    keep = iqr_mask(np.column_stack([raw, box_office]))
+    raw, box_office = raw[keep], box_office[keep]
+
+    X = ML_Api.FeatureSchema(CANDIDATE_FEATURES).build_batch(raw)
+    y = np.log1p(box_office)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+
+    feature_columns = select_features(X_train, y_train, CANDIDATE_FEATURES, n_jobs=n_jobs)
+    selected = [CANDIDATE_FEATURES.index(column) for column in feature_columns]
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X_train[:, selected])
+    X_test = scaler.transform(X_test[:, selected])
+
+    search = GridSearchCV(
+        RandomForestRegressor(random_state=RANDOM_STATE, n_jobs=1),
+        param_grid, cv=cv, n_jobs=n_jobs, scoring='neg_mean_squared_error',
+    )
+    search.fit(X_train, y_train)
+    model = search.best_estimator_
+
+    y_pred = model.predict(X_test)
+    report = {
+        "rows_loaded": int(known.size),
+        "rows_trained": int(keep.sum()),
+        "feature_columns": feature_columns,
+        "best_params": search.best_params_,
+        "cv_mse": float(-search.best_score_),
+        "test_mse": float(mean_squared_error(y_test, y_pred)),
+        "test_r2": float(r2_score(y_test, y_pred)),
+        "test_within_10pct": float(np.mean(np.abs(y_test - y_pred) / y_test < 0.10)),
+        "grid_points": len(search.cv_results_["params"]),
+        "sklearn_version": sklearn.__version__,
+    }
+    return model, feature_columns, scaler, report
+
+
+def publish(model, feature_columns, scaler, report, model_dir=ML_Api.MODEL_DIR, history_dir=HISTORY_DIR):
+    """
+    Write a trained model as a new version and make it the served one.
+
+    The pickles and a metadata file go to <history_dir>/<version>/ (staged in
+    a temporary directory and renamed), and then model_version.json in
+    `model_dir`, naming that directory and listing the pickles' hashes, is
+    replaced atomically. That one rename is the swap; the pickles next to the
+    manifest are left as they are and only served while there is no manifest.
+
+    Returns:
+    - str: The model version (as reported by ML_Api.model_version()).
+    """
+    filenames = [os.path.basename(path) for path in
+                 (ML_Api.MODEL_FILENAME, ML_Api.FEATURES_FILENAME, ML_Api.SCALER_FILENAME)]
+    blobs = [pickle.dumps(model), pickle.dumps(list(feature_columns)), pickle.dumps(scaler)]
+    file_digests = [hashlib.sha256(blob).hexdigest() for blob in blobs]
+    version = ML_Api.artifact_version(file_digests)[:12]
+    manifest = {
+        "version": version,
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": file_digests,
+        **report,
+    }
+
+    os.makedirs(history_dir, exist_ok=True)
+    version_dir = os.path.join(history_dir, version)
+    if not os.path.exists(version_dir):
+        staging = tempfile.mkdtemp(prefix=f".{version}-", dir=history_dir)
+        try:
+            for filename, blob in zip(filenames, blobs):
+                with open(os.path.join(staging, filename), "wb") as file:
+                    file.write(blob)
+                    file.flush()
+                    os.fsync(file.fileno())
+            write_json_atomic(os.path.join(staging, ML_Api.MODEL_MANIFEST_FILENAME), manifest)
+            os.replace(staging, version_dir)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    write_json_atomic(os.path.join(model_dir, ML_Api.MODEL_MANIFEST_FILENAME),
+                      {**manifest, "path": os.path.relpath(version_dir, model_dir)})
+    return version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrain the box office model from the database.")
+    parser.add_argument("--grid", choices=sorted(PARAM_GRIDS), default="full", help="Hyperparameter grid")
+    parser.add_argument("--cv", type=int, default=CV_FOLDS, help="Cross-validation folds")
+    parser.add_argument("--jobs", type=int, default=-1, help="Parallel fits (-1 = all cores)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Cursor batch size")
+    parser.add_argument("--dry-run", action="store_true", help="Train and report without publishing")
+    parser.add_argument("--export-arrays", action="store_true", help="Also export model_arrays/ for the mmap engine")
+    parser.add_argument("--uri", default=None, help="MongoDB connection string")
+    parser.add_argument("--db", default=None, help="Database name")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    raw, box_office = load_training_set(open_database(uri=args.uri, name=args.db), args.batch_size)
+    loaded = time.perf_counter()
+    print(f"Loaded {len(raw)} movies in {loaded - start:.1f}s")
+    if not len(raw):
+        raise SystemExit("No movies in the database; run ingest.py first.")
+
+    model, feature_columns, scaler, report = train(raw, box_office, PARAM_GRIDS[args.grid], args.cv, args.jobs)
+    print(f"Trained on {report['rows_trained']} rows, {report['grid_points']} grid points "
+          f"in {time.perf_counter() - loaded:.1f}s")
+    print(f"Features: {', '.join(feature_columns)}")
+    print(f"Best parameters: {report['best_params']}")
+    print(f"Test MSE {report['test_mse']:.4f}, R^2 {report['test_r2']:.4f}, "
+          f"within 10%: {report['test_within_10pct']:.1%}")
+
+    if args.dry_run:
+        print("Dry run: model not published.")
+    else:
+        version = publish(model, feature_columns, scaler, report)
+        print(f"Published model version {version}")
+        if args.export_arrays:
+            export_artifacts()
+            print(f"Exported memory-mapped arrays for {version}")
@@ -0,0 +1,155 @@
+"""
+Pre-aggregated daily rollups of the feature_usage collection.
+
+One small document per (feature, day, prediction outcome) holds the number of
+events, kept current with $inc upserts as events are recorded. The analytics
+screen reads these instead of grouping every raw event.
+
+Run with:
+    python usage_rollups.py --backfill
+"""
+import argparse
+from collections import Counter
+from datetime import datetime
+
+from pymongo.errors import BulkWriteError
+
+from data_store import UpdateOne, open_database
+
+ROLLUP_COLLECTION = "feature_usage_daily"
+
+
+def _rollup_key(event):
+    return (
+        event["feature_name"],
+        event["interaction_date"],
+        event.get("prediction_outcome", "N/A"),
+    )
+
+
+def rollup_ops(events):
+    """
+    Build $inc upserts that add a batch of raw events to the rollups.
+
+    Events for the same (feature, day, outcome) are combined into one update.
+
+    Args:
+    - events (iterable of dict): feature_usage documents.
+
+    Returns:
+    - list of UpdateOne: Operations for db[ROLLUP_COLLECTION].bulk_write.
+    """
+    counts = Counter(_rollup_key(event) for event in events)
+    return [
+        UpdateOne(
+            {"feature_name": feature, "date": date, "outcome": outcome},
+            {"$inc": {"count": count}},
+            upsert=True,
+        )
+        for (feature, date, outcome), count in counts.items()
+    ]
+
+
+def record_events(db, events):
+    """
+    Store raw feature_usage events and add them to the rollups.
+
+    Args:
+    - db: The movie_database handle.
+    - events (list of dict): feature_usage documents.
+    """
+    if not events:
+        return
+    try:
+        db.feature_usage.insert_many(events, ordered=False)
+    except BulkWriteError as e:
+        # A retried batch (event_logger) keeps the _ids of its first attempt;
+        # events stored by that attempt are duplicates and are skipped.
+        details = e.details
+        if details.get("writeConcernErrors") or any(error.get("code") != 11000 for error in details["writeErrors"]):
+            raise
+    db[ROLLUP_COLLECTION].bulk_write(rollup_ops(events), ordered=False)
+
+
+def record_event(db, user_id, feature_name, details="", outcome="N/A", date=None):
+    """Store a single feature_usage event and update its rollup."""
+    record_events(db, [{
+        "user_id": user_id,
+        "feature_name": feature_name,
+        "interaction_date": date or datetime.now().strftime("%Y-%m-%d"),
+        "interaction_details": details,
+        "prediction_outcome": outcome,
+    }])
+
+
+def backfill(db):
+    """
+    Rebuild every rollup from the raw feature_usage events.
+
+    Counts are set rather than incremented, so the backfill can be re-run.
+
+    Returns:
+    - int: Number of rollup documents written.
+    """
+    groups = db.feature_usage.aggregate([
+        {"$group": {
+            "_id": {
+                "feature_name": "$feature_name",
+                "date": "$interaction_date",
+                "outcome": {"$ifNull": ["$prediction_outcome", "N/A"]},
+            },
+            "count": {"$sum": 1},
+        }},
+    ])
+    ops = [
+        UpdateOne(dict(group["_id"]), {"$set": {"count": group["count"]}}, upsert=True)
+        for group in groups
+    ]
+    if ops:
+        db[ROLLUP_COLLECTION].bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def usage_summary(db, start_date=None, end_date=None):
+    """
+    Total feature usage, with a per-outcome breakdown, over a date range.
+
+    Args:
+    - db: The movie_database handle.
+    - start_date (str, optional): First day included ("YYYY-MM-DD").
+    - end_date (str, optional): Last day included ("YYYY-MM-DD").
+
+    Returns:
+    - list of dict: {'feature_name', 'usage_count', 'outcomes': {outcome: count}},
+      most used first.
+    """
+    match = {}
+    if start_date:
+        match["date"] = {"$gte": start_date}
+    if end_date:
+        match.setdefault("date", {})["$lte"] = end_date
+
+    features = {}
+    for rollup in db[ROLLUP_COLLECTION].find(match, {"_id": 0, "feature_name": 1, "outcome": 1, "count": 1}):
+        feature = features.setdefault(rollup["feature_name"], {
+            "feature_name": rollup["feature_name"],
+            "usage_count": 0,
+            "outcomes": Counter(),
+        })
+        feature["usage_count"] += rollup["count"]
+        feature["outcomes"][rollup["outcome"]] += rollup["count"]
+    return sorted(features.values(), key=lambda feature: -feature["usage_count"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain daily feature usage rollups.")
+    parser.add_argument("--backfill", action="store_true", help="Rebuild the rollups from raw feature_usage events")
+    parser.add_argument("--uri", default=None, help="MongoDB connection string")
+    parser.add_argument("--db", default=None, help="Database name")
+    args = parser.parse_args()
+
+    if args.backfill:
+        written = backfill(open_database(uri=args.uri, name=args.db))
+        print(f"Wrote {written} rollup documents.")
+    else:
+        parser.print_help()